@@ -44,6 +44,8 @@ class Code:
             "!D": "001101", "!M": "110001", "-D": "001111", "-M": "110011", "D+1": "011111",
             "M+1": "110111", "D-1": "001110", "M-1": "110010", "D+M": "000010", "D-M": "010011",
             "M-D": "000111", "D&M": "000000", "D|M": "010101",
+            # The commutative operations also take their operands swapped
+            "M+D": "000010", "M&D": "000000", "M|D": "010101",
             "M<<": "100000", "D<<": "110000", "M>>": "000000", "D>>": "010000"
         }
         return prefix + a_bit + comp_map[mnemonic]
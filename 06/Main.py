@@ -5,33 +5,58 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
 import os
-import sys
 import typing
 from SymbolTable import SymbolTable
 from Parser import Parser
 from Code import Code
+from Stats import Stats, NO_STATS
 
 
 def assemble_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        stats: Stats = NO_STATS) -> None:
     """Assembles a single file.
 
     Args:
         input_file (typing.TextIO): the file to assemble.
         output_file (typing.TextIO): writes all output to this file.
+        stats (Stats): collects statistics about the assembly.
     """
     # Your code goes here!
     # A good place to start is to initialize a new Parser object:
     # Note that you can write to output_file like so:
     # output_file.write("Hello world! \n")
-    parser = Parser(input_file)
+    with stats.phase("parse"):
+        parser = Parser(input_file)
     symbol_table = SymbolTable()
-    while parser.has_more_commands():
-        if parser.command_type() == "L_COMMAND":
-            symbol_table.add_entry(parser.symbol(), parser.idx - parser.l_commands)
-        parser.advance()
+    with stats.phase("labels"):
+        while parser.has_more_commands():
+            if parser.command_type() == "L_COMMAND":
+                symbol_table.add_entry(parser.symbol(), parser.idx - parser.l_commands)
+            parser.advance()
     parser.reset()
+    with stats.phase("codegen"):
+        binary = _translate(parser, symbol_table)
+    with stats.phase("write"):
+        output_file.writelines(binary)
+    if stats.enabled:
+        stats.count("files")
+        stats.count("commands", len(parser.symbol_commands))
+        a_commands = sum(1 for command in binary if command[0] == "0")
+        stats.count("instructions.A_COMMAND", a_commands)
+        stats.count("instructions.C_COMMAND", len(binary) - a_commands)
+        stats.count("instructions.L_COMMAND",
+                    len(parser.symbol_commands) - len(binary))
+        stats.table_size("symbols", len(symbol_table))
+
+
+def _translate(parser: Parser, symbol_table: SymbolTable) -> typing.List[str]:
+    """The second pass: translates every A and C command into a line of
+    binary code, allocating variables as they first appear.
+    """
+    binary = []
     n = 16
     while parser.has_more_commands():
         if parser.command_type() == "A_COMMAND":
@@ -50,8 +75,9 @@ def assemble_file(
             continue
         if parser.idx == 25:
             pass
-        output_file.write(command + "\n")
+        binary.append(command + "\n")
         parser.advance()
+    return binary
 
 
 if "__main__" == __name__:
@@ -60,9 +86,16 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(
+        prog="Assembler", usage="Assembler <input path> [options]")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--stats", nargs="?", const="-", metavar="FILE",
+        help="write statistics about the assembly as JSON to FILE "
+             "(default: stdout)")
+    args = arg_parser.parse_args()
+    stats = Stats("Assembler") if args.stats is not None else NO_STATS
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
@@ -77,4 +110,6 @@ if "__main__" == __name__:
         output_path = filename + ".hack"
         with open(input_path, 'r') as input_file, \
                 open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+            assemble_file(input_file, output_file, stats)
+    if stats.enabled:
+        stats.dump(args.stats)
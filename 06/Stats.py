@@ -0,0 +1,150 @@
+"""
+Opt-in statistics about a single run of a tool, written as JSON by --stats.
+
+When --stats is not given the tools use NO_STATS: its phase timer is a shared
+no-op context manager, entered a few times per file, and per-command counters
+are never installed. Counters are only ever attached by wrapping methods of a
+single object with Stats.wrap, so the hot loops of the tools look the same
+whether statistics are collected or not.
+
+Every tool imports its modules from its own directory, so each keeps a copy
+of this module. The copies are identical (13/tests/test_stats.py checks
+them), and a tool uses only the parts of it it needs.
+"""
+import sys
+import time
+import typing
+
+
+class _Phase:
+    """Adds the wall time spent in a with block to a phase of Stats."""
+
+    def __init__(self, phases: typing.Dict[str, float], name: str) -> None:
+        self.phases = phases
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.phases[self.name] = self.phases.get(self.name, 0.0) + \
+            time.perf_counter() - self.start
+
+
+class _NoPhase:
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+class Stats:
+    """Collects wall time per phase, counters and symbol table sizes."""
+
+    enabled = True
+
+    def __init__(self, tool: str) -> None:
+        """
+        Args:
+            tool (str): the name of the tool, as it appears in the report.
+        """
+        self.tool = tool
+        self.phases = {}
+        self.counts = {}
+        self.tables = {}
+
+    def phase(self, name: str) -> typing.ContextManager[None]:
+        """
+        Returns:
+            ContextManager[None]: adds the wall time spent in the with block
+            it guards to the given phase.
+        """
+        return _Phase(self.phases, name)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + amount
+
+    def table_size(self, name: str, size: int) -> None:
+        """Records the size of a symbol table, keeping the largest seen."""
+        self.tables[name] = max(self.tables.get(name, 0), size)
+
+    def wrap(self, instance: object, method_name: str,
+             hook: typing.Callable[..., None]) -> None:
+        """Replaces a method of a single instance with one that also calls
+        hook(*args) before running the original method.
+        """
+        method = getattr(instance, method_name)
+
+        def wrapper(*args):
+            hook(*args)
+            return method(*args)
+        setattr(instance, method_name, wrapper)
+
+    def merge(self, other: "Stats") -> None:
+        """Adds everything other collected, such as in another process."""
+        for name, seconds in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        for name, amount in other.counts.items():
+            self.count(name, amount)
+        for name, size in other.tables.items():
+            self.table_size(name, size)
+
+    def report(self) -> dict:
+        """
+        Returns:
+            dict: everything collected, plus the peak memory of the process.
+        """
+        try:
+            import resource
+        except ImportError:  # Not available on Windows
+            resource = None
+        peak_memory = None
+        if resource is not None:
+            peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform == "darwin":
+                # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+                peak_memory //= 1024
+        return {"tool": self.tool,
+                "phases": {name: round(seconds, 6)
+                           for name, seconds in self.phases.items()},
+                "counts": dict(sorted(self.counts.items())),
+                "symbol_tables": self.tables,
+                "peak_memory_kb": peak_memory}
+
+    def dump(self, path: str) -> None:
+        """Writes the report as JSON to path, or to stdout if path is "-"."""
+        import json
+        text = json.dumps(self.report(), indent=2) + "\n"
+        if path == "-":
+            sys.stdout.write(text)
+        else:
+            with open(path, 'w') as stats_file:
+                stats_file.write(text)
+
+
+class _NoStats(Stats):
+    """Stands in for Stats when --stats is off."""
+
+    enabled = False
+    _no_phase = _NoPhase()
+
+    def phase(self, name: str) -> typing.ContextManager[None]:
+        return self._no_phase
+
+    def count(self, name: str, amount: int = 1) -> None:
+        pass
+
+    def table_size(self, name: str, size: int) -> None:
+        pass
+
+    def wrap(self, instance: object, method_name: str,
+             hook: typing.Callable[..., None]) -> None:
+        pass
+
+    def merge(self, other: Stats) -> None:
+        pass
+
+
+NO_STATS = _NoStats("")
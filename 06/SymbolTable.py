@@ -57,4 +57,11 @@ class SymbolTable:
         Returns:
             int: the address associated with the symbol.
         """
-        return self._symbol_table[symbol]
\ No newline at end of file
+        return self._symbol_table[symbol]
+
+    def __len__(self) -> int:
+        """
+        Returns:
+            int: the number of symbols in the table, predefined ones included.
+        """
+        return len(self._symbol_table)
@@ -5,36 +5,78 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
-import sys
 import typing
-from pathlib import Path
 
 from Parser import Parser
 from CodeWriter import CodeWriter
+from Stats import Stats, NO_STATS
 
 
 def translate_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.TextIO,
+        stats: Stats = NO_STATS) -> None:
     """Translates a single file.
 
     Args:
         input_file (typing.TextIO): the file to translate.
         output_file (typing.TextIO): writes all output to this file.
+        stats (Stats): collects statistics about the translation.
     """
     # Your code goes here!
     # It might be good to start with something like:
-    parser = Parser(input_file)
+    destination = output_file
+    if stats.enabled:
+        # The code is buffered, so writing it is timed as a phase of its own
+        output_file = io.StringIO()
+    with stats.phase("parse"):
+        parser = Parser(input_file)
     code_writer = CodeWriter(output_file)
-    code_writer.set_file_name(Path(input_file.name).stem)
-    while parser.has_more_commands():
-        parser.advance()
-        command_type = parser.command_type()
+    code_writer.set_file_name(
+        os.path.splitext(os.path.basename(input_file.name))[0])
+    if stats.enabled:
+        count_instructions(code_writer, stats)
+    stats.count("files")
+    with stats.phase("codegen"):
+        while parser.has_more_commands():
+            parser.advance()
+            command_type = parser.command_type()
 
-        if command_type == "C_ARITHMETIC":
-            code_writer.write_arithmetic(parser.arg1())
-        elif command_type in {"C_PUSH", "C_POP"}:
-            code_writer.write_push_pop(command_type, parser.arg1(), parser.arg2())
+            if command_type == "C_ARITHMETIC":
+                code_writer.write_arithmetic(parser.arg1())
+            elif command_type in {"C_PUSH", "C_POP"}:
+                code_writer.write_push_pop(command_type, parser.arg1(), parser.arg2())
+    if stats.enabled:
+        with stats.phase("write"):
+            destination.write(output_file.getvalue())
+
+
+def count_instructions(code_writer: CodeWriter, stats: Stats) -> None:
+    """Makes code_writer count the VM commands it translates and the Hack
+    instructions it writes for every type of VM command.
+    """
+    def counted(method, name_of):
+        def write(*args):
+            output_stream = code_writer.output_stream
+            code_writer.output_stream = io.StringIO()
+            try:
+                method(*args)
+            finally:
+                asm = code_writer.output_stream.getvalue()
+                code_writer.output_stream = output_stream
+            output_stream.write(asm)
+            stats.count("commands")
+            stats.count(f"instructions.{name_of(*args)}", sum(
+                1 for line in asm.splitlines()
+                if line.strip() and not line.lstrip().startswith(("//", "("))))
+        return write
+    code_writer.write_arithmetic = counted(
+        code_writer.write_arithmetic, lambda command: command)
+    code_writer.write_push_pop = counted(
+        code_writer.write_push_pop,
+        lambda command, segment, index: command[2:].lower())
 
 
 
@@ -44,9 +86,16 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(
+        prog="VMtranslator", usage="VMtranslator <input path> [options]")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--stats", nargs="?", const="-", metavar="FILE",
+        help="write statistics about the translation as JSON to FILE "
+             "(default: stdout)")
+    args = arg_parser.parse_args()
+    stats = Stats("VMtranslator") if args.stats is not None else NO_STATS
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -63,4 +112,6 @@ if "__main__" == __name__:
             if extension.lower() != ".vm":
                 continue
             with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file)
+                translate_file(input_file, output_file, stats)
+    if stats.enabled:
+        stats.dump(args.stats)
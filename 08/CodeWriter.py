@@ -5,11 +5,17 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import io
 import typing
-from os import write
 storage1 = "R13"
 storage2 = "R14"
 
+
+def _count_instructions(asm: str) -> int:
+    """Counts the Hack instructions (not comments or labels) in asm."""
+    return sum(1 for line in asm.splitlines()
+               if line and not line.startswith(("//", "(")))
+
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
@@ -27,6 +33,13 @@ class CodeWriter:
         self.label_counter = 0
         self.function_name = ""
         self.call_counter = 0
+        self.inline_counter = 0
+        # Set to an Inliner to expand calls to small functions in place
+        self.inliner = None
+        # While writing an inlined body: (n_args, n_saved_pointers, n_vars)
+        # of its frame, and the number of values pushed above its locals
+        self.inline_frame = None
+        self.inline_depth = 0
 
     def set_file_name(self, filename: str) -> None:
         """Informs the code writer that the translation of a new VM file is 
@@ -46,6 +59,51 @@ class CodeWriter:
         # the function "translate_file" in Main.py using python's os library,
         # For example, using code similar to:
         self.file_name = filename
+        self.function_name = ""
+        self.label_counter = 0
+        self.call_counter = 0
+        self.inline_counter = 0
+
+    def _internal_label(self, name: str) -> str:
+        """Returns a label private to the current function (or file, outside
+        of functions). Label and call counters restart in every function, so
+        the code of a function only depends on the function itself and can
+        be cached and spliced in on its own.
+        """
+        return f"{self.function_name or self.file_name}${name}${self.label_counter}"
+
+    def write_command(self, command_type: str, arg1: typing.Optional[str],
+                      arg2: typing.Optional[int]) -> None:
+        """Writes the translation of a single parsed command, as returned by
+        Parser.current_command().
+
+        Args:
+            command_type (str): the type of the command, as in Parser.
+            arg1 (Optional[str]): the first argument of the command.
+            arg2 (Optional[int]): the second argument of the command.
+        """
+        if command_type == "C_ARITHMETIC":
+            self.write_arithmetic(arg1)
+        elif command_type in ("C_PUSH", "C_POP"):
+            self.write_push_pop(command_type, arg1, arg2)
+        elif command_type == "C_LABEL":
+            self.write_label(arg1)
+        elif command_type == "C_GOTO":
+            self.write_goto(arg1)
+        elif command_type == "C_IF":
+            self.write_if(arg1)
+        elif command_type == "C_CALL":
+            function = None
+            if self.inliner is not None and self.inline_frame is None:
+                function = self.inliner.lookup(arg1, arg2)
+            if function is not None:
+                self.write_inlined_call(function, arg2)
+            else:
+                self.write_call(arg1, arg2)
+        elif command_type == "C_FUNCTION":
+            self.write_function(arg1, arg2)
+        elif command_type == "C_RETURN":
+            self.write_return()
 
     def write_arithmetic(self, command: str) -> None:
         """Writes assembly code that is the translation of the given
@@ -73,14 +131,14 @@ class CodeWriter:
         if command == "neg":
             self.output_stream.write("@SP\nA=M-1\nM=-M\n")
             return
-        true_label = f"TRUE{self.label_counter}"
-        continue_label = f"CONTINUE{self.label_counter}"
-        jump_to_end = f"@CONTINUE{self.label_counter}\n0;JMP\n"
+        true_label = self._internal_label("TRUE")
+        continue_label = self._internal_label("CONTINUE")
+        jump_to_end = f"@{continue_label}\n0;JMP\n"
 
         if command in ["eq", "gt", "lt"]:
-            normal_case_label = "NORMAL_CASE" + str(self.label_counter)
-            y_positive_label = "y_POSITIVE" + str(self.label_counter)
-            y_negative_label = "y_NEGATIVE" + str(self.label_counter)
+            normal_case_label = self._internal_label("NORMAL_CASE")
+            y_positive_label = self._internal_label("y_POSITIVE")
+            y_negative_label = self._internal_label("y_NEGATIVE")
             insert_y_to_D = "@SP\nA=M-1\nD=M\n"
             condition = {"eq": "D;JEQ", "gt": "D;JGT", "lt": "D;JLT"}[command]
             if command in ("gt", "lt"):
@@ -105,6 +163,10 @@ class CodeWriter:
         if command == "not":
             self.output_stream.write(f"{pop_last_to_D}D=-D\nD=D-1\n{push_D}")
             return
+        if command in ("shiftleft", "shiftright"):
+            shift = "<<" if command == "shiftleft" else ">>"
+            self.output_stream.write(f"@SP\nA=M-1\nM=M{shift}\n")
+            return
         compute = {"and": "M=D&M\n", "or": "M=D|M\n"}[command]
         self.output_stream.write(f"{pop_last_to_D}{go_one_element_back}{compute}\n")
 
@@ -126,16 +188,23 @@ class CodeWriter:
         move_to_segment = {"argument": f"@ARG\nD=M\n@{index}\nA=D+A\n",
             "local": f"@LCL\nD=M\n@{index}\nA=D+A\n",
             "static": f"@{self.file_name}.{index}\n",
-            "constant": f"@{index}\n",
+            "constant": self._load_constant(index),
             "this": f"@THIS\nD=M\n@{index}\nA=D+A\n",
             "that": f"@THAT\nD=M\n@{index}\nA=D+A\n",
             "pointer": f"@{3 + index}\n",
             "temp": f"@{5 + index}\n"}
+        if self.inline_frame is not None:
+            # Inlined code has no frame of its own: its arguments and locals
+            # live on the stack, at a known distance below SP
+            n_args, n_saved, n_vars = self.inline_frame
+            above = n_vars + self.inline_depth
+            move_to_segment["argument"] = f"@SP\nD=M\n@{n_args + n_saved + above - index}\nA=D-A\n"
+            move_to_segment["local"] = f"@SP\nD=M\n@{above - index}\nA=D-A\n"
         self.output_stream.write("//" + command[2:].lower() + " " + segment + " " + str(index) + "\n")
         if command == "C_PUSH":
             self.output_stream.write(move_to_segment[segment])
             if segment == "constant":
-                self.output_stream.write(f"D=A\n@SP\nA=M\nM=D\n@SP\nM=M+1\n")
+                self.output_stream.write(f"@SP\nA=M\nM=D\n@SP\nM=M+1\n")
             else:
                 self.output_stream.write("D=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n")
             return
@@ -145,11 +214,25 @@ class CodeWriter:
         self.output_stream.write(f"@SP\nAM=M-1\nD=M\n@{storage1}\nA=M\nM=D\n")
 
 
+    @staticmethod
+    def _load_constant(value: int) -> str:
+        """Loads a 16-bit constant into D. Values above 32767, which only
+        come from constant folding, are the two's complement of negative
+        numbers and cannot be loaded with a single A-instruction.
+        """
+        if value < 0x8000:
+            return f"@{value}\nD=A\n"
+        if value == 0xFFFF:
+            return "D=-1\n"
+        if value == 0x8000:
+            return "@32767\nD=!A\n"
+        return f"@{0x10000 - value}\nD=-A\n"
+
     def _y_positive(self, command, normal_case_label):
         insert_x_into_D = "@SP\nA=M-1\nA=A-1\nD=M\n"
         push_false = "A=M-1\nM=0\n"
         push_true = "A=M-1\nM=-1\n"
-        negative_positive_label = "NEGATIVE_POSITIVE" + str(self.label_counter)
+        negative_positive_label = self._internal_label("NEGATIVE_POSITIVE")
         self.output_stream.write(f"{insert_x_into_D}"
                                  f"@{negative_positive_label}\nD;JLT\n@{normal_case_label}\n0;JMP\n")
         self.output_stream.write(f"({negative_positive_label})\n@SP\nM=M-1\n")
@@ -157,14 +240,14 @@ class CodeWriter:
             self.output_stream.write(push_false)
         if command == "lt":
             self.output_stream.write(push_true)
-        self.output_stream.write(f"@CONTINUE{self.label_counter}\n0;JMP\n")
+        self.output_stream.write(f"@{self._internal_label('CONTINUE')}\n0;JMP\n")
 
 
     def _y_negative(self, command, normal_case_label):
         insert_x_into_D = "@SP\nA=M-1\nA=A-1\nD=M\n"
         push_false = "@SP\nA=M-1\nM=0\n"
         push_true = "@SP\nA=M-1\nM=-1\n"
-        positive_negative_label = "POSITIVE_NEGATIVE" + str(self.label_counter)
+        positive_negative_label = self._internal_label("POSITIVE_NEGATIVE")
 
         self.output_stream.write(f"{insert_x_into_D}"
                                  f"@{positive_negative_label}\nD;JGT\n@{normal_case_label}\n0;JMP\n")
@@ -173,7 +256,7 @@ class CodeWriter:
             self.output_stream.write(push_true)
         if command == "lt":
             self.output_stream.write(push_false)
-        self.output_stream.write(f"@CONTINUE{self.label_counter}\n0;JMP\n")
+        self.output_stream.write(f"@{self._internal_label('CONTINUE')}\n0;JMP\n")
 
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command. 
@@ -234,6 +317,9 @@ class CodeWriter:
         # repeat n_vars times:  // n_vars = number of local variables
         #   push constant 0     // initializes the local variables to 0
         self.function_name = function_name
+        self.label_counter = 0
+        self.call_counter = 0
+        self.inline_counter = 0
         self.output_stream.write(f"// write function {function_name} {n_vars}\n")
         self.output_stream.write(f"({self.function_name})\n")
         for _ in range(n_vars):
@@ -297,3 +383,83 @@ class CodeWriter:
         # goto ret
         self.output_stream.write(f"@{storage1}\nA=M\n0;JMP\n")
 
+    def write_inlined_call(self, function: "InlineFunction", n_args: int) -> None:
+        """Writes the body of a small function in place of a call to it.
+        The arguments already on the stack become the bottom of the inlined
+        frame, followed by the saved THIS/THAT (only if the body changes
+        them) and the locals. Every "return" copies the return value over
+        the first argument and pops the rest of the frame, just like a real
+        return leaves the stack. If the body takes more instructions than
+        the call, beyond the max_growth of the inliner, the call is written
+        as a call after all.
+
+        Args:
+            function (InlineFunction): the function to inline.
+            n_args (int): the number of arguments at the call site.
+        """
+        caller_stream = self.output_stream
+        caller_function, caller_file = self.function_name, self.file_name
+        self.inline_counter += 1
+        prefix = f"{caller_function or caller_file}$inline.{self.inline_counter}"
+        saved = function.saved_pointers
+        end_label = f"{prefix}$end"
+
+        prologue = f"// inline {function.name} {n_args}\n"
+        for pointer in saved:
+            prologue += f"@{pointer}\nD=M\n@SP\nA=M\nM=D\n@SP\nM=M+1\n"
+        prologue += "@SP\nA=M\nM=0\n@SP\nM=M+1\n" * function.n_vars
+        self.output_stream = io.StringIO()
+        self.output_stream.write(prologue)
+        # Labels of the body are renamed into the call site's own namespace,
+        # and its statics still belong to the file it came from
+        self.function_name, self.file_name = prefix, function.file_name
+        self.inline_frame = (n_args, len(saved), function.n_vars)
+        reachable = [position for position, depth in enumerate(function.depths)
+                     if depth is not None]
+        epilogue = ""
+        for position in reachable:
+            self.inline_depth = function.depths[position]
+            command = function.body[position]
+            if command[0] != "C_RETURN":
+                self.write_command(*command)
+                continue
+            epilogue = self._inline_return(n_args, saved, function.n_vars)
+            self.output_stream.write(epilogue)
+            if position != reachable[-1]:
+                self.output_stream.write(f"@{end_label}\n0;JMP\n")
+        self.output_stream.write(f"({end_label})\n")
+        expansion = self.output_stream.getvalue()
+        self.output_stream = caller_stream
+        self.function_name, self.file_name = caller_function, caller_file
+        self.inline_frame = None
+
+        # Compare against the full call protocol
+        protocol = CodeWriter(io.StringIO())
+        protocol.write_call(function.name, n_args)
+        call_size = _count_instructions(protocol.output_stream.getvalue())
+        rom_change = _count_instructions(expansion) - call_size
+        max_growth = self.inliner.max_growth
+        if max_growth is not None and rom_change > max_growth:
+            self.inline_counter -= 1
+            self.write_call(function.name, n_args)
+            return
+        self.output_stream.write(expansion)
+        protocol.write_function(function.name, function.n_vars)
+        protocol.write_return()
+        protocol_cycles = _count_instructions(protocol.output_stream.getvalue())
+        self.inliner.record(
+            caller_function, function.name, rom_change,
+            protocol_cycles - _count_instructions(prologue + epilogue))
+
+    def _inline_return(self, n_args: int, saved: typing.List[str],
+                       n_vars: int) -> str:
+        """Returns the code that ends an inlined body at the current depth."""
+        # Pop the return value, then find the first argument's slot
+        code = f"// inline return\n@SP\nAM=M-1\nD=M\n@{storage1}\nM=D\n"
+        below = n_args + len(saved) + n_vars + self.inline_depth - 1
+        code += f"@SP\nD=M\n@{below}\nD=D-A\n@{storage2}\nM=D\n"
+        for offset, pointer in enumerate(saved, start=n_args):
+            code += f"@{storage2}\nD=M\n@{offset}\nA=D+A\nD=M\n@{pointer}\nM=D\n"
+        code += f"@{storage1}\nD=M\n@{storage2}\nA=M\nM=D\n"
+        code += f"@{storage2}\nD=M+1\n@SP\nM=D\n"
+        return code
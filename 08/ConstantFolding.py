@@ -0,0 +1,108 @@
+"""
+Constant folding and algebraic simplification of parsed VM commands.
+
+The Jack compiler emits sequences such as "push constant 1 / neg" for true,
+"push constant 0 / not", or literal arithmetic like "push constant 16384 /
+push constant 32 / add". fold_constants evaluates these at translation time,
+with the 16-bit wraparound of the Hack platform, and leaves a single push.
+It also drops operations that cannot change their operand (x+0, x-0, x|0,
+x&-1, x*1, x/1) and pairs of not/neg that cancel out.
+
+Folded constants may fall outside the 0..32767 range a text "push constant"
+allows; they are kept as unsigned 16-bit values, which CodeWriter knows how
+to push.
+"""
+import typing
+
+WORD = 0xFFFF
+
+UNARY = {
+    "neg": lambda x: -x,
+    "not": lambda x: ~x,
+    "shiftleft": lambda x: x << 1,
+    "shiftright": lambda x: _signed(x) >> 1,
+}
+BINARY = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y,
+    "or": lambda x, y: x | y,
+    "eq": lambda x, y: -1 if x == y else 0,
+    "gt": lambda x, y: -1 if _signed(x) > _signed(y) else 0,
+    "lt": lambda x, y: -1 if _signed(x) < _signed(y) else 0,
+    "Math.multiply": lambda x, y: _signed(x) * _signed(y),
+    "Math.divide": lambda x, y: _divide(_signed(x), _signed(y)),
+}
+# Right operands that leave the left operand unchanged
+IDENTITIES = {"add": 0, "sub": 0, "or": 0, "and": WORD,
+              "Math.multiply": 1, "Math.divide": 1}
+SELF_INVERSE = {"not", "neg"}
+
+
+def _signed(value: int) -> int:
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _divide(x: int, y: int) -> typing.Optional[int]:
+    # Math.divide truncates towards zero, and fails on a zero divisor (and
+    # overflows on -32768), so these are left for run time
+    if y == 0 or x == -0x8000 or y == -0x8000:
+        return None
+    quotient = abs(x) // abs(y)
+    return -quotient if (x < 0) != (y < 0) else quotient
+
+
+def _operation(command: tuple) -> typing.Optional[str]:
+    """Returns the foldable operation a command performs, if any."""
+    command_type, arg1, arg2 = command
+    if command_type == "C_ARITHMETIC":
+        return arg1
+    if command_type == "C_CALL" and arg2 == 2 and arg1 in BINARY:
+        return arg1
+    return None
+
+
+def _constant(command: tuple) -> typing.Optional[int]:
+    if command[0] == "C_PUSH" and command[1] == "constant":
+        return command[2]
+    return None
+
+
+def fold_constants(commands: typing.List[tuple]) -> typing.List[tuple]:
+    """
+    Args:
+        commands (List[tuple]): parsed commands, as (type, arg1, arg2).
+
+    Returns:
+        List[tuple]: equivalent commands, with constant subexpressions
+        evaluated and identity operations removed.
+    """
+    folded = []
+    for command in commands:
+        operation = _operation(command)
+        if operation is None:
+            folded.append(command)
+            continue
+        right = _constant(folded[-1]) if folded else None
+        if operation in UNARY:
+            if right is not None:
+                folded[-1] = ("C_PUSH", "constant", UNARY[operation](right) & WORD)
+            elif operation in SELF_INVERSE and folded and folded[-1] == command:
+                folded.pop()
+            else:
+                folded.append(command)
+            continue
+        if operation not in BINARY:
+            folded.append(command)
+            continue
+        left = _constant(folded[-2]) if len(folded) > 1 else None
+        if right is not None and left is not None:
+            value = BINARY[operation](left, right)
+            if value is not None:
+                folded[-2:] = [("C_PUSH", "constant", value & WORD)]
+                continue
+        if right is not None and IDENTITIES.get(operation) == right:
+            folded.pop()
+            continue
+        folded.append(command)
+    return folded
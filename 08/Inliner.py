@@ -0,0 +1,220 @@
+"""
+Whole-program inlining of small VM functions.
+
+Before translating, every VM file of the program is handed to an Inliner,
+which finds the functions that are worth and safe to inline:
+
+- their body (without the "function" command) has at most max_size commands,
+- they are not recursive, directly or through other functions,
+- every command is reached with a statically known stack depth, so the
+  arguments and locals of the inlined body can be addressed relative to SP.
+
+CodeWriter.write_inlined_call then expands calls to these functions in place
+of the call/return frame protocol, at the call sites where the body takes no
+more instructions than the call itself (by default), so the program never
+grows. Calls inside an inlined body are never inlined themselves.
+"""
+import typing
+
+BINARY_ARITHMETICS = {"add", "sub", "eq", "gt", "lt", "and", "or"}
+
+
+class InlineFunction:
+    """A VM function that calls may be replaced with."""
+
+    def __init__(self, name: str, file_name: str, n_vars: int,
+                 body: typing.List[tuple], depths: typing.List[
+                     typing.Optional[int]]) -> None:
+        """
+        Args:
+            name (str): the name of the function.
+            file_name (str): the VM file it comes from, for its statics.
+            n_vars (int): the number of local variables of the function.
+            body (List[tuple]): its commands, without the "function" one.
+            depths (List[Optional[int]]): the stack depth (above the locals)
+                before every command, None for unreachable commands.
+        """
+        self.name = name
+        self.file_name = file_name
+        self.n_vars = n_vars
+        self.body = body
+        self.depths = depths
+        pointers = {arg2 for command_type, arg1, arg2 in body
+                    if command_type == "C_POP" and arg1 == "pointer"}
+        # Inlined code runs in the caller's frame, so THIS/THAT are only
+        # saved and restored around it when the body changes them
+        self.saved_pointers = [pointer for index, pointer in
+                               enumerate(("THIS", "THAT")) if index in pointers]
+        self.n_args = 1 + max((arg2 for command_type, arg1, arg2 in body
+                               if arg1 == "argument"), default=-1)
+
+
+def stack_depths(body: typing.List[tuple]) -> typing.Optional[
+        typing.List[typing.Optional[int]]]:
+    """Follows every path through a function body and records the stack
+    depth before each command.
+
+    Args:
+        body (List[tuple]): the function's commands.
+
+    Returns:
+        Optional[List[Optional[int]]]: the depth before every command (None
+        where the command cannot be reached), or None when the depth is not
+        statically known, goes below the function's locals, or the function
+        can end without returning.
+    """
+    labels = {arg1: position for position, (command_type, arg1, arg2)
+              in enumerate(body) if command_type == "C_LABEL"}
+    depths = [None] * len(body)
+    pending = [(0, 0)]
+    while pending:
+        position, depth = pending.pop()
+        while True:
+            if position == len(body):
+                return None
+            if depths[position] is not None:
+                if depths[position] != depth:
+                    return None
+                break
+            depths[position] = depth
+            command_type, arg1, arg2 = body[position]
+            if command_type == "C_PUSH":
+                depth += 1
+            elif command_type == "C_POP":
+                depth -= 1
+            elif command_type == "C_ARITHMETIC":
+                if arg1 in BINARY_ARITHMETICS:
+                    depth -= 1
+            elif command_type == "C_CALL":
+                depth += 1 - arg2
+            elif command_type in ("C_IF", "C_GOTO"):
+                if arg1 not in labels:
+                    return None
+                if command_type == "C_IF":
+                    depth -= 1
+                pending.append((labels[arg1], depth))
+                if command_type == "C_GOTO":
+                    break
+            elif command_type == "C_RETURN":
+                if depth < 1:
+                    return None
+                break
+            elif command_type == "C_FUNCTION":
+                return None
+            if depth < 0:
+                return None
+            position += 1
+    return depths
+
+
+class Inliner:
+    """Collects the functions of a whole program and decides which calls are
+    inlined. Also keeps the record of inlined call sites for the report.
+    """
+
+    def __init__(self, max_size: int,
+                 max_growth: typing.Optional[int] = 0) -> None:
+        """
+        Args:
+            max_size (int): the largest body, in VM commands, to inline.
+            max_growth (Optional[int]): the most instructions a call site
+                may grow by when it is inlined, None for no limit.
+        """
+        self.max_size = max_size
+        self.max_growth = max_growth
+        self.functions = {}
+        self.inlinable = {}
+        self.sites = []
+
+    def add_file(self, file_name: str, commands: typing.List[tuple]) -> None:
+        """Adds the functions of a single VM file to the program.
+
+        Args:
+            file_name (str): the name of the VM file, without extension.
+            commands (List[tuple]): its parsed commands.
+        """
+        body = None
+        for command in commands:
+            if command[0] == "C_FUNCTION":
+                body = []
+                self.functions[command[1]] = (file_name, command[2], body)
+            elif body is not None:
+                body.append(command)
+
+    def finish(self) -> None:
+        """Picks the inlinable functions, once all files were added."""
+        calls = {name: {arg1 for command_type, arg1, arg2 in body
+                        if command_type == "C_CALL"}
+                 for name, (file_name, n_vars, body) in self.functions.items()}
+        for name, (file_name, n_vars, body) in self.functions.items():
+            if len(body) > self.max_size or self._is_recursive(name, calls):
+                continue
+            depths = stack_depths(body)
+            if depths is not None:
+                self.inlinable[name] = InlineFunction(
+                    name, file_name, n_vars, body, depths)
+
+    @staticmethod
+    def _is_recursive(name: str, calls: typing.Dict[str, set]) -> bool:
+        seen = set()
+        pending = list(calls[name])
+        while pending:
+            callee = pending.pop()
+            if callee == name:
+                return True
+            if callee in seen or callee not in calls:
+                continue
+            seen.add(callee)
+            pending.extend(calls[callee])
+        return False
+
+    def lookup(self, name: str, n_args: int) -> typing.Optional[InlineFunction]:
+        """
+        Args:
+            name (str): the called function.
+            n_args (int): the number of arguments at the call site.
+
+        Returns:
+            Optional[InlineFunction]: the function to inline in place of the
+            call, or None if the call should stay a call.
+        """
+        function = self.inlinable.get(name)
+        if function is None or function.n_args > n_args:
+            return None
+        return function
+
+    def dependencies(self, commands: typing.List[tuple]) -> typing.List[tuple]:
+        """
+        Returns:
+            List[tuple]: the bodies of all functions inlined into commands,
+            which the translation of commands depends on.
+        """
+        dependencies = []
+        for command_type, arg1, arg2 in commands:
+            if command_type == "C_CALL" and self.lookup(arg1, arg2):
+                function = self.inlinable[arg1]
+                dependencies.append(("C_INLINE", arg1, function.file_name))
+                dependencies.extend(function.body)
+        return dependencies
+
+    def record(self, caller: str, callee: str, rom_change: int,
+               cycles_saved: int) -> None:
+        """Records a single inlined call site for the report."""
+        self.sites.append((caller, callee, rom_change, cycles_saved))
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: a human readable list of the inlined call sites, with the
+            change in ROM size and the cycles saved every time they execute.
+        """
+        lines = []
+        for caller, callee, rom_change, cycles_saved in self.sites:
+            lines.append(f"inlined {callee} into {caller or 'bootstrap'}: "
+                         f"ROM {rom_change:+d} instructions, "
+                         f"{cycles_saved} fewer cycles per call")
+        total = sum(rom_change for _, _, rom_change, _ in self.sites)
+        functions = len({callee for _, callee, _, _ in self.sites})
+        lines.append(f"inlined {len(self.sites)} call sites of {functions} "
+                     f"functions: ROM {total:+d} instructions in total")
+        return "\n".join(lines) + "\n"
@@ -5,16 +5,30 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
 import sys
 import typing
 from Parser import Parser
-from CodeWriter import CodeWriter
+from CodeWriter import CodeWriter, _count_instructions
+from ConstantFolding import fold_constants
+from Inliner import Inliner
+from Stats import Stats, NO_STATS
+from TranslationCache import TranslationCache
+
+VM_COMMANDS = {"C_PUSH": "push", "C_POP": "pop", "C_LABEL": "label",
+               "C_GOTO": "goto", "C_IF": "if-goto", "C_FUNCTION": "function",
+               "C_CALL": "call", "C_RETURN": "return"}
+# The modules the cached assembly of a function depends on
+CODEGEN_MODULES = ["CodeWriter.py", "Inliner.py", "ConstantFolding.py"]
 
 
 def translate_file(
         input_file: typing.TextIO, output_file: typing.TextIO,
-        bootstrap: bool) -> None:
+        bootstrap: bool, cache: typing.Optional[TranslationCache] = None,
+        inliner: typing.Optional[Inliner] = None, fold: bool = False,
+        stats: Stats = NO_STATS) -> None:
     """Translates a single file.
 
     Args:
@@ -22,48 +36,147 @@ def translate_file(
         output_file (typing.TextIO): writes all output to this file.
         bootstrap (bool): if this is True, the current file is the 
             first file we are translating.
+        cache (Optional[TranslationCache]): if given, every function is
+            looked up in (and added to) this cache instead of always being
+            translated.
+        inliner (Optional[Inliner]): if given, calls to the functions it
+            picked are inlined.
+        fold (bool): if this is True, constant expressions are folded before
+            they are translated.
+        stats (Stats): collects statistics about the translation.
     """
-    parser = Parser(input_file)
+    destination = output_file
+    if stats.enabled:
+        # The code is buffered, so writing it is timed as a phase of its own
+        output_file = io.StringIO()
+    with stats.phase("parse"):
+        parser = Parser(input_file)
+        commands = []
+        while parser.has_more_commands():
+            parser.advance()
+            commands.append(parser.current_command())
+    if fold:
+        with stats.phase("fold"):
+            commands = fold_constants(commands)
+    stats.count("files")
+    stats.count("commands", len(commands))
+
+    code_writer = CodeWriter(output_file)
+    code_writer.inliner = inliner
+    if stats.enabled:
+        count_instructions(code_writer, stats)
     input_filename, input_extension = os.path.splitext(os.path.basename(input_file.name))
-    code_writer.set_file_name(input_filename)
     if bootstrap:
         output_file.write("@256\nD=A\n@SP\nM=D\n")
 
         code_writer.write_call("Sys.init", 0)
+    # Only after the bootstrap: its call to Sys.init would otherwise advance
+    # the call counter of the first file. Restarting the counters here keeps
+    # the code of a file the same whether it comes first or not, which the
+    # cache relies on; the return label of the bootstrap ($ret.1) belongs to
+    # no function, so it cannot clash with those of the file.
+    code_writer.set_file_name(input_filename)
+
+    with stats.phase("codegen"):
+        if cache is None:
+            for command in commands:
+                code_writer.write_command(*command)
+        else:
+            translate_blocks(commands, input_filename, output_file,
+                             code_writer, cache, inliner)
+    if stats.enabled:
+        with stats.phase("write"):
+            destination.write(output_file.getvalue())
+
+
+def translate_blocks(
+        commands: typing.List[tuple], input_filename: str,
+        output_file: typing.TextIO, code_writer: CodeWriter,
+        cache: TranslationCache, inliner: typing.Optional[Inliner]) -> None:
+    """Translates a file function by function, reusing the cached
+    translation of every function that did not change.
+    """
+    # Split the file into function blocks, each translated or fetched alone
+    blocks = [[]]
+    for command in commands:
+        if command[0] == "C_FUNCTION" and blocks[-1]:
+            blocks.append([])
+        blocks[-1].append(command)
+    for block in blocks:
+        dependencies = inliner.dependencies(block) if inliner else []
+        key = cache.key(input_filename, block + dependencies)
+        cached = cache.get(key)
+        if cached is None:
+            first_site = len(inliner.sites) if inliner else 0
+            code_writer.output_stream = io.StringIO()
+            for command in block:
+                code_writer.write_command(*command)
+            asm = code_writer.output_stream.getvalue()
+            cache.put(key, asm, inliner.sites[first_site:] if inliner else ())
+        else:
+            asm, inlined = cached
+            # Replayed, so the report covers cached functions as well
+            for site in inlined:
+                inliner.record(*site)
+        output_file.write(asm)
 
 
-    while parser.has_more_commands():
-        parser.advance()
-        command_type = parser.command_type()
-        if command_type == "C_ARITHMETIC":
-            command = parser.arg1()
-            code_writer.write_arithmetic(command)
-        elif command_type == "C_POP":
-            segment = parser.arg1()
-            index = parser.arg2()
-            code_writer.write_push_pop("C_POP",segment,index)
-        elif command_type == "C_PUSH":
-            segment = parser.arg1()
-            index = parser.arg2()
-            code_writer.write_push_pop("C_PUSH",segment,index)
-        elif command_type == "C_LABEL":
-            code_writer.write_label(parser.arg1())
-        elif command_type == "C_GOTO":
-            code_writer.write_goto(parser.arg1())
-        elif command_type == "C_IF":
-            code_writer.write_if(parser.arg1())
-        elif command_type == "C_CALL":
-            function_name = parser.arg1()
-            n_args = parser.arg2()
-            code_writer.write_call(function_name, n_args)
-        elif command_type == "C_FUNCTION":
-            function_name = parser.arg1()
-            n_vars = parser.arg2()
-            code_writer.write_function(function_name, n_vars)
-        elif command_type == "C_RETURN":
-            code_writer.write_return()
+def count_instructions(code_writer: CodeWriter, stats: Stats) -> None:
+    """Makes code_writer count the Hack instructions it writes for every
+    type of VM command. The body of an inlined function counts towards the
+    call it replaced; cached functions are not translated, so not counted.
+    """
+    write_command = code_writer.write_command
+    nesting = 0
+
+    def counted_write_command(command_type, arg1, arg2):
+        nonlocal nesting
+        if nesting:
+            write_command(command_type, arg1, arg2)
+            return
+        output_stream = code_writer.output_stream
+        code_writer.output_stream = io.StringIO()
+        nesting += 1
+        try:
+            write_command(command_type, arg1, arg2)
+        finally:
+            nesting -= 1
+            asm = code_writer.output_stream.getvalue()
+            code_writer.output_stream = output_stream
+        output_stream.write(asm)
+        name = arg1 if command_type == "C_ARITHMETIC" \
+            else VM_COMMANDS[command_type]
+        stats.count(f"instructions.{name}", _count_instructions(asm))
+    code_writer.write_command = counted_write_command
+
+
+def codegen_options() -> str:
+    """
+    Returns:
+        str: a fingerprint of the code generator, so cached translations are
+        dropped whenever CodeWriter, or the inlining and folding it applies,
+        changes.
+    """
+    # Only needed with --cache, so it does not slow down the start of every run
+    import hashlib
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in CODEGEN_MODULES:
+        with open(os.path.join(directory, module), 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()
 
 
+def cache_options(inliner: typing.Optional[Inliner]) -> str:
+    """
+    Returns:
+        str: the options of a TranslationCache: the fingerprint of the code
+        generator and, when calls are inlined, the limits of the inliner.
+    """
+    options = codegen_options()
+    if inliner is not None:
+        options += f" inline={inliner.max_size},{inliner.max_growth}"
+    return options
 
 
 if "__main__" == __name__:
@@ -72,9 +185,29 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(
+        prog="VMtranslator", usage="VMtranslator <input path> [options]")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--cache", nargs="?", const="", metavar="DIR",
+        help="reuse the translation of unchanged functions, stored in DIR "
+             "(default: .vmcache next to the output file)")
+    arg_parser.add_argument(
+        "--inline", nargs="?", type=int, const=8, metavar="SIZE",
+        help="inline calls to non-recursive functions of at most SIZE VM "
+             "commands (default: 8) where that does not grow the ROM, and "
+             "report the inlined call sites")
+    arg_parser.add_argument(
+        "--fold", action="store_true",
+        help="evaluate constant expressions and drop identity operations "
+             "(x+0, x*1, not not x, ...) at translation time")
+    arg_parser.add_argument(
+        "--stats", nargs="?", const="-", metavar="FILE",
+        help="write statistics about the translation as JSON to FILE "
+             "(default: stdout)")
+    args = arg_parser.parse_args()
+    stats = Stats("VMtranslator") if args.stats is not None else NO_STATS
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_translate = [
             os.path.join(argument_path, filename)
@@ -85,13 +218,50 @@ if "__main__" == __name__:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
+    # A .vmb (VM bytecode) file is translated only when there is no text .vm
+    # file with the same name, so text stays the default.
+    text_files = {os.path.splitext(path)[0] for path in files_to_translate
+                  if os.path.splitext(path)[1].lower() == ".vm"}
+    input_files = []
+    for input_path in files_to_translate:
+        filename, extension = os.path.splitext(input_path)
+        if extension.lower() == ".vm":
+            input_files.append((input_path, 'r'))
+        elif extension.lower() == ".vmb" and filename not in text_files:
+            input_files.append((input_path, 'rb'))
+    inliner = None
+    if args.inline is not None:
+        # Inlining needs to see every function of the program up front
+        inliner = Inliner(args.inline)
+        for input_path, mode in input_files:
+            with stats.phase("inline"), open(input_path, mode) as input_file:
+                commands = Parser(input_file).commands
+                if args.fold:
+                    commands = fold_constants(commands)
+                inliner.add_file(
+                    os.path.splitext(os.path.basename(input_path))[0],
+                    commands)
+        with stats.phase("inline"):
+            inliner.finish()
+    cache = None
+    if args.cache is not None:
+        cache_directory = args.cache or os.path.join(
+            os.path.dirname(output_path), ".vmcache")
+        cache = TranslationCache(cache_directory, cache_options(inliner))
     bootstrap = True
     with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            code_writer = CodeWriter(output_file)
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
+        for input_path, mode in input_files:
+            with open(input_path, mode) as input_file:
+                translate_file(input_file, output_file, bootstrap, cache,
+                               inliner, args.fold, stats)
             bootstrap = False
+    if inliner is not None:
+        stats.count("inlined_calls", len(inliner.sites))
+        # Keeps stdout valid JSON when the statistics are written there
+        print(inliner.report(), end="",
+              file=sys.stderr if args.stats == "-" else sys.stdout)
+    if cache is not None:
+        stats.count("cache_hits", cache.hits)
+        stats.count("cache_misses", cache.misses)
+    if stats.enabled:
+        stats.dump(args.stats)
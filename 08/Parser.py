@@ -6,6 +6,12 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
+import VMBytecode
+
+COMMAND_TYPES = {"push": "C_PUSH", "pop": "C_POP",
+                 "label": "C_LABEL", "goto": "C_GOTO",
+                 "if-goto": "C_IF", "function": "C_FUNCTION",
+                 "return": "C_RETURN", "call": "C_CALL"}
 
 
 class Parser:
@@ -26,6 +32,8 @@ class Parser:
     last until the line's end.
     The different parts of each VM command may also be separated by an arbitrary
     number of non-newline whitespace characters.
+    The same commands may also be given pre-tokenized, as a binary .vmb file
+    (see VMBytecode.py).
 
     - Arithmetic commands:
       - add, sub, and, or, eq, gt, lt
@@ -50,18 +58,36 @@ class Parser:
         """Gets ready to parse the input file.
 
         Args:
-            input_file (typing.TextIO): input file.
+            input_file (typing.TextIO): input file. A file opened in binary
+                mode is read as VM bytecode.
         """
         # Your code goes here!
         # A good place to start is to read all the lines of the input:
-        input_lines = input_file.read().splitlines()
-        self.commands = []
-        for command in input_lines:
-            command = command.split("//")[0].strip()
-            if command:
-                self.commands.append(command)
+        input_data = input_file.read()
+        if isinstance(input_data, bytes):
+            # Compact bytecode (.vmb) is already tokenized, no text parsing
+            self.commands = VMBytecode.decode(input_data)
+        else:
+            self.commands = []
+            for command in input_data.splitlines():
+                command = command.split("//")[0].strip()
+                if command:
+                    self.commands.append(self._parse_command(command))
         self.current_command_index = -1
 
+    @staticmethod
+    def _parse_command(command: str) -> tuple:
+        """Splits a single text VM command into (type, arg1, arg2)."""
+        parts = command.split()
+        command_type = COMMAND_TYPES.get(parts[0], "C_ARITHMETIC")
+        if command_type == "C_ARITHMETIC":
+            return command_type, command, None
+        if command_type == "C_RETURN":
+            return command_type, None, None
+        if command_type in ("C_LABEL", "C_GOTO", "C_IF"):
+            return command_type, parts[1], None
+        return command_type, parts[1], int(parts[2])
+
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
 
@@ -76,6 +102,14 @@ class Parser:
         """
         self.current_command_index += 1
 
+    def current_command(self) -> tuple:
+        """
+        Returns:
+            tuple: the current command as (command_type, arg1, arg2), where
+            unused arguments are None.
+        """
+        return self.commands[self.current_command_index]
+
     def command_type(self) -> str:
         """
         Returns:
@@ -85,14 +119,7 @@ class Parser:
             "C_PUSH", "C_POP", "C_LABEL", "C_GOTO", "C_IF", "C_FUNCTION",
             "C_RETURN", "C_CALL".
         """
-        commands = {"push": "C_PUSH", "pop": "C_POP",
-                    "label": "C_LABEL", "goto": "C_GOTO",
-                    "if-goto": "C_IF", "function": "C_FUNCTION",
-                    "return": "C_RETURN", "call": "C_CALL"}
-        command = self.commands[self.current_command_index].split()[0]
-        if command in commands:
-            return commands[command]
-        return "C_ARITHMETIC"
+        return self.commands[self.current_command_index][0]
 
     def arg1(self) -> str:
         """
@@ -101,11 +128,7 @@ class Parser:
             "C_ARITHMETIC", the command itself (add, sub, etc.) is returned. 
             Should not be called if the current command is "C_RETURN".
         """
-        # Your code goes here!
-        command = self.commands[self.current_command_index]
-        if self.command_type() == "C_ARITHMETIC":
-            return command
-        return command.split()[1]
+        return self.commands[self.current_command_index][1]
 
     def arg2(self) -> int:
         """
@@ -114,4 +137,4 @@ class Parser:
             called only if the current command is "C_PUSH", "C_POP", 
             "C_FUNCTION" or "C_CALL".
         """
-        return int(self.commands[self.current_command_index].split()[2])
+        return self.commands[self.current_command_index][2]
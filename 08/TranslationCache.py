@@ -0,0 +1,86 @@
+"""
+On-disk cache of translated functions, used for incremental translation.
+
+The translator splits every VM file into blocks that start at a "function"
+command (plus whatever comes before the first one). Since labels and call
+counters are scoped to the function (see CodeWriter._internal_label), the
+assembly of a block only depends on the block's commands, the file it comes
+from (static variables are named after it) and the code generator itself.
+These are hashed into the key under which the block's assembly is stored, so
+an unchanged function can be spliced in without translating it again.
+
+Along with the assembly, an entry keeps the calls that were inlined into the
+block (see Inliner.record), so the inlining report of a build does not
+depend on which of its functions came from the cache.
+"""
+import os
+import typing
+
+
+class TranslationCache:
+    """Maps function blocks to their previously generated assembly."""
+
+    def __init__(self, directory: str, options: str) -> None:
+        """Opens (and creates, if needed) a cache directory.
+
+        Args:
+            directory (str): where cache entries are stored.
+            options (str): everything besides the block itself that affects
+                the generated code, e.g. the code generator version and flags.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.options = options
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, file_name: str, commands: typing.List[tuple]) -> str:
+        """
+        Args:
+            file_name (str): the name of the VM file the block comes from.
+            commands (List[tuple]): the block's parsed commands.
+
+        Returns:
+            str: the cache key of the block.
+        """
+        # Imported here, so that loading the translator without --cache
+        # does not pay for it
+        import hashlib
+        digest = hashlib.sha256()
+        digest.update(self.options.encode())
+        digest.update(b"\0" + file_name.encode() + b"\0")
+        for command in commands:
+            digest.update(repr(command).encode())
+            digest.update(b"\n")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> typing.Optional[
+            typing.Tuple[str, typing.List[tuple]]]:
+        """
+        Returns:
+            Optional[Tuple[str, List[tuple]]]: the cached assembly for key and
+            the call sites inlined into it, or None if missing.
+        """
+        import json
+        path = os.path.join(self.directory, key + ".json")
+        try:
+            with open(path, 'r') as entry:
+                cached = json.load(entry)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached["asm"], [tuple(site) for site in cached["inlined"]]
+
+    def put(self, key: str, asm: str,
+            inlined: typing.Iterable[tuple] = ()) -> None:
+        """Stores the assembly of a block, and the call sites inlined into it.
+        Entries are written to a temporary file first, so an interrupted
+        build never leaves a truncated entry.
+        """
+        import json
+        path = os.path.join(self.directory, key + ".json")
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'w') as entry:
+            json.dump({"asm": asm, "inlined": list(inlined)}, entry)
+        os.replace(temporary_path, path)
@@ -0,0 +1,103 @@
+"""
+Compact binary container for VM programs (.vmb files).
+
+A .vmb file holds exactly the same commands as its .vm counterpart, but
+pre-tokenized so the translator can skip reading, stripping and splitting
+text lines:
+
+    magic       b"VMB\\x01"
+    strings     varint count, then for each string: varint length + UTF-8
+    commands    one opcode byte per command, followed by its varint arguments
+
+Function and label names are interned in the string table and referenced by
+their varint index. Varints are unsigned LEB128 (7 bits per byte, low bits
+first, high bit set on every byte but the last).
+
+The opcode layout must stay in sync with 11/VMWriter.py, which writes it;
+tests/test_bytecode.py compiles programs both ways to check that it does.
+"""
+import typing
+
+MAGIC = b"VMB\x01"
+
+ARITHMETICS = ["add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not",
+               "shiftleft", "shiftright"]
+SEGMENTS = ["constant", "argument", "local", "static", "this", "that",
+            "pointer", "temp"]
+
+# 0x00-0x0A arithmetic, 0x10-0x17 push <segment>, 0x18-0x1F pop <segment>
+PUSH = 0x10
+POP = 0x18
+LABEL = 0x20
+GOTO = 0x21
+IF = 0x22
+FUNCTION = 0x23
+CALL = 0x24
+RETURN = 0x25
+
+LABEL_COMMANDS = {LABEL: "C_LABEL", GOTO: "C_GOTO", IF: "C_IF"}
+
+
+def _read_varint(data: bytes, position: int) -> typing.Tuple[int, int]:
+    """Reads a varint starting at position.
+
+    Returns:
+        Tuple[int, int]: the decoded value and the position after it.
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def decode(data: bytes) -> typing.List[tuple]:
+    """Decodes a .vmb file into the (command_type, arg1, arg2) tuples used by
+    Parser.
+
+    Args:
+        data (bytes): the whole content of a .vmb file.
+
+    Returns:
+        List[tuple]: the decoded commands, in program order.
+    """
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not a VM bytecode file (bad magic).")
+    position = len(MAGIC)
+    count, position = _read_varint(data, position)
+    strings = []
+    for _ in range(count):
+        length, position = _read_varint(data, position)
+        strings.append(data[position:position + length].decode("utf-8"))
+        position += length
+
+    commands = []
+    end = len(data)
+    while position < end:
+        opcode = data[position]
+        position += 1
+        if opcode < PUSH:
+            command = ARITHMETICS[opcode]
+            commands.append(("C_ARITHMETIC", command, None))
+        elif opcode < LABEL:
+            index, position = _read_varint(data, position)
+            command_type = "C_PUSH" if opcode < POP else "C_POP"
+            commands.append((command_type, SEGMENTS[opcode & 0x07], index))
+        elif opcode in LABEL_COMMANDS:
+            name, position = _read_varint(data, position)
+            commands.append((LABEL_COMMANDS[opcode], strings[name], None))
+        elif opcode in (FUNCTION, CALL):
+            name, position = _read_varint(data, position)
+            number, position = _read_varint(data, position)
+            command_type = "C_FUNCTION" if opcode == FUNCTION else "C_CALL"
+            commands.append((command_type, strings[name], number))
+        elif opcode == RETURN:
+            commands.append(("C_RETURN", None, None))
+        else:
+            raise ValueError(f"Invalid VM bytecode opcode {opcode:#x} at "
+                             f"offset {position - 1}.")
+    return commands
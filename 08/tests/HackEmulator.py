@@ -0,0 +1,110 @@
+"""
+Runs Hack assembly, for the tests of the VM translator.
+
+The assembly is run as it is, without assembling it first: labels and
+variables get the addresses the assembler would give them (variables from
+RAM 16 on, in the order they first appear).
+"""
+import typing
+
+PREDEFINED = dict({"SP": 0, "LCL": 1, "ARG": 2, "THIS": 3, "THAT": 4,
+                   "SCREEN": 16384, "KBD": 24576},
+                  **{f"R{register}": register for register in range(16)})
+COMPUTATIONS = {
+    "0": lambda d, a: 0, "1": lambda d, a: 1, "-1": lambda d, a: -1,
+    "D": lambda d, a: d, "A": lambda d, a: a,
+    "!D": lambda d, a: ~d, "!A": lambda d, a: ~a,
+    "-D": lambda d, a: -d, "-A": lambda d, a: -a,
+    "D+1": lambda d, a: d + 1, "A+1": lambda d, a: a + 1,
+    "D-1": lambda d, a: d - 1, "A-1": lambda d, a: a - 1,
+    "D+A": lambda d, a: d + a, "A+D": lambda d, a: d + a,
+    "D-A": lambda d, a: d - a, "A-D": lambda d, a: a - d,
+    "D&A": lambda d, a: d & a, "A&D": lambda d, a: d & a,
+    "D|A": lambda d, a: d | a, "A|D": lambda d, a: d | a,
+}
+JUMPS = {"": lambda value: False, "JMP": lambda value: True,
+         "JGT": lambda value: value > 0, "JEQ": lambda value: value == 0,
+         "JGE": lambda value: value >= 0, "JLT": lambda value: value < 0,
+         "JNE": lambda value: value != 0, "JLE": lambda value: value <= 0}
+
+
+class HackError(Exception):
+    """Raised when the program runs for too long, or cannot be run."""
+
+
+def _signed(value: int) -> int:
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class HackEmulator:
+    """The Hack computer, running a single program."""
+
+    def __init__(self, asm: str) -> None:
+        """
+        Args:
+            asm (str): the program, in Hack assembly.
+        """
+        lines = [line.split("//")[0].strip() for line in asm.splitlines()]
+        symbols = dict(PREDEFINED)
+        instructions = []
+        for line in lines:
+            if line.startswith("("):
+                symbols[line[1:-1]] = len(instructions)
+            elif line:
+                instructions.append(line)
+        self.program = []
+        variables = 16
+        for instruction in instructions:
+            if instruction.startswith("@"):
+                symbol = instruction[1:]
+                if not symbol.isdigit() and symbol not in symbols:
+                    symbols[symbol] = variables
+                    variables += 1
+                self.program.append(
+                    ("A", int(symbol) if symbol.isdigit() else symbols[symbol]))
+                continue
+            destination, _, rest = instruction.rpartition("=")
+            computation, _, jump = rest.partition(";")
+            uses_memory = "M" in computation
+            computation = computation.replace("M", "A")
+            if computation not in COMPUTATIONS or jump not in JUMPS:
+                raise HackError(f"Invalid instruction {instruction}")
+            self.program.append(("C", (destination, uses_memory,
+                                       COMPUTATIONS[computation], JUMPS[jump])))
+        self.symbols = symbols
+        self.ram = [0] * 32768
+        self.steps = 0
+
+    def run(self, max_steps: int = 1_000_000) -> None:
+        """Runs the program until it loops on a single jump, as halting Hack
+        programs do.
+
+        Raises:
+            HackError: if it runs for more than max_steps instructions.
+        """
+        ram, program = self.ram, self.program
+        pc = a = d = 0
+        while self.steps < max_steps:
+            self.steps += 1
+            kind, argument = program[pc]
+            if kind == "A":
+                a = argument
+                pc += 1
+                continue
+            destination, uses_memory, computation, jump = argument
+            value = _signed(computation(d, ram[a] if uses_memory else a))
+            address = a
+            if "M" in destination:
+                ram[address] = value
+            if "D" in destination:
+                d = value
+            if "A" in destination:
+                a = value & 0x7FFF
+            if jump(value):
+                if address == pc - 1 and program[pc - 1][0] == "A":
+                    return
+                pc = address
+            else:
+                pc += 1
+        raise HackError(f"No halt after {max_steps} steps")
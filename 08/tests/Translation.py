@@ -0,0 +1,25 @@
+"""
+Lets the tests of the VM translator import its modules, and finds the other
+tools of the repository.
+"""
+import io
+import os
+import sys
+
+TRANSLATOR_DIRECTORY = os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)))
+REPOSITORY = os.path.dirname(TRANSLATOR_DIRECTORY)
+COMPILER = os.path.join(REPOSITORY, "11", "JackCompiler.py")
+
+if TRANSLATOR_DIRECTORY not in sys.path:
+    sys.path.insert(0, TRANSLATOR_DIRECTORY)
+
+
+def parse(vm_code: str) -> list:
+    """
+    Returns:
+        list: the commands of vm_code, as the Parser of the translator
+        returns them.
+    """
+    from Parser import Parser
+    return Parser(io.StringIO(vm_code)).commands
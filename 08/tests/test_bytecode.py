@@ -0,0 +1,42 @@
+"""
+Tests that the compact bytecode JackCompiler writes (.vmb) holds the same
+commands as its text output, as the translator reads them.
+"""
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from Translation import COMPILER, REPOSITORY
+from Parser import Parser
+
+PROGRAMS = [os.path.join(REPOSITORY, "11", "Pong"),
+            os.path.join(REPOSITORY, "11", "ComplexArrays"),
+            os.path.join(REPOSITORY, "12")]
+
+
+class BytecodeTest(unittest.TestCase):
+
+    def compile(self, directory: str, *flags: str) -> None:
+        subprocess.run([sys.executable, COMPILER, directory, *flags],
+                       check=True, stdout=subprocess.DEVNULL)
+
+    def test_same_commands_as_text(self):
+        for program in PROGRAMS:
+            with self.subTest(program=os.path.basename(program)), \
+                    tempfile.TemporaryDirectory() as directory:
+                for path in glob.glob(os.path.join(program, "*.jack")):
+                    shutil.copy(path, directory)
+                self.compile(directory)
+                self.compile(directory, "--bytecode")
+                for path in glob.glob(os.path.join(directory, "*.vm")):
+                    with open(path, 'r') as text, \
+                            open(path + "b", 'rb') as bytecode:
+                        self.assertEqual(Parser(bytecode).commands,
+                                         Parser(text).commands)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""
+Tests of --fold, which evaluates constant VM expressions at translation time
+(see ConstantFolding).
+"""
+import unittest
+import Translation
+from CodeWriter import CodeWriter
+from ConstantFolding import fold_constants
+from HackEmulator import HackEmulator
+
+
+def fold(vm_code: str) -> list:
+    return fold_constants(Translation.parse(vm_code))
+
+
+class FoldConstantsTest(unittest.TestCase):
+
+    def test_wraps_to_16_bits(self):
+        for vm_code, value in (
+                ("push constant 32767\npush constant 1\nadd", 0x8000),
+                ("push constant 30000\npush constant 30000\nadd", 60000),
+                ("push constant 0\npush constant 1\nsub", 0xFFFF),
+                ("push constant 1\nneg", 0xFFFF),
+                ("push constant 0\nnot", 0xFFFF),
+                ("push constant 300\npush constant 300\n"
+                 "call Math.multiply 2", 90000 & 0xFFFF),
+                ("push constant 16384\nshiftleft", 0x8000),
+                ("push constant 1\nneg\nshiftright", 0xFFFF)):
+            with self.subTest(vm_code=vm_code):
+                self.assertEqual(fold(vm_code),
+                                 [("C_PUSH", "constant", value)])
+
+    def test_pairs_cancel_out(self):
+        for operations in ("not\nnot", "neg\nneg", "not\nnot\nneg\nneg"):
+            with self.subTest(operations=operations):
+                self.assertEqual(fold("push local 0\n" + operations),
+                                 [("C_PUSH", "local", 0)])
+        self.assertEqual(fold("push local 0\nnot\nneg"), [
+            ("C_PUSH", "local", 0), ("C_ARITHMETIC", "not", None),
+            ("C_ARITHMETIC", "neg", None)])
+
+    def test_identities(self):
+        for operation in ("push constant 0\nadd", "push constant 0\nsub",
+                          "push constant 0\nor", "push constant 1\nneg\nand",
+                          "push constant 1\ncall Math.multiply 2",
+                          "push constant 1\ncall Math.divide 2"):
+            with self.subTest(operation=operation):
+                self.assertEqual(fold("push local 0\n" + operation),
+                                 [("C_PUSH", "local", 0)])
+
+    def test_labels_stop_folding(self):
+        # A jump to the label may come with other operands on the stack
+        for vm_code in ("push constant 1\nlabel L\npush constant 2\nadd",
+                        "push constant 1\nlabel L\nneg",
+                        "push local 0\nnot\nlabel L\nnot",
+                        "push local 0\npush constant 0\nlabel L\nadd"):
+            with self.subTest(vm_code=vm_code):
+                commands = Translation.parse(vm_code)
+                self.assertEqual(fold_constants(commands), commands)
+
+    def test_failing_division_left_for_run_time(self):
+        for vm_code in ("push constant 1\npush constant 0\n"
+                        "call Math.divide 2",
+                        "push constant 32767\nnot\npush constant 1\nneg\n"
+                        "call Math.divide 2"):
+            with self.subTest(vm_code=vm_code):
+                self.assertEqual(fold(vm_code)[-1],
+                                 ("C_CALL", "Math.divide", 2))
+
+
+class LoadConstantTest(unittest.TestCase):
+
+    def test_values_above_32767(self):
+        for value in (0, 32767, 0x8000, 0x8001, 40000, 0xFFFE, 0xFFFF):
+            with self.subTest(value=value):
+                emulator = HackEmulator(
+                    CodeWriter._load_constant(value) +
+                    "@100\nM=D\n(END)\n@END\n0;JMP\n")
+                emulator.run()
+                self.assertEqual(emulator.ram[100] & 0xFFFF, value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+"""
+Tests of --inline, which writes the body of small functions in place of the
+calls to them (see Inliner), by running the translated programs.
+"""
+import io
+import unittest
+import Translation
+from HackEmulator import HackEmulator
+from Inliner import Inliner
+from Main import translate_file
+
+SYS = """
+function Sys.init 0
+    push constant 5
+    call Main.factorial 1
+    pop temp 0
+    push constant 6
+    call Main.isEven 1
+    pop temp 1
+    // Calls nested in the arguments of a call
+    push constant 1
+    push constant 2
+    call Main.add 2
+    push constant 3
+    push constant 4
+    call Main.add 2
+    call Main.add 2
+    pop temp 2
+    // Main.peek changes THAT, which the caller still uses afterwards
+    push constant 4000
+    pop pointer 1
+    push constant 55
+    pop that 0
+    push constant 3000
+    pop pointer 1
+    push constant 77
+    pop that 0
+    push constant 4000
+    call Main.peek 1
+    pop temp 3
+    push that 0
+    pop temp 4
+    push constant 2
+    push constant 3
+    call Main.max 2
+    pop temp 5
+label HALT
+    goto HALT
+"""
+
+MAIN = """
+function Main.factorial 0
+    push argument 0
+    push constant 2
+    lt
+    if-goto BASE
+    push argument 0
+    push argument 0
+    push constant 1
+    sub
+    call Main.factorial 1
+    call Main.multiply 2
+    return
+label BASE
+    push constant 1
+    return
+function Main.multiply 1
+label LOOP
+    push argument 1
+    push constant 0
+    eq
+    if-goto DONE
+    push local 0
+    push argument 0
+    add
+    pop local 0
+    push argument 1
+    push constant 1
+    sub
+    pop argument 1
+    goto LOOP
+label DONE
+    push local 0
+    return
+function Main.isEven 0
+    push argument 0
+    push constant 0
+    eq
+    if-goto YES
+    push argument 0
+    push constant 1
+    sub
+    call Main.isOdd 1
+    return
+label YES
+    push constant 0
+    not
+    return
+function Main.isOdd 0
+    push argument 0
+    push constant 0
+    eq
+    if-goto NO
+    push argument 0
+    push constant 1
+    sub
+    call Main.isEven 1
+    return
+label NO
+    push constant 0
+    return
+function Main.add 0
+    push argument 0
+    push argument 1
+    add
+    return
+function Main.peek 0
+    push argument 0
+    pop pointer 1
+    push that 0
+    return
+function Main.max 1
+    push argument 0
+    pop local 0
+    push argument 1
+    push local 0
+    gt
+    if-goto BIGGER
+    push local 0
+    return
+label BIGGER
+    push argument 1
+    return
+"""
+
+# temp 0 to 5 (RAM 5 to 10) once Sys.init is done
+EXPECTED = [120, -1, 10, 55, 77, 3]
+
+
+def translate(inliner: Inliner = None) -> str:
+    """Translates the program, with inliner if given."""
+    files = []
+    for name, code in (("Sys", SYS), ("Main", MAIN)):
+        vm_file = io.StringIO(code)
+        vm_file.name = name + ".vm"
+        files.append(vm_file)
+    if inliner is not None:
+        for vm_file in files:
+            inliner.add_file(vm_file.name[:-3],
+                             Translation.parse(vm_file.getvalue()))
+        inliner.finish()
+    asm_file = io.StringIO()
+    for vm_file in files:
+        translate_file(vm_file, asm_file, vm_file is files[0],
+                       inliner=inliner)
+    return asm_file.getvalue()
+
+
+def run(asm: str) -> HackEmulator:
+    emulator = HackEmulator(asm)
+    emulator.run()
+    return emulator
+
+
+class InlinerTest(unittest.TestCase):
+
+    def setUp(self):
+        # Large enough that no function is left out for its size
+        self.inliner = Inliner(100)
+        self.inlined = run(translate(self.inliner))
+        self.plain = run(translate())
+
+    def test_recursive_functions_are_not_inlined(self):
+        for name in ("Main.factorial", "Main.isEven", "Main.isOdd"):
+            with self.subTest(name=name):
+                self.assertNotIn(name, self.inliner.inlinable)
+        self.assertIn("Main.multiply", self.inliner.inlinable)
+
+    def test_call_sites(self):
+        inlined = [callee for caller, callee, rom_change, cycles_saved
+                   in self.inliner.sites]
+        self.assertEqual(inlined.count("Main.add"), 3)
+        # Saving THAT makes Main.peek larger than a call
+        self.assertNotIn("Main.peek", inlined)
+        self.assertTrue(all(rom_change <= 0 for caller, callee, rom_change,
+                            cycles_saved in self.inliner.sites))
+
+    def test_same_results_as_calls(self):
+        self.assertEqual(self.plain.ram[5:11], EXPECTED)
+        self.assertEqual(self.inlined.ram[5:11], EXPECTED)
+        self.assertEqual(self.inlined.ram[0], self.plain.ram[0])
+        self.assertLess(self.inlined.steps, self.plain.steps)
+
+    def test_any_growth(self):
+        inliner = Inliner(100, max_growth=None)
+        emulator = run(translate(inliner))
+        inlined = {callee for caller, callee, rom_change, cycles_saved
+                   in inliner.sites}
+        self.assertEqual(inlined, {"Main.add", "Main.multiply", "Main.peek",
+                                   "Main.max"})
+        self.assertEqual(emulator.ram[5:11], EXPECTED)
+        self.assertEqual(emulator.ram[0], self.plain.ram[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
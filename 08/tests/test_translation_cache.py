@@ -0,0 +1,71 @@
+"""
+Tests of --cache, which reuses the translation of unchanged functions (see
+TranslationCache).
+"""
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from Translation import TRANSLATOR_DIRECTORY
+
+PROGRAM = os.path.join(TRANSLATOR_DIRECTORY, "tests", "Pong")
+CODEGEN_MODULES = ["CodeWriter.py", "Inliner.py", "ConstantFolding.py"]
+
+
+class TranslationCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        # A copy of the translator, whose modules the tests may change
+        self.translator = os.path.join(self.directory, "translator")
+        os.mkdir(self.translator)
+        for path in glob.glob(os.path.join(TRANSLATOR_DIRECTORY, "*.py")):
+            shutil.copy(path, self.translator)
+        self.program = os.path.join(self.directory, "Pong")
+        shutil.copytree(PROGRAM, self.program)
+        self.cache = os.path.join(self.directory, "cache")
+
+    def translate(self) -> tuple:
+        """
+        Returns:
+            tuple: the assembly written, the inlining report and the counts
+            of the statistics.
+        """
+        result = subprocess.run(
+            [sys.executable, os.path.join(self.translator, "Main.py"),
+             self.program, "--inline", "--cache", self.cache, "--stats"],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        with open(os.path.join(self.program, "Pong.asm"), 'r') as asm_file:
+            asm = asm_file.read()
+        return asm, result.stderr, json.loads(result.stdout)["counts"]
+
+    def test_cold_then_warm(self):
+        cold_asm, cold_report, cold = self.translate()
+        self.assertEqual(cold["cache_hits"], 0)
+        warm_asm, warm_report, warm = self.translate()
+        self.assertEqual(warm["cache_hits"], cold["cache_misses"])
+        self.assertEqual(warm["cache_misses"], 0)
+        self.assertEqual(warm_asm, cold_asm)
+        # Inlined calls are kept with the cached functions
+        self.assertTrue(cold_report)
+        self.assertEqual(warm_report, cold_report)
+        self.assertEqual(warm["inlined_calls"], cold["inlined_calls"])
+
+    def test_changed_module(self):
+        self.translate()
+        for module in CODEGEN_MODULES:
+            with self.subTest(module=module):
+                with open(os.path.join(self.translator, module), 'a') as source:
+                    source.write("\n# Changed\n")
+                asm, report, counts = self.translate()
+                self.assertEqual(counts["cache_hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,12 +7,27 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import re
 import typing
-from typing import List
 SYMBOLS = r'()[\]{}.,;+\-*/&|<>=~^#'
 KEYWORDS = ["class", "constructor", "function", "method", "field",
                         "static", "var", "int", "char", "boolean", "void",
                         "true", "false", "null", "this", "let", "do", "if",
                         "else", "while", "return"]
+# Scans the source left to right in a single pass. Every match is the
+# whitespace and comments before a token, then the token itself: a string
+# constant with its quotes, a word, or a single symbol (any other character
+# becomes a symbol of its own, for the parser to reject). A word that starts
+# with a digit is matched whole, so that "123abc" is an error rather than an
+# integer and an identifier. Comments only match where they start, so "//"
+# inside a string constant stays part of the string. The token is empty for
+# the trailing whitespace at the end.
+TOKEN_PATTERN = re.compile(
+    r'(\s*(?:(?://[^\n]*|/\*.*?\*/)\s*)*)'
+    r'("[^"\n]*"|[A-Za-z_]\w*|\d\w*|[' + SYMBOLS + r']|\S|\Z)',
+    re.DOTALL)
+# The (kind, value) of every keyword and symbol; other tokens are
+# classified by JackTokenizer._classify
+FIXED_TOKENS = {**{keyword: ("KEYWORD", keyword.upper()) for keyword in KEYWORDS},
+                **{symbol: ("SYMBOL", symbol) for symbol in "()[]{}.,;+-*/&|<>=~^#"}}
 
 
 class JackTokenizer:
@@ -107,10 +122,13 @@ class JackTokenizer:
         """
         # Your code goes here!
         # A good place to start is to read all the lines of the input:
-        input_stream = input_stream.read()
-        input_stream = self._remove_comments(input_stream)
-        input_stream = self._seperate_symbols(input_stream)
-        self.tokens = self._tokenize(input_stream)
+        # The tokens are kept in parallel lists: for each one its kind (what
+        # token_type() returns), its value (what the matching accessor
+        # returns) and the line it is on
+        self.kinds = []
+        self.values = []
+        self.lines = []
+        self._tokenize(input_stream.read())
         self.current_token_idx = -1
 
 
@@ -121,7 +139,7 @@ class JackTokenizer:
             bool: True if there are more tokens, False otherwise.
         """
         # Your code goes here!
-        return self.current_token_idx < len(self.tokens) - 1
+        return self.current_token_idx < len(self.kinds) - 1
 
     def advance(self) -> None:
         """Gets the next token from the input and makes it the current token.
@@ -136,17 +154,7 @@ class JackTokenizer:
             str: the type of the current token, can be
             "KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST"
         """
-        token = self.tokens[self.current_token_idx]
-        if token in SYMBOLS:
-            return "SYMBOL"
-        if token.isdigit():
-            return "INT_CONST"
-        if token.startswith('"') and token.endswith('"'):
-            return "STRING_CONST"
-        if token in KEYWORDS :
-                return "KEYWORD"
-        # else it must be an identifier
-        return "IDENTIFIER"
+        return self.kinds[self.current_token_idx]
 
 
 
@@ -160,8 +168,7 @@ class JackTokenizer:
             "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO", 
             "IF", "ELSE", "WHILE", "RETURN", "TRUE", "FALSE", "NULL", "THIS"
         """
-        token = self.tokens[self.current_token_idx]
-        return token.upper()
+        return self.values[self.current_token_idx]
 
     def symbol(self) -> str:
         """
@@ -172,7 +179,7 @@ class JackTokenizer:
             symbol: '{' | '}' | '(' | ')' | '[' | ']' | '.' | ',' | ';' | '+' | 
               '-' | '*' | '/' | '&' | '|' | '<' | '>' | '=' | '~' | '^' | '#'
         """
-        return self.tokens[self.current_token_idx]
+        return self.values[self.current_token_idx]
 
     def identifier(self) -> str:
         """
@@ -184,7 +191,7 @@ class JackTokenizer:
                   starting with a digit. You can assume keywords cannot be
                   identifiers, so 'self' cannot be an identifier, etc'.
         """
-        return self.tokens[self.current_token_idx]
+        return self.values[self.current_token_idx]
 
     def int_val(self) -> int:
         """
@@ -194,7 +201,7 @@ class JackTokenizer:
             Recall that integerConstant was defined in the grammar like so:
             integerConstant: A decimal number in the range 0-32767.
         """
-        return int(self.tokens[self.current_token_idx])
+        return self.values[self.current_token_idx]
 
     def string_val(self) -> str:
         """
@@ -205,40 +212,36 @@ class JackTokenizer:
             StringConstant: '"' A sequence of Unicode characters not including 
                       double quote or newline '"'
         """
-        return self.tokens[self.current_token_idx][1:-1]
-
-    def _remove_comments(self, stream: str) -> str:
-        while "/*" in stream and "*/" in stream:
-            start = stream.index("/*")
-            end = stream.index("*/", start) + 2
-            stream = stream[:start] + stream[end:]
-        while "//" in stream:
-            start = stream.index("//")
-            end = stream.find("\n", start)
-            stream = stream[:start] + stream[end:] if end != -1 else stream[:start]
-        while "/**" in stream and "*/" in stream:
-            start = stream.index("/**")
-            end = stream.index("*/", start) + 2
-            stream = stream[:start] + stream[end:]
-        return stream.strip()
-
-    def _tokenize(self, input_stream: str) -> List[str]:
-        # This regex matches string constants or non-whitespace sequences
-        pattern = r'"[^"\n]*"|[^\s]+'
-        tokens = re.findall(pattern, input_stream)
-        return tokens
-
-    def _seperate_symbols(self, input_stream: str) -> str:
-        res = ""
-        is_string = False
-        for char in input_stream:
-            if char == '"':
-                is_string = not is_string
-            if char in SYMBOLS and not is_string:
-                res += f"\n{char}\n"
-            else:
-                res += char
-        return res
+        return self.values[self.current_token_idx]
+
+    def _tokenize(self, source: str) -> None:
+        kinds, values, lines = self.kinds, self.values, self.lines
+        # Identifiers repeat a lot, so each one is only classified once
+        known = dict(FIXED_TOKENS)
+        line = 1
+        for skipped, token in TOKEN_PATTERN.findall(source):
+            if skipped:
+                line += skipped.count("\n")
+            if not token:
+                continue
+            kind_value = known.get(token)
+            if kind_value is None:
+                if token[0].isdigit() and not token.isdigit():
+                    raise ValueError(f"Line {line}: {token!r} is neither an "
+                                     f"integer nor an identifier")
+                kind_value = known[token] = self._classify(token)
+            kind, value = kind_value
+            kinds.append(kind)
+            values.append(value)
+            lines.append(line)
+
+    @staticmethod
+    def _classify(token: str) -> typing.Tuple[str, typing.Union[str, int]]:
+        if token[0] == '"':
+            return "STRING_CONST", token[1:-1]
+        if token.isdigit():
+            return "INT_CONST", int(token)
+        return "IDENTIFIER", token
 
     def backward(self) -> None:
         self.current_token_idx -= 1
@@ -0,0 +1,123 @@
+"""
+On-disk cache of compiled classes, used for incremental compilation.
+
+The VM code of a class only depends on its source and on the compiler itself
+(its code and flags): classes are compiled one at a time, and calls to other
+classes are written by name. The compiled output is therefore stored under a
+hash of both, and an unchanged class is copied from the cache instead of
+being compiled again.
+
+Besides the code, the cache records the interface of every class: the kind,
+name, return type and parameter types of each of its subroutines, with a
+hash of them and a hash of the source they were read from. Features that
+look across classes can compare interface hashes to tell whether a change
+to a class may affect the classes that call it, or only its own code; the
+ClassIndex of a build is made of the recorded interfaces of the classes
+whose source did not change.
+
+hashlib and json are imported where they are used, so loading the compiler
+without --cache does not pay for them.
+"""
+import os
+import typing
+
+
+class BuildCache:
+    """Maps class sources to their previously compiled output."""
+
+    def __init__(self, directory: str, options: str) -> None:
+        """Opens (and creates, if needed) a cache directory.
+
+        Args:
+            directory (str): where cache entries are stored.
+            options (str): everything besides the source that affects the
+                compiled code, e.g. the compiler version and flags.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.options = options
+
+    def key(self, source: str, class_options: str = "") -> str:
+        """
+        Args:
+            source (str): the source of a class.
+            class_options (str): options that only apply to this class.
+
+        Returns:
+            str: the cache key of the class.
+        """
+        import hashlib
+        digest = hashlib.sha256()
+        digest.update(self.options.encode())
+        digest.update(b"\0" + class_options.encode() + b"\0")
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        """
+        Returns:
+            Optional[bytes]: the cached output for key, or None if missing.
+        """
+        try:
+            with open(os.path.join(self.directory, key + ".out"), 'rb') as entry:
+                return entry.read()
+        except OSError:
+            return None
+
+    def put(self, key: str, output: bytes) -> None:
+        """Stores the output of a class."""
+        self._write(key + ".out", output)
+
+    def record_interface(self, interface: dict, source: str) -> None:
+        """Records the subroutine signatures of a class.
+
+        Args:
+            interface (dict): the "class" name and the "subroutines" of the
+                class, see ClassIndex.class_interface.
+            source (str): the source of the class.
+        """
+        import hashlib
+        import json
+        signatures = json.dumps(interface["subroutines"], sort_keys=True)
+        interface = {
+            "class": interface["class"],
+            "interface_hash": hashlib.sha256(signatures.encode()).hexdigest(),
+            "source_hash": hashlib.sha256(source.encode()).hexdigest(),
+            "subroutines": interface["subroutines"]}
+        self._write(interface["class"] + ".interface.json",
+                    json.dumps(interface, indent=1).encode())
+
+    def interface(self, class_name: str,
+                  source: typing.Optional[str] = None) -> typing.Optional[dict]:
+        """
+        Args:
+            class_name (str): the name of the class.
+            source (Optional[str]): if given, the interface is only returned
+                if it was recorded from this source.
+
+        Returns:
+            Optional[dict]: the last recorded interface of the class, with
+            its "interface_hash" and "subroutines", or None if there is none.
+        """
+        import json
+        path = os.path.join(self.directory, class_name + ".interface.json")
+        try:
+            with open(path, 'r') as entry:
+                interface = json.load(entry)
+        except (OSError, ValueError):
+            return None
+        if source is not None:
+            import hashlib
+            if interface.get("source_hash") != \
+                    hashlib.sha256(source.encode()).hexdigest():
+                return None
+        return interface
+
+    def _write(self, name: str, content: bytes) -> None:
+        # Entries are written to a temporary file first, so an interrupted
+        # build (or a parallel one) never leaves a truncated entry
+        path = os.path.join(self.directory, name)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as entry:
+            entry.write(content)
+        os.replace(temporary_path, path)
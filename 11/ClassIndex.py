@@ -0,0 +1,134 @@
+"""
+An index of the subroutines of every class of a build.
+
+CodeGenerator compiles a single class at a time. With the ClassIndex of the
+whole build (--resolve-calls) it resolves every call with a single lookup,
+and writes it as what the called subroutine is:
+
+- A call without a receiver to a function or constructor of the class is a
+  call to it, without this pushed as an extra argument. Before, every such
+  call was written as a method call, which shifted the arguments of the
+  function by one. A method of the class called through the class name is
+  called on this object.
+- A call to a subroutine its class does not have, to a method through the
+  class name, to a function through a variable, or with another number of
+  arguments than the subroutine has parameters, is an error, instead of
+  code that jumps nowhere, breaks the stack or reads arguments that were
+  never pushed.
+
+Calls to classes the index does not have (e.g. the OS, when it is not
+compiled with the program) are written as before. The index only has the
+classes that are compiled together: when JackCompiler is given a single
+file, it has that class alone, so only the calls of the class to itself are
+resolved.
+
+The index is built from the interfaces of the classes: the kind, name,
+return type and parameter types of each subroutine, as BuildCache records
+them. scan_interface reads the interface of a source with the tokenizer
+alone, without parsing the subroutine bodies; with --cache, interfaces are
+kept in the cache with a hash of their source, so an incremental build only
+scans the classes that changed.
+"""
+import typing
+from JackAST import ClassNode
+from JackTokenizer import JackTokenizer
+
+SUBROUTINE_KINDS = ("CONSTRUCTOR", "FUNCTION", "METHOD")
+
+
+def class_interface(class_node: ClassNode) -> dict:
+    """
+    Returns:
+        dict: the "class" name and the "subroutines" of a parsed class.
+    """
+    return {"class": class_node.name, "subroutines": [
+        {"kind": subroutine.kind, "name": subroutine.name,
+         "return_type": subroutine.return_type,
+         "parameters": [declaration.type
+                        for declaration in subroutine.parameters]}
+        for subroutine in class_node.subroutines]}
+
+
+def _token(tokenizer: JackTokenizer) -> typing.Union[str, int]:
+    """Returns the current token, and advances past it."""
+    token = tokenizer.get_current_token()
+    tokenizer.advance()
+    return token
+
+
+def scan_interface(input_file: typing.TextIO) -> dict:
+    """Reads the interface of a class from its source. Only the declarations
+    of the class and of its subroutines are read; their bodies are skipped.
+
+    Returns:
+        dict: the interface, as class_interface returns it.
+    """
+    tokenizer = JackTokenizer(input_file)
+    tokenizer.advance()
+    _token(tokenizer)  # class
+    class_name = _token(tokenizer)
+    subroutines = []
+    depth = 0
+    while tokenizer.has_more_tokens():
+        token_type = tokenizer.token_type()
+        if depth == 1 and token_type == "KEYWORD" and \
+                tokenizer.keyword() in SUBROUTINE_KINDS:
+            # kind returnType name ( (type name (, type name)*)? )
+            kind = _token(tokenizer)
+            return_type = _token(tokenizer)
+            name = _token(tokenizer)
+            tokenizer.advance()  # (
+            parameters = []
+            while tokenizer.token_type() != "SYMBOL" or \
+                    tokenizer.symbol() != ')':
+                parameters.append(_token(tokenizer))
+                tokenizer.advance()  # the name of the parameter
+                if tokenizer.token_type() == "SYMBOL" and \
+                        tokenizer.symbol() == ',':
+                    tokenizer.advance()
+            subroutines.append({"kind": kind, "name": name,
+                                "return_type": return_type,
+                                "parameters": parameters})
+            continue
+        if token_type == "SYMBOL" and tokenizer.symbol() == '{':
+            depth += 1
+        elif token_type == "SYMBOL" and tokenizer.symbol() == '}':
+            depth -= 1
+        tokenizer.advance()
+    return {"class": class_name, "subroutines": subroutines}
+
+
+class ClassIndex:
+    """The subroutines of the classes of a build, by class and name."""
+
+    def __init__(self) -> None:
+        self.classes = {}
+
+    def add(self, interface: dict) -> None:
+        """Adds a class, given its interface (see class_interface)."""
+        self.classes[interface["class"]] = {
+            subroutine["name"]: subroutine
+            for subroutine in interface["subroutines"]}
+
+    def has_class(self, class_name: str) -> bool:
+        return class_name in self.classes
+
+    def lookup(self, class_name: str,
+               subroutine_name: str) -> typing.Optional[dict]:
+        """
+        Returns:
+            Optional[dict]: the "kind", "name", "return_type" and
+            "parameters" of a subroutine, or None if it is not known.
+        """
+        return self.classes.get(class_name, {}).get(subroutine_name)
+
+    def digest(self) -> str:
+        """
+        Returns:
+            str: a hash of the whole index, which changes whenever the
+            interface of any of its classes does.
+        """
+        import hashlib
+        import json
+        return hashlib.sha256(json.dumps(
+            self.classes, sort_keys=True).encode()).hexdigest()
@@ -0,0 +1,769 @@
+"""
+Generates VM code for a parsed Jack class.
+
+CodeGenerator walks the tree CompilationEngine builds (see JackAST) and
+writes it through a VMWriter. It owns the symbol table: variables are
+defined as their declarations are reached and resolved when they are used.
+
+With pool_strings set, each distinct string literal of a class is built only
+the first time it is evaluated, into a static variable of its own, and every
+later evaluation pushes that same String. Code that changes or disposes of
+the strings it gets from literals must not be compiled this way.
+
+With live set (see DeadCode), only the subroutines it names are written.
+
+With inline set, calls to OS intrinsics and to trivial getters are written
+in place (see Inlining). getters may be filled beforehand with the getters
+of other classes; those of the class being compiled are added to it.
+
+With cse set, array entries read more than once by the same statement have
+their address computed once. Only statements that call nothing (not even
+Math.multiply or String.new) are changed: while they run no variable
+changes, so an address found once holds until the statement ends. Values
+are still read from memory every time, only addresses are reused. An entry
+read again while THAT still points at it is read through THAT as it is;
+an address needed again after THAT moved on is kept in a temp segment
+entry (1 to 7; temp 0 stays the compiler's scratch) when that is shorter
+than computing it again. cse_eliminated counts the VM commands this saved.
+
+static_frames may give the subroutines of a whole program that never
+recurse static variables for their locals (see StaticFrames). Their locals
+are then read and written as statics of the class, they are declared with
+no locals, and those they may read before assigning are set to 0 when they
+start.
+
+With index set to the ClassIndex of the build, calls are written as what
+the subroutine they call is, and calls that do not match it are errors.
+Calls to classes the index does not have are written as the compiler of
+the book writes them.
+"""
+import collections
+import typing
+from Inlining import INTRINSICS, trivial_getters
+from JackAST import (ClassNode, Subroutine, Let, If, While, Do, Return,
+                     IntConst, StringConst, KeywordConst, VarRef, ArrayRef,
+                     Call, Unary, Binary)
+from StaticFrames import zeroed_locals
+from SymbolTable import SymbolTable, Var
+from VMWriter import VMWriter
+
+OP = {'+': "ADD", '-': "SUB", '&': "AND", '|': "OR", '<': "LT", '>': "GT",
+      '=': "EQ", '*': "Math.multiply", '/': "Math.divide"}
+UNARYOP = {'-': "NEG", '~': "NOT", '^': "SHIFTLEFT", '#': "SHIFTRIGHT"}
+SEGMENTS = {"STATIC": "STATIC", "FIELD": "THIS", "ARG": "ARG", "VAR": "LOCAL"}
+
+
+def _truth(node) -> typing.Optional[bool]:
+    """Returns whether a constant condition holds, or None if node is not a
+    constant true (-1) or false (0).
+    """
+    if isinstance(node, KeywordConst):
+        return {"TRUE": True, "FALSE": False, "NULL": False}.get(node.keyword)
+    if isinstance(node, IntConst) and node.value == 0:
+        return False
+    if isinstance(node, Unary) and node.op == '-' and \
+            isinstance(node.operand, IntConst) and node.operand.value == 1:
+        return True
+    return None
+
+
+def _is_boolean(node) -> bool:
+    """Returns whether node always evaluates to true (-1) or false (0).
+
+    A condition holds when it is -1, as "not" then "if-goto" tests it. Only
+    for these conditions is that the same as "if-goto" on its own, which
+    jumps on any value but 0.
+    """
+    if isinstance(node, Binary):
+        if node.op in ('<', '>', '='):
+            return True
+        return node.op in ('&', '|') and _is_boolean(node.left) and \
+            _is_boolean(node.right)
+    if isinstance(node, Unary):
+        return node.op == '~' and _is_boolean(node.operand)
+    return _truth(node) is not None
+
+
+def _negates_freely(node) -> bool:
+    """Returns whether branching when node does not hold needs no "not"."""
+    if isinstance(node, Unary):
+        return node.op == '~' and _is_boolean(node.operand)
+    return isinstance(node, Binary) and node.op == '=' and \
+        (_truth(node.left) is False or _truth(node.right) is False)
+
+
+def _leaves_that(node) -> bool:
+    """Returns whether evaluating node leaves THAT (pointer 1) as it was: it
+    reads no array entry and calls nothing, not even an inlined subroutine.
+    """
+    if isinstance(node, (IntConst, KeywordConst, VarRef)):
+        return True
+    if isinstance(node, Unary):
+        return _leaves_that(node.operand)
+    if isinstance(node, Binary):
+        return node.op not in ('*', '/') and _leaves_that(node.left) and \
+            _leaves_that(node.right)
+    return False
+
+
+# The temp segment entries that may hold reused array entry addresses
+CSE_SLOTS = range(1, 8)
+
+
+def _key(node) -> typing.Optional[tuple]:
+    """Returns a key that is the same for expressions that evaluate to the
+    same value within a statement that calls nothing, or None if evaluating
+    node may call a subroutine.
+    """
+    if isinstance(node, IntConst):
+        return "int", node.value
+    if isinstance(node, KeywordConst):
+        return "keyword", node.keyword
+    if isinstance(node, VarRef):
+        return "var", node.name
+    if isinstance(node, Unary):
+        operand = _key(node.operand)
+        return None if operand is None else (node.op, operand)
+    if isinstance(node, Binary):
+        if node.op in ('*', '/'):
+            return None
+        left, right = _key(node.left), _key(node.right)
+        if left is None or right is None:
+            return None
+        return node.op, left, right
+    if isinstance(node, ArrayRef):
+        index = _key(node.index)
+        return None if index is None else ("[]", node.name, index)
+    return None
+
+
+def _cost(node) -> int:
+    """Returns the number of VM commands that evaluate an expression that
+    calls nothing, without CSE.
+    """
+    if isinstance(node, KeywordConst):
+        return 2 if node.keyword == "TRUE" else 1
+    if isinstance(node, Unary):
+        return _cost(node.operand) + 1
+    if isinstance(node, Binary):
+        return _cost(node.left) + _cost(node.right) + 1
+    if isinstance(node, ArrayRef):
+        return _cost(node.index) + 4  # base, add, pointer 1 and that 0
+    return 1
+
+
+class _Addresses:
+    """Follows the array entry addresses a statement computes, as
+    CodeGenerator computes them with CSE and a given set of slots.
+    """
+
+    def __init__(self, slots: typing.Set[tuple]) -> None:
+        self.slots = slots
+        self.that = None
+        self.indices = {}
+        self.stored = set()
+        self.repeats = 0
+        # The number of times each address was needed again after THAT moved
+        # on from it
+        self.reused = collections.Counter()
+
+    def expression(self, node) -> None:
+        if isinstance(node, ArrayRef):
+            self.access(node)
+        elif isinstance(node, Unary):
+            self.expression(node.operand)
+        elif isinstance(node, Binary):
+            self.expression(node.left)
+            self.expression(node.right)
+
+    def access(self, node: ArrayRef) -> None:
+        key = _key(node)
+        if key in self.indices:
+            self.repeats += 1
+        if key == self.that:
+            return
+        if key in self.indices:
+            self.reused[key] += 1
+        if key not in self.stored:
+            self.expression(node.index)
+            self.indices.setdefault(key, node.index)
+            if key in self.slots:
+                self.stored.add(key)
+        self.that = key
+
+
+def _plan_slots(expressions: list, target: typing.Optional[ArrayRef]) \
+        -> typing.Optional[typing.Dict[tuple, int]]:
+    """Decides which addresses of a statement are kept in temp entries.
+
+    Args:
+        expressions (list): the expressions of the statement, in the order
+            they are evaluated; none of them may call a subroutine.
+        target (Optional[ArrayRef]): the array entry the statement stores to,
+            after evaluating expressions.
+
+    Returns:
+        Optional[Dict[tuple, int]]: the temp entry of each address that is
+        kept, by its key, or None if no address is needed twice, so that
+        CSE would change nothing.
+    """
+    def follow(slots: typing.Set[tuple]) -> _Addresses:
+        addresses = _Addresses(slots)
+        for expression in expressions:
+            addresses.expression(expression)
+        if target is not None:
+            addresses.access(target)
+        return addresses
+
+    def benefit(addresses: _Addresses, key: tuple) -> int:
+        # Keeping an address costs a pop and a push, and every reuse is then
+        # a single push instead of base, index and add
+        return addresses.reused[key] * (_cost(addresses.indices[key]) + 1) - 2
+
+    addresses = follow(set())
+    if not addresses.repeats:
+        return None
+    slots = set(sorted((key for key in addresses.reused
+                        if benefit(addresses, key) > 0),
+                       key=lambda key: -benefit(addresses, key))
+                [:len(CSE_SLOTS)])
+    while True:
+        # A kept address skips its index, and any address reused in it
+        addresses = follow(slots)
+        kept = {key for key in slots if benefit(addresses, key) > 0}
+        if kept == slots:
+            break
+        slots = kept
+    return {key: slot for key, slot in zip(
+        sorted(slots, key=list(addresses.indices).index), CSE_SLOTS)}
+
+
+class CodeGenerator:
+    """Writes the VM code of Jack classes through a VMWriter."""
+
+    def __init__(self, writer: VMWriter) -> None:
+        """
+        Args:
+            writer (VMWriter): the writer to emit through.
+        """
+        self.writer = writer
+        self.symbol_table = SymbolTable()
+        self.class_name = ""
+        self.counter = 0
+        self.pool_strings = False
+        self.live = None
+        self.inline = False
+        self.getters = {}
+        self.index = None
+        self.cse = False
+        self.static_frames = {}
+        # The static variable of the first local of the subroutine being
+        # written, if its locals are statics
+        self.frame = None
+        self.cse_eliminated = 0
+        # The temp entries of the statement being written with CSE, which of
+        # them hold their address, and the key of the address in THAT
+        self.cse_slots = None
+        self.cse_stored = set()
+        self.that_key = None
+        self.statements = {
+            Let: self.generate_let, If: self.generate_if,
+            While: self.generate_while, Do: self.generate_do,
+            Return: self.generate_return}
+        # Each writes a call to an OS intrinsic in place, and returns whether
+        # it left a value on the stack
+        self.intrinsics = {
+            "Memory.peek": self._inline_peek, "Memory.poke": self._inline_poke,
+            "Math.abs": self._inline_abs}
+        self.expressions = {
+            IntConst: self.generate_int_const,
+            StringConst: self.generate_string_const,
+            KeywordConst: self.generate_keyword_const,
+            VarRef: self.generate_var_ref, ArrayRef: self.generate_array_ref,
+            Call: self.generate_call, Unary: self.generate_unary,
+            Binary: self.generate_binary}
+
+    def _label_generator(self, label_name: str) -> str:
+        self.counter += 1
+        return label_name + str(self.counter)
+
+    def generate_class(self, node: ClassNode) -> None:
+        self.class_name = node.name
+        if self.inline:
+            self.getters.update(trivial_getters(node))
+        for declaration in node.variables:
+            for name in declaration.names:
+                self.symbol_table.define(name, declaration.type,
+                                         declaration.kind)
+        # The frames follow the declared statics, ahead of pooled strings
+        frames_end = max(
+            (self.static_frames[f"{node.name}.{subroutine.name}"] +
+             sum(len(declaration.names) for declaration in subroutine.locals)
+             for subroutine in node.subroutines
+             if f"{node.name}.{subroutine.name}" in self.static_frames),
+            default=0)
+        self.symbol_table.reserve("STATIC", max(
+            0, frames_end - self.symbol_table.var_count("STATIC")))
+        for subroutine in node.subroutines:
+            if self.live is None or \
+                    f"{node.name}.{subroutine.name}" in self.live:
+                self.generate_subroutine(subroutine)
+
+    def generate_subroutine(self, node: Subroutine) -> None:
+        self.symbol_table.start_subroutine()
+        if node.kind == "METHOD":
+            self.symbol_table.define("this", self.class_name, "ARG")
+        for declaration in node.parameters + node.locals:
+            for name in declaration.names:
+                self.symbol_table.define(name, declaration.type,
+                                         declaration.kind)
+
+        full_name = f"{self.class_name}.{node.name}"
+        self.frame = self.static_frames.get(full_name)
+        number_of_locals = self.symbol_table.var_count("VAR")
+        self.writer.write_function(
+            full_name, number_of_locals if self.frame is None else 0)
+        if node.kind == "CONSTRUCTOR":
+            # Set allocated memory segment for the newly created object
+            number_of_field_variables = self.symbol_table.var_count("FIELD")
+            self.writer.write_push("CONST", number_of_field_variables)
+            self.writer.write_call("Memory.alloc", 1)
+            self.writer.write_pop("POINTER", 0)
+        elif node.kind == "METHOD":
+            # Set the pointer to this object
+            self.writer.write_push("ARG", 0)
+            self.writer.write_pop("POINTER", 0)
+        if self.frame is not None:
+            for name in zeroed_locals(node):
+                self.writer.write_push("CONST", 0)
+                self.writer.write_pop(*self._segment(self._get_variable(name)))
+        self.generate_statements(node.statements)
+
+    def generate_statements(self, statements: list) -> None:
+        for statement in statements:
+            self.statements[type(statement)](statement)
+
+    def _start_cse(self, expressions: list,
+                   target: typing.Optional[ArrayRef] = None) -> bool:
+        """Prepares to write a statement with CSE, if it applies.
+
+        Args:
+            expressions (list): the expressions of the statement, in the order
+                they are evaluated.
+            target (Optional[ArrayRef]): the array entry the statement stores
+                to, after evaluating expressions.
+
+        Returns:
+            bool: whether CSE applies; _end_cse must then follow the
+            statement.
+        """
+        if not self.cse or any(_key(expression) is None
+                               for expression in expressions) or \
+                (target is not None and _key(target) is None):
+            return False
+        self.cse_slots = _plan_slots(expressions, target)
+        self.cse_stored = set()
+        self.that_key = None
+        return self.cse_slots is not None
+
+    def _end_cse(self) -> None:
+        self.cse_slots = None
+        self.that_key = None
+
+    def _point_that(self, node: ArrayRef) -> None:
+        """Sets THAT (pointer 1) to the address of an array entry."""
+        key = None if self.cse_slots is None else _key(node)
+        if key is not None and key == self.that_key:
+            self.cse_eliminated += _cost(node.index) + 3
+            return
+        if key in self.cse_stored:
+            self.writer.write_push("TEMP", self.cse_slots[key])
+            self.cse_eliminated += _cost(node.index) + 1
+        else:
+            self._push_variable(node.name)
+            self.generate_expression(node.index)
+            self.writer.write_arithmetic("ADD")
+            if key in (self.cse_slots or ()):
+                self.writer.write_pop("TEMP", self.cse_slots[key])
+                self.writer.write_push("TEMP", self.cse_slots[key])
+                self.cse_stored.add(key)
+                self.cse_eliminated -= 2
+        self.writer.write_pop("POINTER", 1)
+        self.that_key = key
+
+    def generate_let(self, node: Let) -> None:
+        target = None if node.index is None else \
+            ArrayRef(node.name, node.index)
+        if self._start_cse([node.value], target):
+            self.generate_expression(node.value)
+            if target is not None:
+                # Nothing the value reads can change, so it is evaluated
+                # first and stored without going through temp 0
+                if not _leaves_that(node.value):
+                    self.cse_eliminated += 2
+                self._point_that(target)
+                self.writer.write_pop("THAT", 0)
+            else:
+                variable = self._get_variable(node.name)
+                self.writer.write_pop(*self._segment(variable))
+            self._end_cse()
+        elif node.index is not None and _leaves_that(node.value):
+            # The RHS cannot change THAT, so THAT is set first and the RHS
+            # is stored through it directly
+            self._push_variable(node.name)
+            offset = 0
+            if isinstance(node.index, IntConst):
+                offset = node.index.value  # "that offset" adds it on its own
+            else:
+                self.generate_expression(node.index)
+                self.writer.write_arithmetic("ADD")
+            self.writer.write_pop("POINTER", 1)
+            self.generate_expression(node.value)
+            self.writer.write_pop("THAT", offset)
+        elif node.index is not None:
+            self._push_variable(node.name)  # push base address
+            self.generate_expression(node.index)  # push index
+            self.writer.write_arithmetic("ADD")
+            self.generate_expression(node.value)
+            # Pop RHS into temp, pop address into pointer, then assign
+            self.writer.write_pop("TEMP", 0)
+            self.writer.write_pop("POINTER", 1)
+            self.writer.write_push("TEMP", 0)
+            self.writer.write_pop("THAT", 0)
+        else:
+            self.generate_expression(node.value)
+            variable = self._get_variable(node.name)
+            self.writer.write_pop(*self._segment(variable))
+
+    def generate_if(self, node: If) -> None:
+        end_label = self._label_generator("IF_END")
+        if not node.else_statements:
+            self._generate_branch(node.condition, end_label, False)
+            self.generate_statements(node.then_statements)
+        elif _is_boolean(node.condition) and \
+                not _negates_freely(node.condition):
+            # The else branch comes first, so the condition is tested as it
+            # is, without a "not"
+            then_label = self._label_generator("IF_THEN")
+            self._generate_branch(node.condition, then_label, True)
+            self.generate_statements(node.else_statements)
+            self.writer.write_goto(end_label)
+            self.writer.write_label(then_label)
+            self.generate_statements(node.then_statements)
+        else:
+            else_label = self._label_generator("IF_ELSE")
+            self._generate_branch(node.condition, else_label, False)
+            self.generate_statements(node.then_statements)
+            self.writer.write_goto(end_label)
+            self.writer.write_label(else_label)
+            self.generate_statements(node.else_statements)
+        self.writer.write_label(end_label)
+
+    def generate_while(self, node: While) -> None:
+        start_loop = self._label_generator("WhileStart")
+        if not _is_boolean(node.condition):
+            end_loop = self._label_generator("WhileEnd")
+            self.writer.write_label(start_loop)
+            self._generate_branch(node.condition, end_loop, False)
+            self.generate_statements(node.statements)
+            self.writer.write_goto(start_loop)
+            self.writer.write_label(end_loop)
+            return
+        # The condition is tested at the bottom, so an iteration takes a
+        # single branch back to the top
+        test_loop = self._label_generator("WhileTest")
+        if _truth(node.condition) is not True:
+            self.writer.write_goto(test_loop)
+        self.writer.write_label(start_loop)
+        self.generate_statements(node.statements)
+        self.writer.write_label(test_loop)
+        self._generate_branch(node.condition, start_loop, True)
+
+    def _generate_branch(self, condition, label: str, when: bool) -> None:
+        """Writes code that jumps to label if condition holds (when is True)
+        or if it does not (when is False), and falls through otherwise.
+        Branching when a condition holds needs it to be boolean.
+        """
+        if self.cse_slots is None and self._start_cse([condition]):
+            self._generate_branch(condition, label, when)
+            self._end_cse()
+            return
+        truth = _truth(condition)
+        if truth is not None:
+            if truth == when:
+                self.writer.write_goto(label)
+            return
+        if isinstance(condition, Unary) and condition.op == '~' and \
+                _is_boolean(condition.operand):
+            self._generate_branch(condition.operand, label, not when)
+            return
+        if not when and isinstance(condition, Binary) and \
+                condition.op == '=':
+            # x = 0 does not hold exactly when x is not 0
+            if _truth(condition.right) is False:
+                self.generate_expression(condition.left)
+                self.writer.write_if(label)
+                return
+            if _truth(condition.left) is False:
+                self.generate_expression(condition.right)
+                self.writer.write_if(label)
+                return
+        self.generate_expression(condition)
+        if not when:
+            self.writer.write_arithmetic("NOT")
+        self.writer.write_if(label)
+
+    def generate_do(self, node: Do) -> None:
+        if isinstance(node.call, Call):
+            self._write_call(node.call, discard=True)
+            return
+        self.generate_expression(node.call)
+        self.writer.write_pop("TEMP", 0)
+
+    def generate_return(self, node: Return) -> None:
+        if node.value is not None:
+            cse = self._start_cse([node.value])
+            self.generate_expression(node.value)
+            if cse:
+                self._end_cse()
+        else:
+            # Push dummy 0 for void functions
+            self.writer.write_push("CONST", 0)
+        self.writer.write_return()
+
+    def generate_expression(self, node) -> None:
+        self.expressions[type(node)](node)
+
+    def generate_int_const(self, node: IntConst) -> None:
+        self.writer.write_push("CONST", node.value)
+
+    def generate_string_const(self, node: StringConst) -> None:
+        if self.pool_strings:
+            self._push_pooled_string(node.value)
+        else:
+            self._create_string(node.value)
+
+    def _create_string(self, string: str) -> None:
+        self.writer.write_push("CONST", len(string))
+        self.writer.write_call("String.new", 1)
+        for char in string:
+            self.writer.write_push("CONST", ord(char))
+            self.writer.write_call("String.appendChar", 2)
+
+    def _push_pooled_string(self, string: str) -> None:
+        # The quotes keep the static apart from every variable of the class
+        name = f'"{string}"'
+        variable = self.symbol_table.lookup(name)
+        if variable is None:
+            self.symbol_table.define(name, "String", "STATIC")
+            variable = self.symbol_table.lookup(name)
+        built_label = self._label_generator("STRING_BUILT")
+        # The static is 0 (null), as RAM starts out, until the string is built
+        self.writer.write_push("STATIC", variable.index)
+        self.writer.write_if(built_label)
+        self._create_string(string)
+        self.writer.write_pop("STATIC", variable.index)
+        self.writer.write_label(built_label)
+        self.writer.write_push("STATIC", variable.index)
+
+    def generate_keyword_const(self, node: KeywordConst) -> None:
+        if node.keyword in ("FALSE", "NULL"):
+            self.writer.write_push("CONST", 0)
+        elif node.keyword == "TRUE":
+            self.writer.write_push("CONST", 1)
+            self.writer.write_arithmetic("NEG")
+        elif node.keyword == "THIS":
+            self.writer.write_push("POINTER", 0)
+
+    def generate_var_ref(self, node: VarRef) -> None:
+        self._push_variable(node.name)
+
+    def generate_array_ref(self, node: ArrayRef) -> None:
+        self._point_that(node)
+        self.writer.write_push("THAT", 0)
+
+    def generate_call(self, node: Call) -> None:
+        self._write_call(node, discard=False)
+
+    def _resolve_call(self, node: Call) \
+            -> typing.Tuple[str, typing.Optional[Var], bool]:
+        """Finds the subroutine a call goes to.
+
+        Returns:
+            Tuple[str, Optional[Var], bool]: the class of the subroutine, the
+            variable it is called on (None for this object and for functions)
+            and whether it is a method call.
+
+        Raises:
+            ValueError: if the class is in the index, and the call does not
+                match the subroutine.
+        """
+        variable = None
+        if node.receiver is None:
+            # A method of this class, called on this object, unless the
+            # index knows it is a function or a constructor
+            class_name = self.class_name
+            is_method = True
+        else:
+            variable = self.symbol_table.lookup(node.receiver)
+            # A method called on an object, or a function or constructor of
+            # another class
+            class_name = node.receiver if variable is None else variable.type
+            is_method = variable is not None
+        if self.index is None or not self.index.has_class(class_name):
+            return class_name, variable, is_method
+        name = f"{class_name}.{node.name}"
+        subroutine = self.index.lookup(class_name, node.name)
+        if subroutine is None:
+            raise ValueError(f"Subroutine {name} not found in class index.")
+        if node.receiver is None or (node.receiver == self.class_name and
+                                     subroutine["kind"] == "METHOD"):
+            # A method of this class may be named with the class too
+            is_method = subroutine["kind"] == "METHOD"
+        elif is_method != (subroutine["kind"] == "METHOD"):
+            raise ValueError(
+                f"{name} is a {subroutine['kind'].lower()}, but it is called "
+                f"{'on a variable' if is_method else 'on its class'}.")
+        if len(node.arguments) != len(subroutine["parameters"]):
+            raise ValueError(
+                f"{name} takes {len(subroutine['parameters'])} arguments, "
+                f"but it is called with {len(node.arguments)}.")
+        return class_name, variable, is_method
+
+    def _write_call(self, node: Call, discard: bool) -> None:
+        """Writes a call, in place if it is inlined.
+
+        Args:
+            node (Call): the call.
+            discard (bool): if this is True, the value of the call is not
+                used, so it is not left on the stack.
+        """
+        class_name, variable, is_method = self._resolve_call(node)
+        if self.inline and self._inline_call(node, class_name, variable,
+                                             is_method, discard):
+            return
+        number_of_args = len(node.arguments)
+        if is_method:
+            if variable is None:
+                self.writer.write_push("POINTER", 0)
+            else:
+                self.writer.write_push(*self._segment(variable))
+            number_of_args += 1
+        for argument in node.arguments:
+            self.generate_expression(argument)
+        self.writer.write_call(f"{class_name}.{node.name}", number_of_args)
+        if discard:
+            self.writer.write_pop("TEMP", 0)
+
+    def _inline_call(self, node: Call, class_name: str,
+                     variable: typing.Optional[Var], is_method: bool,
+                     discard: bool) -> bool:
+        """Writes a call in place, if it is to an intrinsic or a getter.
+
+        Args:
+            node (Call): the call, resolved by _resolve_call into class_name,
+                variable and is_method.
+            discard (bool): if this is True, the value of the call is not
+                used, so it is not left on the stack.
+
+        Returns:
+            bool: whether the call was written.
+        """
+        name = f"{class_name}.{node.name}"
+        if name in INTRINSICS:
+            if variable is not None or node.receiver is None or \
+                    len(node.arguments) != INTRINSICS[name]:
+                return False
+            pushed = self.intrinsics[name](*node.arguments)
+        else:
+            getter = self.getters.get(name)
+            if getter is None or node.arguments or \
+                    getter.is_method != is_method:
+                return False
+            if getter.value is not None:
+                self._push_constant(getter.value)
+            elif variable is None:
+                self.writer.write_push("THIS", getter.field_index)
+            else:
+                self.writer.write_push(*self._segment(variable))
+                self.writer.write_pop("POINTER", 1)
+                self.writer.write_push("THAT", getter.field_index)
+            pushed = True
+        if discard and pushed:
+            self.writer.write_pop("TEMP", 0)
+        elif not discard and not pushed:
+            # Void subroutines return 0
+            self.writer.write_push("CONST", 0)
+        return True
+
+    def _inline_peek(self, address) -> bool:
+        self.generate_expression(address)
+        self.writer.write_pop("POINTER", 1)
+        self.writer.write_push("THAT", 0)
+        return True
+
+    def _inline_poke(self, address, value) -> bool:
+        # Stores as an array entry does, with THAT set to the address itself
+        self.generate_expression(address)
+        self.generate_expression(value)
+        self.writer.write_pop("TEMP", 0)
+        self.writer.write_pop("POINTER", 1)
+        self.writer.write_push("TEMP", 0)
+        self.writer.write_pop("THAT", 0)
+        return False
+
+    def _inline_abs(self, value) -> bool:
+        positive_label = self._label_generator("ABS_POSITIVE")
+        self.generate_expression(value)
+        self.writer.write_pop("TEMP", 0)
+        self.writer.write_push("TEMP", 0)
+        self.writer.write_push("CONST", 0)
+        self.writer.write_arithmetic("LT")
+        self.writer.write_arithmetic("NOT")
+        self.writer.write_if(positive_label)
+        self.writer.write_push("TEMP", 0)
+        self.writer.write_arithmetic("NEG")
+        self.writer.write_pop("TEMP", 0)
+        self.writer.write_label(positive_label)
+        self.writer.write_push("TEMP", 0)
+        return True
+
+    def _push_constant(self, value: int) -> None:
+        # Jack integer constants are at most 32767
+        if value >= 0:
+            self.writer.write_push("CONST", value)
+        elif value == -0x8000:
+            self.writer.write_push("CONST", 0x7FFF)
+            self.writer.write_arithmetic("NOT")
+        else:
+            self.writer.write_push("CONST", -value)
+            self.writer.write_arithmetic("NEG")
+
+    def generate_unary(self, node: Unary) -> None:
+        self.generate_expression(node.operand)
+        self.writer.write_arithmetic(UNARYOP[node.op])
+
+    def generate_binary(self, node: Binary) -> None:
+        self.generate_expression(node.left)
+        self.generate_expression(node.right)
+        op = OP[node.op]
+        if op in ("Math.multiply", "Math.divide"):
+            self.writer.write_call(op, 2)
+        else:
+            self.writer.write_arithmetic(op)
+
+    def _get_variable(self, var_name: str) -> Var:
+        variable = self.symbol_table.lookup(var_name)
+        if variable is None:
+            raise ValueError(f"Variable {var_name} not found in symbol table.")
+        return variable
+
+    def _segment(self, variable: Var) -> typing.Tuple[str, int]:
+        """Returns the segment and index of a variable."""
+        if variable.kind == "VAR" and self.frame is not None:
+            return "STATIC", self.frame + variable.index
+        return SEGMENTS[variable.kind], variable.index
+
+    def _push_variable(self, var_name: str) -> None:
+        variable = self._get_variable(var_name)
+        self.writer.write_push(*self._segment(variable))
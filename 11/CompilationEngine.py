@@ -5,274 +5,224 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
-from pandas.compat.numpy.function import validate_resampler_func, validate_argsort_kind
-
-from SymbolTable import SymbolTable
+from CodeGenerator import CodeGenerator, OP, UNARYOP
+from JackAST import (ClassNode, VarDec, Subroutine, Let, If, While, Do,
+                     Return, IntConst, StringConst, KeywordConst, VarRef,
+                     ArrayRef, Call, Unary, Binary)
 from JackTokenizer import JackTokenizer
 from VMWriter import VMWriter
 
 
-OP = {'+':"ADD", '-':"SUB", '&':"AND", '|':"OR", '<':"LT", '>':"GT", '=':"EQ", '*':"Math.multiply", '/':"Math.divide"}
-UNARYOP = {'-':"NEG", '~':"NOT", '^':"SHIFTLEFT", '#':"SHIFTRIGHT"}
-
 KEYWORD_CONSTANTS = ['TRUE', 'FALSE', 'NULL', 'THIS']
 
 class CompilationEngine:
     """Gets input from a JackTokenizer and emits its parsed structure into an
     output stream.
+
+    The compile_* methods parse the tokens into the nodes of JackAST, and
+    return them. compile_class runs the passes of the engine over the whole
+    class, then hands it to a CodeGenerator, which writes its VM code.
     """
 
-    def __init__(self, input_stream: "JackTokenizer", output_stream) -> None:
+    def __init__(self, input_stream: "JackTokenizer", output_stream,
+                 writer: "VMWriter" = None) -> None:
         """
         Creates a new compilation engine with the given input and output. The
         next routine called must be compileClass()
         :param input_stream: The input stream.
         :param output_stream: The output stream.
+        :param writer: The VM writer to emit through, a text VMWriter over
+            output_stream by default.
         """
-        # Your code goes here!
-        # Note that you can write to output_stream like so:
-        # output_stream.write("Hello world! \n")
         self.input_stream = input_stream
         self.output_stream = output_stream
-        self.counter = 0
-        self.symbol_table = SymbolTable()
-        self.class_name = ""
-        self.writer = VMWriter(output_stream)
-
-    def _label_generator(self, label_name: str) -> str:
-        self.counter += 1
-        return label_name + str(self.counter)
-
-    def compile_class(self) -> None:
-        # Write class className { classVarDec* subroutineDec* }
+        self.writer = writer if writer is not None else VMWriter(output_stream)
+        self.generator = CodeGenerator(self.writer)
+        self.symbol_table = self.generator.symbol_table
+        # Functions that rewrite a parsed class in place before its code is
+        # generated, such as ConstantFolding.fold_class
+        self.passes = []
+
+    def compile_class(self) -> ClassNode:
+        """Parses a whole class and writes its VM code.
+
+        Returns:
+            ClassNode: the parsed class.
+        """
+        node = self.parse_class()
+        for optimization in self.passes:
+            optimization(node)
+        self.generator.generate_class(node)
+        return node
+
+    def parse_class(self) -> ClassNode:
+        # class className { classVarDec* subroutineDec* }
         self.input_stream.advance() # Skip 'class' keyword
-        self.class_name = self._get_identifier()
+        class_name = self._get_identifier()
         self.input_stream.advance() # Skip the opening {
+        variables = []
         while self.input_stream.token_type() == "KEYWORD" and self.input_stream.keyword() in ["STATIC", "FIELD"]:
-            self.compile_class_var_dec()
+            variables.append(self.compile_class_var_dec())
+        subroutines = []
         while self.input_stream.token_type() == "KEYWORD" and self.input_stream.keyword() in ["CONSTRUCTOR", "FUNCTION", "METHOD"]:
-            self.compile_subroutine()
+            subroutines.append(self.compile_subroutine())
         self._validate_and_skip_token('}')
+        return ClassNode(class_name, variables, subroutines)
 
-    def compile_class_var_dec(self) -> None:
-        # Write static/field type variableName(, variableName)*;
+    def compile_class_var_dec(self) -> VarDec:
+        # static/field type variableName(, variableName)*;
         var_kind = self._get_keyword()
         var_type = self._get_type()
-        var_name = self._get_identifier()
-        self.symbol_table.define(var_name, var_type, var_kind)
-        # Write the rest of the variables
+        names = [self._get_identifier()]
         while self.input_stream.symbol() == ',':
             self.input_stream.advance()
-            name = self._get_identifier()
-            self.symbol_table.define(name, var_type, var_kind)
+            names.append(self._get_identifier())
         self._validate_and_skip_token(';')
+        return VarDec(var_kind, var_type, names)
 
-    def compile_subroutine(self) -> None:
+    def compile_subroutine(self) -> Subroutine:
         """
         Compiles a complete method, function, or constructor.
         You can assume that classes with constructors have at least one field,
         you will understand why this is necessary in project 11.
         """
-        # Write subroutine_keyword return_type subroutineName(parameterList){subroutine_body}
-        self.symbol_table.start_subroutine()
+        # subroutine_keyword return_type subroutineName(parameterList){subroutine_body}
         subroutine_type = self._get_keyword()
         return_type = self._get_type()
         name = self._get_identifier()
-        #(parameterList)
-        if subroutine_type == "METHOD":
-            self.symbol_table.define("this", self.class_name, "ARG")
         self.input_stream.advance() # Skip the opening (
-        self._define_parameter_list()
+        parameters = self.compile_parameter_list()
         self._validate_and_skip_token(')')
 
         # SubroutineBody: {varDec* statements}
         self._validate_and_skip_token('{')
+        local_variables = []
         while self.input_stream.token_type() == "KEYWORD" and self.input_stream.keyword() == "VAR":
-            self.compile_var_dec()
-
-        number_of_locals = self.symbol_table.var_count("VAR")
-        self.writer.write_function(f"{self.class_name}.{name}", number_of_locals)
-
-        if subroutine_type == "CONSTRUCTOR":
-            # Set allocated memory segment for the newly created object
-            number_of_field_variables = self.symbol_table.var_count("FIELD")
-            self.writer.write_push("CONST",number_of_field_variables)
-            self.writer.write_call("Memory.alloc",1)
-            self.writer.write_pop("POINTER",0)
-
-        elif subroutine_type == "METHOD":
-            # Set the pointer to this object
-            self.writer.write_push("ARG",0)
-            self.writer.write_pop("POINTER",0)
-
-        self.compile_statements()
+            local_variables.append(self.compile_var_dec())
+        statements = self.compile_statements()
         self._validate_and_skip_token('}')
+        return Subroutine(subroutine_type, return_type, name, parameters,
+                          local_variables, statements)
 
-    def compile_parameter_list(self) -> None:
+    def compile_parameter_list(self) -> list:
         """Compiles a (possibly empty) parameter list, not including the
         enclosing "()".
         """
-        # If not parameters
-        if self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == ")":
-            return
-        # write type var_name
-        parameter_type = self._get_type()
-        parameter_name = self._get_identifier()
-        self.symbol_table.define(parameter_name, parameter_type, "ARG")
-        # Write the rest of the parameters
-        while self.input_stream.symbol() == ",":
-            self.input_stream.advance()
+        # type varName (',' type varName)* or empty
+        parameters = []
+        while not (self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == ")"):
             parameter_type = self._get_type()
             parameter_name = self._get_identifier()
-            self.symbol_table.define(parameter_name, parameter_type, "ARG")
-    def compile_var_dec(self) -> None:
+            if self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == ",":
+                self.input_stream.advance()
+            parameters.append(VarDec("ARG", parameter_type, [parameter_name]))
+        return parameters
+
+    def compile_var_dec(self) -> VarDec:
         """Compiles a var declaration."""
         # VarDec: 'var' type varName (',' varName)* ';'
         self._validate_and_skip_token("VAR")
         var_type = self._get_type()
-        var_name = self._get_identifier()
-        self.symbol_table.define(var_name, var_type, "VAR")
-
-        # Write the rest of the variables
+        names = [self._get_identifier()]
         while self.input_stream.symbol() == ',':
             self.input_stream.advance()
-            var_name = self._get_identifier()
-            self.symbol_table.define(var_name, var_type, "VAR")
+            names.append(self._get_identifier())
         self.input_stream.advance() # Skip closing ;
+        return VarDec("VAR", var_type, names)
 
-    def compile_statements(self) -> None:
-        """Compiles a sequence of statements, not including the enclosing 
+    def compile_statements(self) -> list:
+        """Compiles a sequence of statements, not including the enclosing
         "{}".
         """
+        statements = []
         while self.input_stream.keyword() in ["LET", "IF", "WHILE", "DO", "RETURN"]:
             if self.input_stream.keyword() == "LET":
-                self.compile_let()
+                statements.append(self.compile_let())
             elif self.input_stream.keyword() == "IF":
-                self.compile_if()
+                statements.append(self.compile_if())
             elif self.input_stream.keyword() == "WHILE":
-                self.compile_while()
+                statements.append(self.compile_while())
             elif self.input_stream.keyword() == "DO":
-                self.compile_do()
+                statements.append(self.compile_do())
             elif self.input_stream.keyword() == "RETURN":
-                self.compile_return()
+                statements.append(self.compile_return())
+        return statements
 
-    def compile_do(self) -> None:
+    def compile_do(self) -> Do:
         """Compiles a do statement."""
         self._validate_and_skip_token("DO")
         # subroutine call
-        self.compile_term()
-        self.writer.write_pop("TEMP", 0)
+        call = self.compile_term()
         self._validate_and_skip_token(';')
+        return Do(call)
 
-    def compile_let(self) -> None:
+    def compile_let(self) -> Let:
         #letStatement: 'let' varName ('[' expression ']')? '=' expression ';'
         self._validate_and_skip_token("LET")
-
         var_name = self._get_identifier()
-        is_array = False
-
+        index = None
         # Handle array assignment
         if self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == "[":
-            is_array = True
             self.input_stream.advance()  # Skip [
-            self._push_variable(var_name)  # push base address
-            self.compile_expression()  # push index
+            index = self.compile_expression()
             self.input_stream.advance()  # Skip ]
-            self.writer.write_arithmetic("ADD")
-
         self._validate_and_skip_token('=')
-        self.compile_expression()  # Compile RHS
-
-        if is_array:
-            # For arrays: pop RHS into temp, pop address into pointer, then assign
-            self.writer.write_pop("TEMP", 0)
-            self.writer.write_pop("POINTER", 1)
-            self.writer.write_push("TEMP", 0)
-            self.writer.write_pop("THAT", 0)
-        else:
-            # For normal vars
-            segment = self._get_segment(var_name)
-            index = self.symbol_table.index_of(var_name)
-            self.writer.write_pop(segment, index)
-
+        value = self.compile_expression()
         self._validate_and_skip_token(';')
+        return Let(var_name, index, value)
 
-    def compile_while(self) -> None:
+    def compile_while(self) -> While:
         """Compiles a while statement."""
-        start_loop = self._label_generator("WhileStart")
-        end_loop = self._label_generator("WhileEnd")
-        # Write while (expression) {statements}
+        # while (expression) {statements}
         self._validate_and_skip_token("WHILE")
         self.input_stream.advance() # Skip (
-
-        # Start of the loop
-        self.writer.write_label(start_loop)
-        self.compile_expression()
+        condition = self.compile_expression()
         self._validate_and_skip_token(')')
-        self.writer.write_arithmetic("NOT")
-        self.writer.write_if(end_loop)
         self._validate_and_skip_token('{')
-        self.compile_statements()
+        statements = self.compile_statements()
         self._validate_and_skip_token('}')
-        self.writer.write_goto(start_loop)
-        # End of the loop
-        self.writer.write_label(end_loop)
+        return While(condition, statements)
 
-    def compile_return(self) -> None:
+    def compile_return(self) -> Return:
         """Compiles a return statement."""
         self._validate_and_skip_token("RETURN")
-        # If the next token is not a semicolon, push expression
+        value = None
         if not (self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == ";"):
-            self.compile_expression()
-        # Else push dummy 0 for void functions
-        else:
-            self.writer.write_push("CONST", 0)
-        self.writer.write_return()
+            value = self.compile_expression()
         self._validate_and_skip_token(';')
+        return Return(value)
 
-    def compile_if(self) -> None:
-        else_label = self._label_generator("IF_ELSE")
-        end_label = self._label_generator("IF_END")
-
+    def compile_if(self) -> If:
         self._validate_and_skip_token("IF")
         self._validate_and_skip_token('(')
-        self.compile_expression()
+        condition = self.compile_expression()
         self._validate_and_skip_token(')')
-        self.writer.write_arithmetic("NOT")
-        self.writer.write_if(else_label)
 
         # then block
         self._validate_and_skip_token('{')
-        self.compile_statements()
+        then_statements = self.compile_statements()
         self._validate_and_skip_token('}')
-        self.writer.write_goto(end_label)
 
         # else block (optional)
-        self.writer.write_label(else_label)
+        else_statements = None
         if self.input_stream.token_type() == "KEYWORD" and self.input_stream.keyword() == "ELSE":
             self._validate_and_skip_token("ELSE")
             self._validate_and_skip_token('{')
-            self.compile_statements()
+            else_statements = self.compile_statements()
             self._validate_and_skip_token('}')
+        return If(condition, then_statements, else_statements)
 
-        # end of if/else
-        self.writer.write_label(end_label)
-
-    def compile_expression(self) -> None:
+    def compile_expression(self):
         """Compiles an expression."""
         # expression: term (op term)*
-        self.compile_term()
+        node = self.compile_term()
         while self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() in OP:
-            op = OP[self._get_symbol()]
-            self.compile_term()
-            if op in ["Math.multiply", "Math.divide"]:
-                self.writer.write_call(op, 2)
-            else:
-                self.writer.write_arithmetic(op)
-
+            op = self._get_symbol()
+            node = Binary(op, node, self.compile_term())
+        return node
 
-    def  compile_term(self) -> None:
-        """Compiles a term. 
+    def  compile_term(self):
+        """Compiles a term.
         This routine is faced with a slight difficulty when
         trying to decide between some of the alternative parsing rules.
         Specifically, if the current token is an identifier, the routing must
@@ -284,79 +234,60 @@ class CompilationEngine:
         token_type = self.input_stream.token_type()
 
         if token_type == "INT_CONST":
-            self.writer.write_push("CONST", self.input_stream.int_val())
+            node = IntConst(self.input_stream.int_val())
             self.input_stream.advance()
 
         elif token_type == "STRING_CONST":
-            self._create_string(self.input_stream.string_val())
+            node = StringConst(self.input_stream.string_val())
             self.input_stream.advance()
 
         elif token_type == "KEYWORD" and self.input_stream.keyword() in KEYWORD_CONSTANTS:
-            if self.input_stream.keyword() in ["FALSE", "NULL"]:
-                self.writer.write_push("CONST", 0)
-            elif self.input_stream.keyword() == "TRUE":
-                self.writer.write_push("CONST", 1)
-                self.writer.write_arithmetic("NEG")
-            elif self.input_stream.keyword() == "THIS":
-                self.writer.write_push("POINTER", 0)
-            self.input_stream.advance()
+            node = KeywordConst(self._get_keyword())
 
         elif token_type == "SYMBOL":
             if self.input_stream.symbol() in UNARYOP:
-                unary_op = UNARYOP[self._get_symbol()]
-                self.compile_term()
-                self.writer.write_arithmetic(unary_op)
+                op = self._get_symbol()
+                node = Unary(op, self.compile_term())
             elif self.input_stream.symbol() == "(":
                 self.input_stream.advance() # Skip (
-                self.compile_expression()
+                node = self.compile_expression()
                 self.input_stream.advance() # Skip )
             else:
-                raise ValueError(f"Unexpected symbol: {self.input_stream.symbol()}")
+                raise ValueError(f"Line {self.input_stream.line()}: Unexpected symbol: {self.input_stream.symbol()}")
 
         elif token_type == "IDENTIFIER":
-            identifier = self._get_identifier()
-            if self.input_stream.token_type() == "SYMBOL":
-                # If an array entry
-                if self.input_stream.symbol() == "[":
-                    self._push_variable(identifier)
-                    self.input_stream.advance() # Skip [
-                    self.compile_expression()
-                    self.input_stream.advance() # Skip ]
-                    self.writer.write_arithmetic("ADD")
-                    self.writer.write_pop("POINTER", 1)
-                    self.writer.write_push("THAT", 0)
-                # If a method call
-                elif self.input_stream.symbol() == ".":
-                    if self.symbol_table.type_of(identifier):
-                        # It's a method call on an object
-                        self.input_stream.backward()
-                        self._write_subroutine_call("method")
-                    else:
-                        # It's a function call on a class
-                        self.input_stream.backward()
-                        self._write_subroutine_call("class function")
-                # If a function call on this class
-                elif self.input_stream.symbol() == "(":
-                    self.input_stream.backward()
-                    self._write_subroutine_call("local function")
-
-                # It's a variable
-                else:
-                    self._push_variable(identifier)
+            # The token after the identifier tells an array entry, a
+            # subroutine call and a plain variable apart
+            next_token = self.input_stream.peek()
+            name = self._get_identifier()
+            # If an array entry
+            if next_token == ("SYMBOL", "["):
+                self.input_stream.advance() # Skip [
+                node = ArrayRef(name, self.compile_expression())
+                self.input_stream.advance() # Skip ]
+            # If a call on a variable or a class: name.subroutineName(...)
+            elif next_token == ("SYMBOL", "."):
+                self.input_stream.advance() # Skip .
+                node = self._compile_call(name, self._get_identifier())
+            # If a method call on this object
+            elif next_token == ("SYMBOL", "("):
+                node = self._compile_call(None, name)
+            # It's a variable
+            else:
+                node = VarRef(name)
         else:
-            raise ValueError(f"Unexpected token type: {token_type}")
+            raise ValueError(f"Line {self.input_stream.line()}: Unexpected token type: {token_type}")
+        return node
 
-
-    def compile_expression_list(self) -> int:
+    def compile_expression_list(self) -> list:
         """Compiles a (possibly empty) comma-separated list of expressions.
-        return the number of expressions in the list."""
-        expression_count = 0
+        return the expressions in the list."""
+        expressions = []
         while not (self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == ")"):
-            self.compile_expression()
-            expression_count += 1
+            expressions.append(self.compile_expression())
             if self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == ",":
                 self.input_stream.advance()
-        return expression_count
+        return expressions
 
 
     def _get_keyword(self):
@@ -383,83 +314,16 @@ class CompilationEngine:
             var_type = self.input_stream.keyword()
         self.input_stream.advance()
         return var_type
-    def _define_parameter_list(self):
-        # type varName (',' type varName)* or empty
-        while not (self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == ")"):
-            type = self._get_type()
-            name = self._get_identifier()
-            if self.input_stream.token_type() == "SYMBOL" and self.input_stream.symbol() == ",":
-                self.input_stream.advance()
-            self.symbol_table.define(name, type, "ARG")
-
-
-    def _write_subroutine_call(self, subroutine_type: str):
-        """Writes a subroutine call: subroutineName(...) or (className|varName).subroutineName(...)."""
-        # First identifier: could be a class name, var name, or subroutine name
-        number_of_args = 0
-        var_type = None
-        subroutine_name = None
-        if subroutine_type == "method":
-            var_name = self._get_identifier()
-            var_type = self.symbol_table.type_of(var_name)
-            self._validate_and_skip_token('.')
-            subroutine_name = self._get_identifier()  # subroutine name after the dot
-            self._push_variable(var_name)
-            number_of_args += 1
-
-        elif subroutine_type == "class function":
-            var_type = self._get_identifier()
-            self._validate_and_skip_token('.')
-            subroutine_name = self._get_identifier()
-
-        elif subroutine_type == "local function":
-            var_type = self.class_name
-            subroutine_name = self._get_identifier()
-            self.writer.write_push("POINTER", 0)
-            number_of_args += 1
-
-        if subroutine_name == "readInt":
-            pass
 
+    def _compile_call(self, receiver, subroutine_name: str) -> Call:
+        """Compiles the (expressionList) of a subroutine call."""
         self._validate_and_skip_token('(')
-        number_of_args += self.compile_expression_list()
+        arguments = self.compile_expression_list()
         self._validate_and_skip_token(')')
-        self.writer.write_call(f"{var_type}.{subroutine_name}", number_of_args)
-
-
-
-
-    def _get_segment(self, var_name: str) -> str:
-        var_kind = self.symbol_table.kind_of(var_name)
-        if var_kind == "STATIC":
-            segment = "STATIC"
-        elif var_kind == "FIELD":
-            segment = "THIS"
-        elif var_kind == "ARG":
-            segment = "ARG"
-        elif var_kind == "VAR":
-            segment = "LOCAL"
-        else:
-            raise ValueError(f"Invalid variable kind: {var_kind}")
-        return segment
-
-    def _push_variable(self, var_name: str) -> None:
-        if self.symbol_table.kind_of(var_name) is None:
-            raise ValueError(f"Variable {var_name} not found in symbol table.")
-        segment = self._get_segment(var_name)
-        index = self.symbol_table.index_of(var_name)
-        self.writer.write_push(segment, index)
-
-    def _create_string(self, string: str) -> None:
-        self.writer.write_push("CONST", len(string))
-        self.writer.write_call("String.new", 1)
-        for char in string:
-            self.writer.write_push("CONST", ord(char))
-            self.writer.write_call("String.appendChar", 2)
+        return Call(receiver, subroutine_name, arguments)
 
     def _validate_and_skip_token(self, expected_token: str):
         current_token = self.input_stream.get_current_token()
         if current_token not in [expected_token]:
-            raise ValueError(f"Expected '{expected_token}' value got {current_token}")
+            raise ValueError(f"Line {self.input_stream.line()}: Expected '{expected_token}' value got {current_token}")
         self.input_stream.advance()
-
@@ -0,0 +1,228 @@
+"""
+Constant folding and strength reduction of Jack expressions.
+
+fold_class rewrites the expressions of a parsed class (see JackAST) in place,
+before any code is generated:
+
+- Operators applied to constants are evaluated at compile time, with the
+  16-bit wraparound of the Hack platform, so 32 * 8 compiles to a single
+  push and -1 compiles to push 1 / neg.
+- Operations that cannot change their operand (x + 0, x - 0, x | 0, x & -1,
+  x * 1, x / 1, and the same with the constant on the left where it
+  commutes) are dropped.
+- Multiplying by a power of two becomes that many shifts left (^), negated
+  for a negative factor. Dividing a variable by a power of two becomes
+  shifts right (#) of the variable plus a bias of 2^k - 1 when it is
+  negative, since Math.divide truncates towards zero and the arithmetic
+  shift rounds down.
+
+Expressions that call subroutines are never dropped or evaluated twice.
+"""
+import typing
+from JackAST import (Let, If, While, Do, Return, IntConst, KeywordConst,
+                     VarRef, ArrayRef, Call, Unary, Binary)
+
+WORD = 0xFFFF
+
+UNARY = {
+    '-': lambda x: -x,
+    '~': lambda x: ~x,
+    '^': lambda x: x << 1,
+    '#': lambda x: x >> 1,
+}
+BINARY = {
+    '+': lambda x, y: x + y,
+    '-': lambda x, y: x - y,
+    '&': lambda x, y: x & y,
+    '|': lambda x, y: x | y,
+    '=': lambda x, y: -1 if x == y else 0,
+    '<': lambda x, y: -1 if x < y else 0,
+    '>': lambda x, y: -1 if x > y else 0,
+    '*': lambda x, y: x * y,
+    '/': lambda x, y: _divide(x, y),
+}
+# Right operands that leave the left operand unchanged
+IDENTITIES = {'+': 0, '-': 0, '|': 0, '&': -1, '*': 1, '/': 1}
+# Left operands that leave the right operand unchanged
+LEFT_IDENTITIES = {'+': 0, '|': 0, '&': -1, '*': 1}
+KEYWORD_VALUES = {"TRUE": -1, "FALSE": 0, "NULL": 0}
+
+
+def _signed(value: int) -> int:
+    """Wraps value around to a signed 16-bit integer."""
+    value &= WORD
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def _divide(x: int, y: int) -> typing.Optional[int]:
+    # Math.divide truncates towards zero, and fails on a zero divisor (and
+    # overflows on -32768), so these are left for run time
+    if y == 0 or x == -0x8000 or y == -0x8000:
+        return None
+    quotient = abs(x) // abs(y)
+    return -quotient if (x < 0) != (y < 0) else quotient
+
+
+def _value(node) -> typing.Optional[int]:
+    """Returns the value of a constant expression, as a signed integer, or
+    None if node is not one of the constant shapes _constant builds.
+    """
+    if isinstance(node, IntConst):
+        return node.value
+    if isinstance(node, KeywordConst):
+        return KEYWORD_VALUES.get(node.keyword)
+    if isinstance(node, Unary) and isinstance(node.operand, IntConst) \
+            and node.op in ('-', '~'):
+        return _signed(UNARY[node.op](node.operand.value))
+    return None
+
+
+def _constant(value: int):
+    """Returns the cheapest expression that evaluates to value. Jack integer
+    constants are at most 32767, so negative values are built with - or ~.
+    """
+    value = _signed(value)
+    if value >= 0:
+        return IntConst(value)
+    if value == -0x8000:
+        return Unary('~', IntConst(0x7FFF))
+    return Unary('-', IntConst(-value))
+
+
+def _power_of_two(value: typing.Optional[int]) -> typing.Optional[int]:
+    """Returns k if abs(value) is 2^k, for 0 <= k < 15, else None."""
+    if value is None or value in (0, -0x8000):
+        return None
+    magnitude = abs(value)
+    if magnitude & (magnitude - 1):
+        return None
+    return magnitude.bit_length() - 1
+
+
+def _has_call(node) -> bool:
+    """Returns whether evaluating node may call a subroutine."""
+    if isinstance(node, Binary):
+        return node.op in ('*', '/') or _has_call(node.left) or \
+            _has_call(node.right)
+    if isinstance(node, Unary):
+        return _has_call(node.operand)
+    if isinstance(node, ArrayRef):
+        return _has_call(node.index)
+    return not isinstance(node, (IntConst, KeywordConst, VarRef))
+
+
+def _shift(node, op: str, times: int):
+    for _ in range(times):
+        node = Unary(op, node)
+    return node
+
+
+def _reduce(node: Binary, left_value: typing.Optional[int],
+            right_value: typing.Optional[int]):
+    """Replaces a multiplication or division by a power of two with shifts.
+
+    Returns:
+        the equivalent expression, or node itself if there is none.
+    """
+    if node.op == '*':
+        if right_value is None:
+            # Multiplication commutes, so the constant may be on either side
+            left_value, right_value = right_value, left_value
+            operand = node.right
+        else:
+            operand = node.left
+        if right_value == 0 and not _has_call(operand):
+            return IntConst(0)
+        shifts = _power_of_two(right_value)
+        if shifts is None:
+            return node
+        # Math.multiply keeps the low 16 bits of the product, as shifts do
+        operand = _shift(operand, '^', shifts)
+        return Unary('-', operand) if right_value < 0 else operand
+    shifts = _power_of_two(right_value)
+    if shifts == 0:
+        return Unary('-', node.left)  # x / -1
+    if shifts is None or not isinstance(node.left, (VarRef, ArrayRef)) or \
+            _has_call(node.left):
+        return node
+    # x / 2^k = (x + (x < 0 ? 2^k - 1 : 0)) >> k, as x < 0 is -1 or 0
+    bias = Binary('&', Binary('<', node.left, IntConst(0)),
+                  IntConst((1 << shifts) - 1))
+    quotient = _shift(Binary('+', node.left, bias), '#', shifts)
+    return Unary('-', quotient) if right_value < 0 else quotient
+
+
+def fold_expression(node):
+    """
+    Args:
+        node: an expression.
+
+    Returns:
+        an expression that evaluates to the same value with the same side
+        effects, with constant subexpressions evaluated and multiplication
+        and division by powers of two replaced with shifts.
+    """
+    if isinstance(node, Binary):
+        node.left = fold_expression(node.left)
+        node.right = fold_expression(node.right)
+        left_value = _value(node.left)
+        right_value = _value(node.right)
+        if left_value is not None and right_value is not None:
+            value = BINARY[node.op](left_value, right_value)
+            if value is not None:
+                return _constant(value)
+        if right_value is not None and IDENTITIES.get(node.op) == right_value:
+            return node.left
+        if left_value is not None and \
+                LEFT_IDENTITIES.get(node.op) == left_value:
+            return node.right
+        if node.op in ('*', '/'):
+            return _reduce(node, left_value, right_value)
+        return node
+    if isinstance(node, Unary):
+        node.operand = fold_expression(node.operand)
+        value = _value(node.operand)
+        if value is not None:
+            return _constant(UNARY[node.op](value))
+        if node.op in ('-', '~') and isinstance(node.operand, Unary) and \
+                node.operand.op == node.op:
+            # - - x and ~ ~ x cancel out
+            return node.operand.operand
+        return node
+    if isinstance(node, ArrayRef):
+        node.index = fold_expression(node.index)
+    elif isinstance(node, Call):
+        node.arguments = [fold_expression(argument)
+                          for argument in node.arguments]
+    return node
+
+
+def fold_statements(statements: list) -> None:
+    """Folds the expressions of statements, and of the statements nested in
+    them, in place.
+    """
+    for statement in statements:
+        if isinstance(statement, Let):
+            if statement.index is not None:
+                statement.index = fold_expression(statement.index)
+            statement.value = fold_expression(statement.value)
+        elif isinstance(statement, If):
+            statement.condition = fold_expression(statement.condition)
+            fold_statements(statement.then_statements)
+            if statement.else_statements is not None:
+                fold_statements(statement.else_statements)
+        elif isinstance(statement, While):
+            statement.condition = fold_expression(statement.condition)
+            fold_statements(statement.statements)
+        elif isinstance(statement, Do):
+            statement.call = fold_expression(statement.call)
+        elif isinstance(statement, Return) and statement.value is not None:
+            statement.value = fold_expression(statement.value)
+
+
+def fold_class(node) -> None:
+    """Folds the expressions of every subroutine of a parsed class, in
+    place.
+    """
+    for subroutine in node.subroutines:
+        fold_statements(subroutine.statements)
@@ -0,0 +1,152 @@
+"""
+Whole-program elimination of subroutines that are never called.
+
+live_subroutines resolves the target of every call in a set of parsed
+classes (see JackAST) and follows them from the entry points of a program:
+Main.main, which the OS calls, and Sys.init, which the VM bootstrap calls.
+Subroutines it does not reach can be left out of the compiled code, which is
+what lets a large game fit in ROM together with the whole OS.
+
+Calls are resolved as CodeGenerator writes them: a call on a variable goes
+to the class of its declared type, a call without a receiver to the current
+class, and any other call to the class it names. The subroutines the
+compiler calls on its own are followed too: String.new and
+String.appendChar for string literals, Math.multiply and Math.divide for *
+and /, and Memory.alloc for constructors. Calls into classes that are not
+part of the analysis (e.g. those of .vm files) cannot be followed, so the
+targets of their calls must be passed as extra roots.
+"""
+import typing
+from JackAST import (ClassNode, Subroutine, Let, If, While, Do, Return,
+                     StringConst, ArrayRef, Call, Unary, Binary)
+
+ROOTS = ["Main.main", "Sys.init"]
+STRING_CALLS = ["String.new", "String.appendChar"]
+OPERATOR_CALLS = {'*': "Math.multiply", '/': "Math.divide"}
+
+
+def _expression_calls(node, resolve: typing.Callable[[Call], str],
+                      calls: typing.Set[str]) -> None:
+    """Adds the subroutines evaluating an expression calls to calls."""
+    if isinstance(node, Call):
+        calls.add(resolve(node))
+        for argument in node.arguments:
+            _expression_calls(argument, resolve, calls)
+    elif isinstance(node, Binary):
+        if node.op in OPERATOR_CALLS:
+            calls.add(OPERATOR_CALLS[node.op])
+        _expression_calls(node.left, resolve, calls)
+        _expression_calls(node.right, resolve, calls)
+    elif isinstance(node, Unary):
+        _expression_calls(node.operand, resolve, calls)
+    elif isinstance(node, ArrayRef):
+        _expression_calls(node.index, resolve, calls)
+    elif isinstance(node, StringConst):
+        calls.update(STRING_CALLS)
+
+
+def _statement_calls(statements: list, resolve: typing.Callable[[Call], str],
+                     calls: typing.Set[str]) -> None:
+    """Adds the subroutines statements call to calls."""
+    for statement in statements:
+        if isinstance(statement, Let):
+            if statement.index is not None:
+                _expression_calls(statement.index, resolve, calls)
+            _expression_calls(statement.value, resolve, calls)
+        elif isinstance(statement, If):
+            _expression_calls(statement.condition, resolve, calls)
+            _statement_calls(statement.then_statements, resolve, calls)
+            if statement.else_statements is not None:
+                _statement_calls(statement.else_statements, resolve, calls)
+        elif isinstance(statement, While):
+            _expression_calls(statement.condition, resolve, calls)
+            _statement_calls(statement.statements, resolve, calls)
+        elif isinstance(statement, Do):
+            _expression_calls(statement.call, resolve, calls)
+        elif isinstance(statement, Return) and statement.value is not None:
+            _expression_calls(statement.value, resolve, calls)
+
+
+def subroutine_calls(class_node: ClassNode,
+                     subroutine: Subroutine) -> typing.Set[str]:
+    """
+    Returns:
+        Set[str]: the full names ("Class.subroutine") of every subroutine the
+        code of subroutine may call.
+    """
+    types = {}
+    for declaration in class_node.variables + subroutine.parameters + \
+            subroutine.locals:
+        for name in declaration.names:
+            types[name] = declaration.type
+
+    def resolve(call: Call) -> str:
+        if call.receiver is None:
+            return f"{class_node.name}.{call.name}"
+        return f"{types.get(call.receiver, call.receiver)}.{call.name}"
+
+    calls = set()
+    if subroutine.kind == "CONSTRUCTOR":
+        calls.add("Memory.alloc")
+    _statement_calls(subroutine.statements, resolve, calls)
+    return calls
+
+
+def live_subroutines(classes: typing.List[ClassNode],
+                     roots: typing.Iterable[str] = ROOTS) -> typing.Set[str]:
+    """
+    Args:
+        classes (List[ClassNode]): every class of the program.
+        roots (Iterable[str]): the subroutines the program starts from, and
+            any other subroutine that is called from outside of classes.
+
+    Returns:
+        Set[str]: the full names of the subroutines of classes that may run.
+
+    Raises:
+        ValueError: if classes has none of the roots, so that nothing of
+            them would be left.
+    """
+    subroutines = {f"{class_node.name}.{subroutine.name}":
+                   (class_node, subroutine)
+                   for class_node in classes
+                   for subroutine in class_node.subroutines}
+    pending = [name for name in roots if name in subroutines]
+    if not pending:
+        raise ValueError(f"None of {', '.join(roots)} is defined, so every "
+                         f"subroutine would be dead")
+    live = set(pending)
+    while pending:
+        for name in subroutine_calls(*subroutines[pending.pop()]):
+            if name in subroutines and name not in live:
+                live.add(name)
+                pending.append(name)
+    return live
+
+
+def vm_calls(vm_file: typing.TextIO) -> typing.Set[str]:
+    """
+    Returns:
+        Set[str]: the full names of the subroutines the VM code of vm_file
+        calls, to be passed as roots when it is part of the program.
+    """
+    calls = set()
+    for line in vm_file:
+        words = line.split("//")[0].split()
+        if len(words) == 3 and words[0] == "call":
+            calls.add(words[1])
+    return calls
+
+
+def report(classes: typing.List[ClassNode], live: typing.Set[str]) -> str:
+    """
+    Returns:
+        str: a human readable list of the subroutines of classes that are
+        not in live, in source order.
+    """
+    names = [f"{class_node.name}.{subroutine.name}"
+             for class_node in classes
+             for subroutine in class_node.subroutines]
+    lines = [f"omitted {name}" for name in names if name not in live]
+    lines.append(f"omitted {len(lines)} of {len(names)} subroutines")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,87 @@
+"""
+Subroutine calls the compiler writes in place, without a call frame.
+
+Two kinds of calls are inlined by CodeGenerator:
+
+- Calls to the OS subroutines in INTRINSICS, whose behavior the OS
+  specification fixes: Memory.peek and Memory.poke become a direct access
+  through "pointer 1" / "that 0", and Math.abs an inline test and negation.
+- Calls to trivial getters: methods that only return a field of their
+  object, and subroutines that only return a constant. These read nothing
+  but their object and have no side effects, so a call becomes a push of
+  the field or the constant. The getters of the class being compiled are
+  always known; those of other classes only when the whole program is
+  parsed (JackCompiler --whole-program).
+"""
+import typing
+from JackAST import ClassNode, Return, IntConst, KeywordConst, VarRef, Unary
+
+# The number of arguments of every OS subroutine that is lowered in place
+INTRINSICS = {"Memory.peek": 1, "Memory.poke": 2, "Math.abs": 1}
+KEYWORD_VALUES = {"TRUE": -1, "FALSE": 0, "NULL": 0}
+
+
+class Getter:
+    """A subroutine that only returns a field of its object, or a constant."""
+    __slots__ = ("is_method", "field_index", "value")
+
+    def __init__(self, is_method: bool, field_index: typing.Optional[int],
+                 value: typing.Optional[int]) -> None:
+        """
+        Args:
+            is_method (bool): whether the subroutine is a method.
+            field_index (Optional[int]): the index of the field it returns,
+                or None if it returns a constant.
+            value (Optional[int]): the constant it returns, as a signed
+                16-bit integer, or None if it returns a field.
+        """
+        self.is_method = is_method
+        self.field_index = field_index
+        self.value = value
+
+    def __repr__(self) -> str:
+        return f"Getter({self.is_method}, {self.field_index}, {self.value})"
+
+
+def _constant_value(node) -> typing.Optional[int]:
+    if isinstance(node, IntConst):
+        return node.value
+    if isinstance(node, KeywordConst):
+        return KEYWORD_VALUES.get(node.keyword)
+    if isinstance(node, Unary) and node.op == '-' and \
+            isinstance(node.operand, IntConst):
+        return -node.operand.value
+    return None
+
+
+def trivial_getters(class_node: ClassNode) -> typing.Dict[str, Getter]:
+    """
+    Returns:
+        Dict[str, Getter]: the trivial getters of a parsed class, by their
+        full name ("Class.subroutine").
+    """
+    fields = {}
+    for declaration in class_node.variables:
+        if declaration.kind == "FIELD":
+            for name in declaration.names:
+                fields[name] = len(fields)
+    getters = {}
+    for subroutine in class_node.subroutines:
+        if subroutine.kind == "CONSTRUCTOR" or subroutine.parameters or \
+                len(subroutine.statements) != 1 or \
+                not isinstance(subroutine.statements[0], Return):
+            continue
+        returned = subroutine.statements[0].value
+        is_method = subroutine.kind == "METHOD"
+        value = _constant_value(returned)
+        local_names = {name for declaration in subroutine.locals
+                       for name in declaration.names}
+        if value is not None:
+            getter = Getter(is_method, None, value)
+        elif is_method and isinstance(returned, VarRef) and \
+                returned.name in fields and returned.name not in local_names:
+            getter = Getter(True, fields[returned.name], None)
+        else:
+            continue
+        getters[f"{class_node.name}.{subroutine.name}"] = getter
+    return getters
@@ -0,0 +1,173 @@
+"""
+The abstract syntax tree of a Jack class.
+
+CompilationEngine parses a whole class into these nodes before any code is
+written, and CodeGenerator walks them to emit VM commands. Nodes only hold
+what the source says: names are not resolved yet (the code generator owns
+the symbol table), and operators are kept as their Jack symbols. Every node
+uses __slots__, so a parsed class stays small.
+
+Statements are lists of nodes, in source order. An expression is one of
+IntConst, StringConst, KeywordConst, VarRef, ArrayRef, Call, Unary and
+Binary; a chain such as a + b * c is kept left-associative, as Jack
+evaluates it: Binary("*", Binary("+", a, b), c).
+"""
+import typing
+
+
+class ClassNode:
+    __slots__ = ("name", "variables", "subroutines")
+
+    def __init__(self, name: str, variables: typing.List["VarDec"],
+                 subroutines: typing.List["Subroutine"]) -> None:
+        self.name = name
+        self.variables = variables
+        self.subroutines = subroutines
+
+
+class VarDec:
+    """Declares variables of a single kind ("STATIC", "FIELD", "ARG" or
+    "VAR") and type.
+    """
+    __slots__ = ("kind", "type", "names")
+
+    def __init__(self, kind: str, type: str, names: typing.List[str]) -> None:
+        self.kind = kind
+        self.type = type
+        self.names = names
+
+
+class Subroutine:
+    __slots__ = ("kind", "return_type", "name", "parameters", "locals",
+                 "statements")
+
+    def __init__(self, kind: str, return_type: str, name: str,
+                 parameters: typing.List[VarDec], locals: typing.List[VarDec],
+                 statements: list) -> None:
+        """
+        Args:
+            kind (str): "CONSTRUCTOR", "FUNCTION" or "METHOD".
+            return_type (str): the declared return type.
+            name (str): the name of the subroutine, without the class name.
+            parameters (List[VarDec]): the parameters, one VarDec each.
+            locals (List[VarDec]): the var declarations of the body.
+            statements (list): the statements of the body.
+        """
+        self.kind = kind
+        self.return_type = return_type
+        self.name = name
+        self.parameters = parameters
+        self.locals = locals
+        self.statements = statements
+
+
+class Let:
+    """let name = value; or let name[index] = value;"""
+    __slots__ = ("name", "index", "value")
+
+    def __init__(self, name: str, index, value) -> None:
+        self.name = name
+        self.index = index
+        self.value = value
+
+
+class If:
+    """else_statements is None when there is no else clause."""
+    __slots__ = ("condition", "then_statements", "else_statements")
+
+    def __init__(self, condition, then_statements: list,
+                 else_statements: typing.Optional[list]) -> None:
+        self.condition = condition
+        self.then_statements = then_statements
+        self.else_statements = else_statements
+
+
+class While:
+    __slots__ = ("condition", "statements")
+
+    def __init__(self, condition, statements: list) -> None:
+        self.condition = condition
+        self.statements = statements
+
+
+class Do:
+    __slots__ = ("call",)
+
+    def __init__(self, call) -> None:
+        self.call = call
+
+
+class Return:
+    """value is None for return;"""
+    __slots__ = ("value",)
+
+    def __init__(self, value) -> None:
+        self.value = value
+
+
+class IntConst:
+    __slots__ = ("value",)
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+
+class StringConst:
+    __slots__ = ("value",)
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+
+class KeywordConst:
+    """true, false, null or this, as "TRUE", "FALSE", "NULL" or "THIS"."""
+    __slots__ = ("keyword",)
+
+    def __init__(self, keyword: str) -> None:
+        self.keyword = keyword
+
+
+class VarRef:
+    __slots__ = ("name",)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class ArrayRef:
+    __slots__ = ("name", "index")
+
+    def __init__(self, name: str, index) -> None:
+        self.name = name
+        self.index = index
+
+
+class Call:
+    """A subroutine call. receiver is the name before the dot, either a
+    variable (a method call on it) or a class name (a function or
+    constructor call), and None for a method call on this object.
+    """
+    __slots__ = ("receiver", "name", "arguments")
+
+    def __init__(self, receiver: typing.Optional[str], name: str,
+                 arguments: list) -> None:
+        self.receiver = receiver
+        self.name = name
+        self.arguments = arguments
+
+
+class Unary:
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op: str, operand) -> None:
+        self.op = op
+        self.operand = operand
+
+
+class Binary:
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op: str, left, right) -> None:
+        self.op = op
+        self.left = left
+        self.right = right
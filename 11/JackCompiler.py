@@ -5,30 +5,306 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import io
 import os
 import sys
 import typing
+from BuildCache import BuildCache
+from ClassIndex import ClassIndex, class_interface, scan_interface
 from CompilationEngine import CompilationEngine
+from ConstantFolding import fold_class
+from DeadCode import ROOTS, live_subroutines, report, vm_calls
+from Inlining import Getter, trivial_getters
+from JackAST import ClassNode
 from JackTokenizer import JackTokenizer
-from SymbolTable import SymbolTable
-from VMWriter import VMWriter
+from LoopInvariants import hoist_class
+from StaticFrames import static_frames, string_literals, vm_statics
+from Stats import Stats, NO_STATS
+from VMWriter import VMWriter, VMBytecodeWriter
+
+# The modules the compiled code depends on, fingerprinted for the build cache
+COMPILER_MODULES = ["JackTokenizer.py", "CompilationEngine.py", "JackAST.py",
+                    "ClassIndex.py", "ConstantFolding.py", "DeadCode.py",
+                    "Inlining.py", "LoopInvariants.py", "StaticFrames.py",
+                    "CodeGenerator.py", "SymbolTable.py", "VMWriter.py"]
+VM_COMMANDS = {"write_push": "push", "write_pop": "pop", "write_label": "label",
+               "write_goto": "goto", "write_if": "if-goto",
+               "write_call": "call", "write_function": "function",
+               "write_return": "return"}
+
+
+class CompileOptions(typing.NamedTuple):
+    """The options the classes of a build are compiled with.
+
+    The cache of a build is keyed on them: options that apply to every class
+    the same way are part of the fingerprint of the compiler (see
+    compiler_options), and those that depend on the class are part of the
+    key of its entry (see class_key).
+    """
+    # Write the compact .vmb format instead of text
+    bytecode: bool = False
+    # Fold constant expressions, and turn multiplication and division by
+    # powers of two into shifts, see ConstantFolding
+    fold: bool = False
+    # Build every string literal once, the first time it is evaluated
+    pool_strings: bool = False
+    # The classes whose literals are never pooled, see for_class
+    no_pool: typing.FrozenSet[str] = frozenset()
+    # Write calls to OS intrinsics and to trivial getters in place, see
+    # Inlining
+    inline: bool = True
+    # Compute the address of an array entry a statement reads more than once
+    # only once, see CodeGenerator
+    cse: bool = False
+    # Move the expressions of while loops that are the same on every
+    # iteration out of the loop, see LoopInvariants
+    hoist: bool = False
+    # If given, only the subroutines it names ("Class.subroutine") are
+    # written, see DeadCode
+    live: typing.Optional[typing.Set[str]] = None
+    # The trivial getters of other classes, which may be inlined too
+    getters: typing.Optional[typing.Dict[str, Getter]] = None
+    # The static variable of the first local of every subroutine whose
+    # locals are statics, see StaticFrames
+    frames: typing.Optional[typing.Dict[str, int]] = None
+    # The subroutines of every class of the build, which calls to these
+    # classes are resolved with (--resolve-calls)
+    index: typing.Optional[ClassIndex] = None
+
+    def for_class(self, class_name: str) -> "CompileOptions":
+        """
+        Returns:
+            CompileOptions: the options to compile class_name with, which
+            only differ in pooling strings.
+        """
+        if self.pool_strings and class_name in self.no_pool:
+            return self._replace(pool_strings=False)
+        return self
+
+    def class_key(self, class_name: str) -> str:
+        """
+        Returns:
+            str: the options that affect the code of class_name and are not
+            the same for every class, for the key of its cache entry.
+        """
+        prefix = class_name + "."
+        key = f"pool_strings={self.for_class(class_name).pool_strings}"
+        if self.live is not None:
+            key += " live=" + ",".join(sorted(
+                name for name in self.live if name.startswith(prefix)))
+        if self.getters:
+            key += f" getters={sorted(self.getters.items())}"
+        if self.frames:
+            key += " frames=" + ",".join(sorted(
+                f"{name}:{first}" for name, first in self.frames.items()
+                if name.startswith(prefix)))
+        if self.index is not None:
+            # Calls depend on the interfaces of the classes they go to
+            key += f" index={self.index.digest()}"
+        return key
 
 
 def compile_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.IO,
+        options: CompileOptions = CompileOptions(),
+        stats: Stats = NO_STATS) -> ClassNode:
     """Compiles a single file.
 
     Args:
         input_file (typing.TextIO): the file to compile.
-        output_file (typing.TextIO): writes all output to this file.
+        output_file (typing.IO): writes all output to this file. With
+            options.bytecode, it is a binary file.
+        options (CompileOptions): how to compile it. options.pool_strings is
+            taken as it is, see CompileOptions.for_class.
+        stats (Stats): collects statistics about the compilation.
+
+    Returns:
+        ClassNode: the parsed class.
     """
     # Your code goes here!
     # This function should be relatively similar to "analyze_file" in
     # JackAnalyzer.py from the previous project.
+    destination = output_file
+    if stats.enabled and not options.bytecode:
+        # The code is buffered, so writing it is timed as a phase of its own
+        output_file = io.StringIO()
+    # Tokens are read as the engine asks for them, so tokenizing is timed
+    # as part of the "compile" phase
     tokenizer = JackTokenizer(input_file)
     tokenizer.advance()
-    engine = CompilationEngine(tokenizer, output_file)
-    engine.compile_class()
+    writer = VMBytecodeWriter(output_file) if options.bytecode \
+        else VMWriter(output_file)
+    engine = CompilationEngine(tokenizer, output_file, writer)
+    if options.fold:
+        engine.passes.append(fold_class)
+    if options.hoist:
+        engine.passes.append(hoist_class)
+    engine.generator.pool_strings = options.pool_strings
+    engine.generator.live = options.live
+    engine.generator.inline = options.inline
+    engine.generator.getters = dict(options.getters or {})
+    engine.generator.cse = options.cse
+    engine.generator.static_frames = dict(options.frames or {})
+    engine.generator.index = options.index
+    if stats.enabled:
+        count_commands(engine, stats)
+    with stats.phase("compile"):
+        class_node = engine.compile_class()
+    with stats.phase("write"):
+        writer.close()
+        if output_file is not destination:
+            destination.write(output_file.getvalue())
+    if stats.enabled:
+        stats.count("files")
+        stats.count("tokens", tokenizer.token_count)
+        if options.cse:
+            stats.count("cse_eliminated_ops", engine.generator.cse_eliminated)
+        symbol_table = engine.symbol_table
+        stats.table_size("class", len(symbol_table.class_variables))
+        stats.table_size("subroutine", len(symbol_table.subroutine_variables))
+    return class_node
+
+
+def parse_file(input_file: typing.TextIO,
+               options: CompileOptions = CompileOptions()) -> ClassNode:
+    """Parses a single file, without writing any code.
+
+    Args:
+        input_file (typing.TextIO): the file to parse.
+        options (CompileOptions): the passes of options (fold, hoist) are
+            run over the class, as compile_file would run them.
+
+    Returns:
+        ClassNode: the parsed class.
+    """
+    tokenizer = JackTokenizer(input_file)
+    tokenizer.advance()
+    class_node = CompilationEngine(tokenizer, None).parse_class()
+    if options.fold:
+        fold_class(class_node)
+    if options.hoist:
+        hoist_class(class_node)
+    return class_node
+
+
+def compile_path(input_path: str, options: CompileOptions, stats: Stats,
+                 cache: typing.Optional[BuildCache] = None) -> Stats:
+    """Compiles the .jack file at input_path into a .vm (or .vmb) file next
+    to it. Also runs in the worker processes of --jobs.
+
+    Args:
+        input_path (str): the file to compile.
+        options (CompileOptions): the options of the build.
+        stats (Stats): collects statistics about the compilation.
+        cache (Optional[BuildCache]): if given, the output is copied from
+            this cache when the class did not change, and stored in it when
+            it did.
+
+    Returns:
+        Stats: stats, with the wall time of the file as a phase of its own.
+    """
+    filename, extension = os.path.splitext(input_path)
+    class_name = os.path.basename(filename)
+    bytecode = options.bytecode
+    output_path = filename + (".vmb" if bytecode else ".vm")
+    with stats.phase(f"file.{os.path.basename(input_path)}"):
+        if cache is None:
+            with open(input_path, 'r') as input_file, \
+                    open(output_path, 'wb' if bytecode else 'w') as output_file:
+                compile_file(input_file, output_file,
+                             options.for_class(class_name), stats)
+            return stats
+        with open(input_path, 'r') as input_file:
+            source = input_file.read()
+        key = cache.key(source, options.class_key(class_name))
+        output = cache.get(key)
+        if output is None:
+            stats.count("cache_misses")
+            output_file = io.BytesIO() if bytecode else io.StringIO()
+            class_node = compile_file(io.StringIO(source), output_file,
+                                      options.for_class(class_name), stats)
+            output = output_file.getvalue()
+            if not bytecode:
+                output = output.encode()
+            cache.put(key, output)
+            cache.record_interface(class_interface(class_node), source)
+        else:
+            stats.count("cache_hits")
+        if bytecode:
+            with open(output_path, 'wb') as output_file:
+                output_file.write(output)
+        else:
+            with open(output_path, 'w') as output_file:
+                output_file.write(output.decode())
+    return stats
+
+
+def compiler_options(options: CompileOptions) -> str:
+    """
+    Returns:
+        str: a fingerprint of the compiler and of the options every file is
+        compiled with, so cached classes are dropped whenever either changes.
+    """
+    # Only needed with --cache, so it does not slow down the start of every run
+    import hashlib
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in COMPILER_MODULES:
+        with open(os.path.join(directory, module), 'rb') as source:
+            digest.update(source.read())
+    return f"{digest.hexdigest()} bytecode={options.bytecode} " \
+        f"fold={options.fold} inline={options.inline} cse={options.cse} " \
+        f"hoist={options.hoist}"
+
+
+def compile_in_parallel(input_paths: typing.List[str], jobs: int,
+                        options: CompileOptions, stats: Stats,
+                        cache: typing.Optional[BuildCache] = None) -> bool:
+    """Compiles every file in a pool of worker processes. Classes do not
+    depend on each other's code, so they compile in any order; errors are
+    still reported in the order of input_paths.
+
+    Returns:
+        bool: True if every file compiled.
+    """
+    # Only needed with --jobs, so it does not slow down the start of every run
+    from concurrent.futures import ProcessPoolExecutor
+    succeeded = True
+    with ProcessPoolExecutor(jobs or None) as executor:
+        futures = [executor.submit(
+            compile_path, input_path, options, Stats(stats.tool)
+            if stats.enabled else NO_STATS, cache)
+            for input_path in input_paths]
+        for input_path, future in zip(input_paths, futures):
+            try:
+                stats.merge(future.result())
+            except Exception as error:
+                succeeded = False
+                report_error(input_path, error)
+    return succeeded
+
+
+def report_error(input_path: str, error: Exception) -> None:
+    """Prints why input_path failed to compile, in one line, without the
+    traceback. The other files are still compiled, the same way with and
+    without --jobs.
+    """
+    print(f"{input_path}: {type(error).__name__}: {error}", file=sys.stderr)
+
+
+def count_commands(engine: CompilationEngine, stats: Stats) -> None:
+    """Makes engine count the VM commands it writes by type, and record the
+    size of every subroutine's symbol table before the next one starts.
+    """
+    for method_name, name in VM_COMMANDS.items():
+        stats.wrap(engine.writer, method_name,
+                   lambda *args, name=name: stats.count(f"commands.{name}"))
+    stats.wrap(engine.writer, "write_arithmetic",
+               lambda command: stats.count(f"commands.{command.lower()}"))
+    symbol_table = engine.symbol_table
+    stats.wrap(symbol_table, "start_subroutine", lambda: stats.table_size(
+        "subroutine", len(symbol_table.subroutine_variables)))
 
 
 if "__main__" == __name__:
@@ -37,20 +313,168 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: JackCompiler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(
+        prog="JackCompiler", usage="JackCompiler <input path> [options]")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--bytecode", action="store_true",
+        help="write compact binary .vmb files instead of text .vm files")
+    arg_parser.add_argument(
+        "--fold", action="store_true",
+        help="evaluate constant expressions at compile time, and turn "
+             "multiplication and division by powers of two into shifts")
+    arg_parser.add_argument(
+        "--pool-strings", action="store_true",
+        help="build each string literal once, on its first evaluation, and "
+             "reuse that String afterwards; code that changes or disposes of "
+             "literals must opt out with --no-pool")
+    arg_parser.add_argument(
+        "--no-pool", action="append", default=[], metavar="CLASS",
+        help="keep building a new String on every evaluation of the "
+             "literals of CLASS, with --pool-strings (may be repeated)")
+    arg_parser.add_argument(
+        "--no-inline", dest="inline", action="store_false",
+        help="write every call as a call, instead of lowering Memory.peek, "
+             "Memory.poke, Math.abs and trivial getters in place")
+    arg_parser.add_argument(
+        "--cse", action="store_true",
+        help="compute the address of an array entry a statement reads more "
+             "than once only once, in statements that call nothing; with "
+             "--stats, the VM commands saved are counted as "
+             "cse_eliminated_ops")
+    arg_parser.add_argument(
+        "--hoist", action="store_true",
+        help="compute the expressions of a while loop that are the same on "
+             "every iteration once, into new locals, before the loop")
+    arg_parser.add_argument(
+        "--resolve-calls", action="store_true",
+        help="resolve every call against the subroutines of the input "
+             "classes (see ClassIndex): functions of the class called without "
+             "a receiver are not passed this, methods called through the "
+             "class name are called on this, and calls that do not match the "
+             "subroutine are errors; compiling a single file only knows the "
+             "subroutines of its own class")
+    arg_parser.add_argument(
+        "--whole-program", action="store_true",
+        help="compile the input as a whole program: leave out every "
+             "subroutine that cannot be reached from Main.main or Sys.init, "
+             "list them, and inline trivial getters across classes")
+    arg_parser.add_argument(
+        "--static-frames", action="store_true",
+        help="with --whole-program, keep the locals of subroutines that "
+             "never recurse in static variables, which are accessed "
+             "directly, instead of in their stack frames")
+    arg_parser.add_argument(
+        "--cache", nargs="?", const="", metavar="DIR",
+        help="reuse the output of unchanged classes, stored in DIR with the "
+             "signatures of every class (default: .jackcache next to the "
+             "input files)")
+    arg_parser.add_argument(
+        "--jobs", "-j", nargs="?", type=int, default=1, const=0, metavar="N",
+        help="compile the files in N worker processes (default: one per "
+             "CPU); errors are reported in file order")
+    arg_parser.add_argument(
+        "--stats", nargs="?", const="-", metavar="FILE",
+        help="write statistics about the compilation as JSON to FILE "
+             "(default: stdout)")
+    args = arg_parser.parse_args()
+    if args.static_frames and not args.whole_program:
+        arg_parser.error("--static-frames needs --whole-program")
+    stats = Stats("JackCompiler") if args.stats is not None else NO_STATS
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
             for filename in os.listdir(argument_path)]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".jack":
-            continue
-        output_path = filename + ".vm"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            compile_file(input_file, output_file)
+    input_paths = [input_path for input_path in files_to_assemble
+                   if os.path.splitext(input_path)[1].lower() == ".jack"]
+    options = CompileOptions(
+        bytecode=args.bytecode, fold=args.fold,
+        pool_strings=args.pool_strings, no_pool=frozenset(args.no_pool),
+        inline=args.inline, cse=args.cse, hoist=args.hoist)
+    cache = None
+    if args.cache is not None:
+        input_directory = argument_path if os.path.isdir(argument_path) \
+            else os.path.dirname(argument_path)
+        cache = BuildCache(
+            args.cache or os.path.join(input_directory, ".jackcache"),
+            compiler_options(options))
+    live = None
+    if args.whole_program:
+        # Every class is parsed up front, to find what the program calls
+        with stats.phase("analyze"):
+            classes = []
+            for input_path in input_paths:
+                with open(input_path, 'r') as input_file:
+                    classes.append(parse_file(input_file, options))
+            # Hand-written .vm files may call into the compiled classes
+            external = set()
+            reserved = 0
+            jack_files = {os.path.splitext(path)[0] for path in input_paths}
+            for path in files_to_assemble:
+                filename, extension = os.path.splitext(path)
+                if extension.lower() == ".vm" and filename not in jack_files:
+                    with open(path, 'r') as vm_file:
+                        external.update(vm_calls(vm_file))
+                        vm_file.seek(0)
+                        reserved += vm_statics(vm_file)
+            live = live_subroutines(classes, external.union(ROOTS))
+            options = options._replace(live=live)
+            if args.inline:
+                # Getters of every class are known, so calls to them are
+                # inlined across classes too
+                getters = {}
+                for class_node in classes:
+                    getters.update(trivial_getters(class_node))
+                options = options._replace(getters=getters)
+            if args.static_frames:
+                reserved += sum(
+                    string_literals(class_node) for class_node in classes
+                    if options.for_class(class_node.name).pool_strings)
+                frames = static_frames(classes, external, reserved, live)
+                options = options._replace(frames=frames)
+                stats.count("static_frames", len(frames))
+    if args.resolve_calls:
+        # Every call is resolved against the interfaces of all the classes
+        index = ClassIndex()
+        with stats.phase("index"):
+            if live is not None:
+                for class_node in classes:
+                    index.add(class_interface(class_node))
+            else:
+                for input_path in input_paths:
+                    with open(input_path, 'r') as input_file:
+                        source = input_file.read()
+                    class_name = os.path.splitext(
+                        os.path.basename(input_path))[0]
+                    interface = None if cache is None else \
+                        cache.interface(class_name, source)
+                    if interface is None:
+                        interface = scan_interface(io.StringIO(source))
+                        if cache is not None:
+                            cache.record_interface(interface, source)
+                    index.add(interface)
+        options = options._replace(index=index)
+    succeeded = True
+    if args.jobs != 1 and len(input_paths) > 1:
+        succeeded = compile_in_parallel(input_paths, args.jobs, options,
+                                        stats, cache)
+    else:
+        for input_path in input_paths:
+            try:
+                compile_path(input_path, options, stats, cache)
+            except Exception as error:
+                succeeded = False
+                report_error(input_path, error)
+    if live is not None:
+        stats.count("omitted_subroutines", sum(
+            len(class_node.subroutines) for class_node in classes) - len(live))
+        # Keeps stdout valid JSON when the statistics are written there
+        print(report(classes, live), end="",
+              file=sys.stderr if args.stats == "-" else sys.stdout)
+    if stats.enabled:
+        stats.dump(args.stats)
+    if not succeeded:
+        sys.exit(1)
@@ -7,12 +7,31 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import re
 import typing
-from typing import List
 SYMBOLS = r'()[\]{}.,;+\-*/&|<>=~^#'
 KEYWORDS = ["class", "constructor", "function", "method", "field",
                         "static", "var", "int", "char", "boolean", "void",
                         "true", "false", "null", "this", "let", "do", "if",
                         "else", "while", "return"]
+# Scans a block of whole lines of the source left to right. Every match is
+# the whitespace and comments before a token, then either the start of a
+# comment that goes on past the block, or the token itself: a string constant
+# with its quotes, a word, or a single symbol (any other character becomes a
+# symbol of its own, for the parser to reject). A word that starts with a
+# digit is matched whole, so that "123abc" is an error rather than an integer
+# and an identifier. Comments only match where they start, so "//" inside a
+# string constant stays part of the string. Both groups are empty for the
+# whitespace at the end of the block. Whitespace is matched in runs, between
+# the comments, which is faster than one character at a time.
+TOKEN_PATTERN = re.compile(
+    r'(\s*(?:(?://[^\n]*|/\*.*?\*/)\s*)*)'
+    r'(?:(/\*)|("[^"\n]*"|[A-Za-z_]\w*|\d\w*|[' + SYMBOLS + r']|\S)|\Z)',
+    re.DOTALL)
+# Roughly how many characters of the source are read and scanned at once
+BLOCK_SIZE = 1 << 16
+# The (kind, value) of every keyword and symbol; other tokens are
+# classified by JackTokenizer._classify
+FIXED_TOKENS = {**{keyword: ("KEYWORD", keyword.upper()) for keyword in KEYWORDS},
+                **{symbol: ("SYMBOL", symbol) for symbol in "()[]{}.,;+-*/&|<>=~^#"}}
 
 
 class JackTokenizer:
@@ -106,12 +125,19 @@ class JackTokenizer:
             input_stream (typing.TextIO): input stream.
         """
         # Your code goes here!
-        # A good place to start is to read all the lines of the input:
-        input_stream = input_stream.read()
-        input_stream = self._remove_comments(input_stream)
-        input_stream = self._seperate_symbols(input_stream)
-        self.tokens = self._tokenize(input_stream)
-        self.current_token_idx = -1
+        # Tokens are read lazily, a block of lines of the input at a time, and
+        # are only kept until they are consumed: the window holds the current
+        # token, the rest of its block, and more if peek() had to look
+        # further. It is kept in parallel lists: for each token its kind (what
+        # token_type() returns), its value (what the matching accessor
+        # returns) and the line it is on.
+        self.token_count = 0
+        self._blocks = self._scan(input_stream)
+        self._kinds = []
+        self._values = []
+        self._lines = []
+        self._position = -1
+        self._window_size = 0
 
 
     def has_more_tokens(self) -> bool:
@@ -121,14 +147,56 @@ class JackTokenizer:
             bool: True if there are more tokens, False otherwise.
         """
         # Your code goes here!
-        return self.current_token_idx < len(self.tokens) - 1
+        return self._position + 1 < self._window_size or self._fill(1)
 
     def advance(self) -> None:
         """Gets the next token from the input and makes it the current token.
         This method should be called if has_more_tokens() is true. 
         Initially there is no current token.
         """
-        self.current_token_idx += 1
+        self._position += 1
+        if self._position >= self._window_size:
+            self._fill(0)
+
+    def peek(self, n: int = 1) -> typing.Optional[
+            typing.Tuple[str, typing.Union[str, int]]]:
+        """Looks at a token after the current one, without advancing.
+
+        Args:
+            n (int): how far ahead to look, 1 for the very next token.
+
+        Returns:
+            Optional[Tuple[str, Union[str, int]]]: the kind and value of that
+            token, or None if the input ends before it.
+        """
+        if self._position + n >= self._window_size and not self._fill(n):
+            return None
+        index = self._position + n
+        return self._kinds[index], self._values[index]
+
+    def _fill(self, n: int) -> bool:
+        """Drops the tokens before the current one from the window, then
+        reads blocks into it until it holds the token n after the current one.
+
+        Returns:
+            bool: False if the input ended first.
+        """
+        kinds, values, lines = self._kinds, self._values, self._lines
+        if self._position > 0:
+            del kinds[:self._position]
+            del values[:self._position]
+            del lines[:self._position]
+            self._position = 0
+            self._window_size = len(kinds)
+        while len(kinds) <= self._position + n:
+            block = next(self._blocks, None)
+            if block is None:
+                return False
+            kinds.extend(block[0])
+            values.extend(block[1])
+            lines.extend(block[2])
+            self._window_size = len(kinds)
+        return True
 
     def token_type(self) -> str:
         """
@@ -136,17 +204,7 @@ class JackTokenizer:
             str: the type of the current token, can be
             "KEYWORD", "SYMBOL", "IDENTIFIER", "INT_CONST", "STRING_CONST"
         """
-        token = self.tokens[self.current_token_idx]
-        if token in SYMBOLS:
-            return "SYMBOL"
-        if token.isdigit():
-            return "INT_CONST"
-        if token.startswith('"') and token.endswith('"'):
-            return "STRING_CONST"
-        if token in KEYWORDS :
-                return "KEYWORD"
-        # else it must be an identifier
-        return "IDENTIFIER"
+        return self._kinds[self._position]
 
 
 
@@ -160,8 +218,7 @@ class JackTokenizer:
             "BOOLEAN", "CHAR", "VOID", "VAR", "STATIC", "FIELD", "LET", "DO", 
             "IF", "ELSE", "WHILE", "RETURN", "TRUE", "FALSE", "NULL", "THIS"
         """
-        token = self.tokens[self.current_token_idx]
-        return token.upper()
+        return self._values[self._position]
 
     def symbol(self) -> str:
         """
@@ -172,7 +229,7 @@ class JackTokenizer:
             symbol: '{' | '}' | '(' | ')' | '[' | ']' | '.' | ',' | ';' | '+' | 
               '-' | '*' | '/' | '&' | '|' | '<' | '>' | '=' | '~' | '^' | '#'
         """
-        return self.tokens[self.current_token_idx]
+        return self._values[self._position]
 
     def identifier(self) -> str:
         """
@@ -184,7 +241,7 @@ class JackTokenizer:
                   starting with a digit. You can assume keywords cannot be
                   identifiers, so 'self' cannot be an identifier, etc'.
         """
-        return self.tokens[self.current_token_idx]
+        return self._values[self._position]
 
     def int_val(self) -> int:
         """
@@ -194,7 +251,7 @@ class JackTokenizer:
             Recall that integerConstant was defined in the grammar like so:
             integerConstant: A decimal number in the range 0-32767.
         """
-        return int(self.tokens[self.current_token_idx])
+        return self._values[self._position]
 
     def string_val(self) -> str:
         """
@@ -205,54 +262,88 @@ class JackTokenizer:
             StringConstant: '"' A sequence of Unicode characters not including 
                       double quote or newline '"'
         """
-        return self.tokens[self.current_token_idx][1:-1]
-
-    def _remove_comments(self, stream: str) -> str:
-        while "/*" in stream and "*/" in stream:
-            start = stream.index("/*")
-            end = stream.index("*/", start) + 2
-            stream = stream[:start] + stream[end:]
-        while "//" in stream:
-            start = stream.index("//")
-            end = stream.find("\n", start)
-            stream = stream[:start] + stream[end:] if end != -1 else stream[:start]
-        while "/**" in stream and "*/" in stream:
-            start = stream.index("/**")
-            end = stream.index("*/", start) + 2
-            stream = stream[:start] + stream[end:]
-        return stream.strip()
-
-    def _tokenize(self, input_stream: str) -> List[str]:
-        # This regex matches string constants or non-whitespace sequences
-        pattern = r'"[^"\n]*"|[^\s]+'
-        tokens = re.findall(pattern, input_stream)
-        return tokens
-
-    def _seperate_symbols(self, input_stream: str) -> str:
-        res = ""
-        is_string = False
-        for char in input_stream:
-            if char == '"':
-                is_string = not is_string
-            if char in SYMBOLS and not is_string:
-                res += f"\n{char}\n"
-            else:
-                res += char
-        return res
-
-    def backward(self) -> None:
-        self.current_token_idx -= 1
-
-    def get_current_token(self) -> str:
-        token = None
-        if self.token_type() == "IDENTIFIER":
-            token = self.identifier()
-        elif self.token_type() == "KEYWORD":
-            token = self.keyword()
-        elif self.token_type() == "SYMBOL":
-            token = self.symbol()
-        elif self.token_type() == "INT_CONST":
-            token = self.int_val()
-        elif self.token_type() == "STRING_CONST":
-            token = self.string_val()
-        return token
+        return self._values[self._position]
+
+    def _scan(self, input_stream: typing.TextIO) -> typing.Iterator[
+            typing.Tuple[list, list, list]]:
+        """Yields the kinds, values and lines of the tokens of the input, in
+        lists per block of lines.
+        """
+        # Identifiers repeat a lot, so each one is only classified once
+        known = dict(FIXED_TOKENS)
+        in_comment = False
+        line = 1
+        # No token spans lines, so blocks of whole lines are scanned alone;
+        # only a block comment can go on into the next block
+        for block in self._read_blocks(input_stream):
+            kinds, values, lines = [], [], []
+            next_line = line + block.count("\n")
+            if in_comment:
+                end = block.find("*/")
+                if end == -1:
+                    line = next_line
+                    continue
+                line += block.count("\n", 0, end)
+                block = block[end + 2:]
+                in_comment = False
+            for skipped, comment_start, token in TOKEN_PATTERN.findall(block):
+                if skipped:
+                    line += skipped.count("\n")
+                if comment_start:
+                    # The rest of the block is inside the comment
+                    in_comment = True
+                    break
+                if not token:
+                    continue
+                if token == '"':
+                    # A string constant must end on the line it starts on
+                    raise ValueError(f"Line {line}: unterminated string "
+                                     f"constant")
+                kind_value = known.get(token)
+                if kind_value is None:
+                    if token[0].isdigit() and not token.isdigit():
+                        raise ValueError(f"Line {line}: {token!r} is neither "
+                                         f"an integer nor an identifier")
+                    kind_value = known[token] = self._classify(token)
+                kinds.append(kind_value[0])
+                values.append(kind_value[1])
+                lines.append(line)
+            self.token_count += len(kinds)
+            yield kinds, values, lines
+            line = next_line
+
+    @staticmethod
+    def _read_blocks(input_stream: typing.TextIO) -> typing.Iterator[str]:
+        """Yields the input in blocks of whole lines."""
+        partial_line = ""
+        while True:
+            data = input_stream.read(BLOCK_SIZE)
+            if not data:
+                break
+            end = data.rfind("\n") + 1
+            if end == 0:
+                partial_line += data
+                continue
+            yield partial_line + data[:end]
+            partial_line = data[end:]
+        if partial_line:
+            yield partial_line
+
+    @staticmethod
+    def _classify(token: str) -> typing.Tuple[str, typing.Union[str, int]]:
+        if token[0] == '"':
+            return "STRING_CONST", token[1:-1]
+        if token.isdigit():
+            return "INT_CONST", int(token)
+        return "IDENTIFIER", token
+
+    def get_current_token(self) -> typing.Union[str, int]:
+        return self._values[self._position]
+
+    def line(self) -> int:
+        """
+        Returns:
+            int: the line of the source the current token is on, counting
+            from 1, for error messages.
+        """
+        return self._lines[self._position]
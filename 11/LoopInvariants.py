@@ -0,0 +1,284 @@
+"""
+Loop-invariant code motion for while loops.
+
+hoist_class rewrites the subroutines of a parsed class (see JackAST) in
+place, before any code is generated. In every while loop, each expression
+that computes the same value on every iteration is evaluated once, into a
+fresh local variable, right before the loop, and the loop reads that
+variable instead. An expression is invariant if it is built only from
+constants, from variables the loop does not assign, and from operators and
+calls to the OS functions in PURE_CALLS on such expressions. A static or a
+field also counts as assigned when the loop calls any other subroutine, as
+it may change them; array entries are never invariant, as any store or
+call may change them. Only expressions with a call, or with two operators
+or more, are worth a variable of their own.
+
+Expressions are only moved when that cannot change what the program does:
+
+- Math.divide and Math.sqrt (and so /) fail on some arguments, while the
+  loop might never evaluate them. They are only moved out of the condition
+  of the loop, which is evaluated before anything else in it, and only when
+  the condition calls no other subroutine that could run first.
+- String literals build a new String every time, so they are never moved.
+
+Loops are processed from the outside in, so an expression moves out of as
+many nested loops as it is invariant in.
+"""
+import typing
+from JackAST import (ClassNode, Subroutine, VarDec, Let, If, While, Do,
+                     Return, IntConst, KeywordConst, VarRef, ArrayRef, Call,
+                     Unary, Binary)
+
+# The OS functions whose value depends only on their arguments, and which
+# change nothing
+PURE_CALLS = {"Math.multiply", "Math.divide", "Math.abs", "Math.min",
+              "Math.max", "Math.sqrt"}
+# Those of PURE_CALLS that fail (through Sys.error) on some arguments
+PARTIAL_CALLS = {"Math.divide", "Math.sqrt"}
+OPERATOR_CALLS = {'*': "Math.multiply", '/': "Math.divide"}
+
+
+class _Scope:
+    """What is known about the variables of a subroutine."""
+
+    def __init__(self, subroutine: Subroutine) -> None:
+        self.subroutine = subroutine
+        # Parameters and locals, which only the subroutine itself changes
+        self.own = {name for declaration in subroutine.parameters +
+                    subroutine.locals for name in declaration.names}
+        self.count = 0
+
+    def call_name(self, node: Call) -> typing.Optional[str]:
+        """Returns the full name of a function call, or None if node is a
+        method call.
+        """
+        if node.receiver is None or node.receiver in self.own:
+            return None
+        return f"{node.receiver}.{node.name}"
+
+    def new_local(self) -> str:
+        # The % keeps it apart from every Jack identifier
+        self.count += 1
+        name = f"%{self.count}"
+        self.own.add(name)
+        self.subroutine.locals.append(VarDec("VAR", "int", [name]))
+        return name
+
+
+def _expressions(statements: list) -> typing.Iterator:
+    """Yields the expressions of statements and of the statements nested in
+    them.
+    """
+    for statement in statements:
+        if isinstance(statement, Let):
+            if statement.index is not None:
+                yield statement.index
+            yield statement.value
+        elif isinstance(statement, If):
+            yield statement.condition
+            yield from _expressions(statement.then_statements)
+            if statement.else_statements is not None:
+                yield from _expressions(statement.else_statements)
+        elif isinstance(statement, While):
+            yield statement.condition
+            yield from _expressions(statement.statements)
+        elif isinstance(statement, Do):
+            yield statement.call
+        elif isinstance(statement, Return) and statement.value is not None:
+            yield statement.value
+
+
+def _assigned(statements: list, names: typing.Set[str]) -> None:
+    """Adds the variables statements assign to names."""
+    for statement in statements:
+        if isinstance(statement, Let) and statement.index is None:
+            names.add(statement.name)
+        elif isinstance(statement, If):
+            _assigned(statement.then_statements, names)
+            if statement.else_statements is not None:
+                _assigned(statement.else_statements, names)
+        elif isinstance(statement, While):
+            _assigned(statement.statements, names)
+
+
+def _impure_calls(node, scope: _Scope) -> bool:
+    """Returns whether evaluating node may call a subroutine that is not one
+    of PURE_CALLS.
+    """
+    if isinstance(node, Call):
+        return scope.call_name(node) not in PURE_CALLS or \
+            any(_impure_calls(argument, scope) for argument in node.arguments)
+    if isinstance(node, Binary):
+        return _impure_calls(node.left, scope) or \
+            _impure_calls(node.right, scope)
+    if isinstance(node, Unary):
+        return _impure_calls(node.operand, scope)
+    if isinstance(node, ArrayRef):
+        return _impure_calls(node.index, scope)
+    return not isinstance(node, (IntConst, KeywordConst, VarRef))
+
+
+def _key(node) -> tuple:
+    """Returns a key that is the same for invariant expressions that compute
+    the same value.
+    """
+    if isinstance(node, IntConst):
+        return "int", node.value
+    if isinstance(node, KeywordConst):
+        return "keyword", node.keyword
+    if isinstance(node, VarRef):
+        return "var", node.name
+    if isinstance(node, Unary):
+        return node.op, _key(node.operand)
+    if isinstance(node, Binary):
+        return node.op, _key(node.left), _key(node.right)
+    return ("call", node.receiver, node.name) + \
+        tuple(_key(argument) for argument in node.arguments)
+
+
+def _operators(node) -> int:
+    """Returns the number of operators and calls of an expression."""
+    if isinstance(node, Unary):
+        return 1 + _operators(node.operand)
+    if isinstance(node, Binary):
+        return 1 + _operators(node.left) + _operators(node.right)
+    if isinstance(node, Call):
+        return 1 + sum(_operators(argument) for argument in node.arguments)
+    return 0
+
+
+def _worth_moving(node) -> bool:
+    """Returns whether an invariant expression costs enough on every
+    iteration to be moved: the variable that replaces it must be set before
+    the loop, which the loop may not repay if it runs only a few times.
+    """
+    if isinstance(node, Call) or (isinstance(node, Binary) and
+                                  node.op in OPERATOR_CALLS):
+        return True
+    return _operators(node) >= 2
+
+
+class _Loop:
+    """Moves the invariant expressions out of a single while loop."""
+
+    def __init__(self, loop: While, scope: _Scope) -> None:
+        self.scope = scope
+        self.assigned = set()
+        _assigned(loop.statements, self.assigned)
+        body = [loop.condition] + list(_expressions(loop.statements))
+        self.calls = any(_impure_calls(node, scope) for node in body)
+        # The statements that compute the moved expressions, by their key
+        self.hoisted = {}
+
+    def invariant(self, node, partial: bool) -> bool:
+        """Returns whether node computes the same value on every iteration,
+        and may be evaluated before the loop.
+
+        Args:
+            node: an expression of the loop.
+            partial (bool): whether node may call PARTIAL_CALLS.
+        """
+        if isinstance(node, (IntConst, KeywordConst)):
+            return True
+        if isinstance(node, VarRef):
+            return node.name not in self.assigned and \
+                (node.name in self.scope.own or not self.calls)
+        if isinstance(node, Unary):
+            return self.invariant(node.operand, partial)
+        if isinstance(node, Binary):
+            if OPERATOR_CALLS.get(node.op) in PARTIAL_CALLS and not partial:
+                return False
+            return self.invariant(node.left, partial) and \
+                self.invariant(node.right, partial)
+        if isinstance(node, Call):
+            name = self.scope.call_name(node)
+            if name not in PURE_CALLS or \
+                    (name in PARTIAL_CALLS and not partial):
+                return False
+            return all(self.invariant(argument, partial)
+                       for argument in node.arguments)
+        return False
+
+    def hoist(self, node, partial: bool):
+        """Moves the largest invariant parts of an expression out of the
+        loop.
+
+        Returns:
+            the expression to evaluate in the loop instead of node.
+        """
+        if self.invariant(node, partial):
+            if not _worth_moving(node):
+                return node
+            key = _key(node)
+            if key not in self.hoisted:
+                self.hoisted[key] = Let(self.scope.new_local(), None, node)
+            return VarRef(self.hoisted[key].name)
+        if isinstance(node, Unary):
+            node.operand = self.hoist(node.operand, partial)
+        elif isinstance(node, Binary):
+            node.left = self.hoist(node.left, partial)
+            node.right = self.hoist(node.right, partial)
+        elif isinstance(node, Call):
+            node.arguments = [self.hoist(argument, partial)
+                              for argument in node.arguments]
+        elif isinstance(node, ArrayRef):
+            node.index = self.hoist(node.index, partial)
+        return node
+
+    def hoist_statements(self, statements: list) -> None:
+        for statement in statements:
+            if isinstance(statement, Let):
+                if statement.index is not None:
+                    statement.index = self.hoist(statement.index, False)
+                statement.value = self.hoist(statement.value, False)
+            elif isinstance(statement, If):
+                statement.condition = self.hoist(statement.condition, False)
+                self.hoist_statements(statement.then_statements)
+                if statement.else_statements is not None:
+                    self.hoist_statements(statement.else_statements)
+            elif isinstance(statement, While):
+                statement.condition = self.hoist(statement.condition, False)
+                self.hoist_statements(statement.statements)
+            elif isinstance(statement, Do):
+                statement.call = self.hoist(statement.call, False)
+            elif isinstance(statement, Return) and \
+                    statement.value is not None:
+                statement.value = self.hoist(statement.value, False)
+
+
+def hoist_statements(statements: list, scope: _Scope) -> list:
+    """
+    Returns:
+        list: statements, with the invariant expressions of every loop in
+        them moved out of it.
+    """
+    result = []
+    for statement in statements:
+        if isinstance(statement, While):
+            loop = _Loop(statement, scope)
+            # The condition is evaluated before anything else of the loop,
+            # so what it computes may fail before the loop just as well
+            statement.condition = loop.hoist(
+                statement.condition,
+                not _impure_calls(statement.condition, scope))
+            loop.hoist_statements(statement.statements)
+            result.extend(loop.hoisted.values())
+            statement.statements = hoist_statements(statement.statements,
+                                                    scope)
+        elif isinstance(statement, If):
+            statement.then_statements = hoist_statements(
+                statement.then_statements, scope)
+            if statement.else_statements is not None:
+                statement.else_statements = hoist_statements(
+                    statement.else_statements, scope)
+        result.append(statement)
+    return result
+
+
+def hoist_class(node: ClassNode) -> None:
+    """Moves the invariant expressions of every while loop of a parsed
+    class out of the loop, in place.
+    """
+    for subroutine in node.subroutines:
+        subroutine.statements = hoist_statements(subroutine.statements,
+                                                 _Scope(subroutine))
@@ -0,0 +1,241 @@
+"""
+Static frames for the subroutines of a whole program that never recurse.
+
+The locals of a subroutine normally live in its stack frame: every access
+goes through LCL, and its "function" command pushes a 0 for each of them.
+A subroutine that cannot reach itself through the calls of the program is
+never active twice at once, so its locals can live at fixed addresses
+instead. static_frames gives them static variables of their class, which
+the VM translator reads and writes directly ("@Class.k"), and CodeGenerator
+then declares the subroutine with no locals at all. Subroutines of a class
+that are never active at the same time, as neither can reach the other,
+share the same statics.
+
+Calls are followed as DeadCode follows them. A call into a class that is
+not part of the analysis (e.g. that of a .vm file) may call back any of the
+subroutines such classes call, so these must be passed as external.
+
+Static variables live at RAM 16 to 255, below the stack. When the frames
+of every subroutine do not fit in what the program leaves of it, leaf
+subroutines (which call nothing) and smaller frames are preferred.
+"""
+import typing
+from DeadCode import subroutine_calls
+from JackAST import (ClassNode, Subroutine, Let, If, While, Do, Return,
+                     StringConst, VarRef, ArrayRef, Call, Unary, Binary)
+
+# The number of words of RAM the assembler gives to static variables
+STATIC_WORDS = 240
+# Stands for the code outside of the analysis in the call graph
+EXTERNAL = ""
+
+
+def _reachable(graph: typing.Dict[str, typing.Set[str]]) \
+        -> typing.Dict[str, typing.Set[str]]:
+    """Returns the subroutines every subroutine of graph may call, directly
+    or not.
+    """
+    reach = {}
+    for name in graph:
+        seen = set()
+        pending = list(graph[name])
+        while pending:
+            callee = pending.pop()
+            if callee not in seen:
+                seen.add(callee)
+                pending.extend(graph.get(callee, ()))
+        reach[name] = seen
+    return reach
+
+
+def _class_words(chosen: typing.List[str],
+                 reach: typing.Dict[str, typing.Set[str]],
+                 sizes: typing.Dict[str, int]) -> typing.Dict[str, int]:
+    """Lays out the frames of the subroutines of a single class.
+
+    Returns:
+        Dict[str, int]: the offset of the frame of every subroutine of
+        chosen, past the frames of those that may be active below it.
+    """
+    offsets = {}
+
+    def offset(name: str) -> int:
+        if name not in offsets:
+            offsets[name] = max((offset(caller) + sizes[caller]
+                                 for caller in chosen
+                                 if name in reach[caller]), default=0)
+        return offsets[name]
+
+    for name in chosen:
+        offset(name)
+    return offsets
+
+
+def static_frames(classes: typing.List[ClassNode],
+                  external: typing.Iterable[str] = (), reserved: int = 0,
+                  live: typing.Optional[typing.Set[str]] = None) \
+        -> typing.Dict[str, int]:
+    """
+    Args:
+        classes (List[ClassNode]): every class of the program, as they will
+            be compiled.
+        external (Iterable[str]): the subroutines of classes that code
+            outside of them calls.
+        reserved (int): the number of static variables the program uses
+            besides those classes declares, e.g. in .vm files.
+        live (Optional[Set[str]]): if given, only these subroutines are
+            compiled, see DeadCode.
+
+    Returns:
+        Dict[str, int]: for every subroutine ("Class.subroutine") whose
+        locals get static variables, the index of the static variable of
+        its first local. Its other locals follow it.
+    """
+    subroutines = {}
+    class_statics = {}
+    for class_node in classes:
+        class_statics[class_node.name] = sum(
+            len(declaration.names) for declaration in class_node.variables
+            if declaration.kind == "STATIC")
+        for subroutine in class_node.subroutines:
+            subroutines[f"{class_node.name}.{subroutine.name}"] = \
+                (class_node, subroutine)
+    graph = {EXTERNAL: set(external)}
+    for name, (class_node, subroutine) in subroutines.items():
+        graph[name] = {callee if callee in subroutines else EXTERNAL
+                       for callee in subroutine_calls(class_node, subroutine)}
+    reach = _reachable(graph)
+    sizes = {name: sum(len(declaration.names)
+                       for declaration in subroutine.locals)
+             for name, (class_node, subroutine) in subroutines.items()}
+    candidates = sorted(
+        (name for name in subroutines
+         if sizes[name] and name not in reach[name] and
+         (live is None or name in live)),
+        key=lambda name: (bool(graph[name]), sizes[name], name))
+
+    available = STATIC_WORDS - reserved - sum(class_statics.values())
+    chosen = {class_name: [] for class_name in class_statics}
+    words = {class_name: 0 for class_name in class_statics}
+    for name in candidates:
+        class_name = subroutines[name][0].name
+        trial = chosen[class_name] + [name]
+        offsets = _class_words(trial, reach, sizes)
+        class_words = max(offsets[member] + sizes[member]
+                          for member in trial)
+        if class_words - words[class_name] <= available:
+            available -= class_words - words[class_name]
+            chosen[class_name] = trial
+            words[class_name] = class_words
+    frames = {}
+    for class_name, names in chosen.items():
+        offsets = _class_words(names, reach, sizes)
+        for name in names:
+            frames[name] = class_statics[class_name] + offsets[name]
+    return frames
+
+
+def _reads(node, names: typing.Set[str]) -> None:
+    """Adds the variables evaluating an expression reads to names."""
+    if isinstance(node, VarRef):
+        names.add(node.name)
+    elif isinstance(node, ArrayRef):
+        names.add(node.name)
+        _reads(node.index, names)
+    elif isinstance(node, Call):
+        if node.receiver is not None:
+            names.add(node.receiver)
+        for argument in node.arguments:
+            _reads(argument, names)
+    elif isinstance(node, Unary):
+        _reads(node.operand, names)
+    elif isinstance(node, Binary):
+        _reads(node.left, names)
+        _reads(node.right, names)
+
+
+def _expressions(statements: list) -> typing.Iterator:
+    """Yields the expressions of statements and of the statements nested in
+    them. The target of a store to an array entry is yielded as an ArrayRef,
+    as it reads the array variable and evaluates the index.
+    """
+    for statement in statements:
+        if isinstance(statement, Let):
+            if statement.index is not None:
+                yield ArrayRef(statement.name, statement.index)
+            yield statement.value
+        elif isinstance(statement, If):
+            yield statement.condition
+            yield from _expressions(statement.then_statements)
+            if statement.else_statements is not None:
+                yield from _expressions(statement.else_statements)
+        elif isinstance(statement, While):
+            yield statement.condition
+            yield from _expressions(statement.statements)
+        elif isinstance(statement, Do):
+            yield statement.call
+        elif isinstance(statement, Return) and statement.value is not None:
+            yield statement.value
+
+
+def zeroed_locals(subroutine: Subroutine) -> typing.List[str]:
+    """
+    Returns:
+        List[str]: the locals of subroutine that it may read before it
+        assigns them, in declaration order. In a static frame they must be
+        set to 0 on every call, as the locals of a stack frame are.
+    """
+    local_names = [name for declaration in subroutine.locals
+                   for name in declaration.names]
+    assigned = set()
+    zeroed = set()
+    for statement in subroutine.statements:
+        read = set()
+        for expression in _expressions([statement]):
+            _reads(expression, read)
+        zeroed.update(read - assigned)
+        # Only a statement that always runs assigns for sure
+        if isinstance(statement, Let) and statement.index is None:
+            assigned.add(statement.name)
+    return [name for name in local_names if name in zeroed]
+
+
+def vm_statics(vm_file: typing.TextIO) -> int:
+    """
+    Returns:
+        int: the number of static variables the VM code of vm_file uses.
+    """
+    indices = set()
+    for line in vm_file:
+        words = line.split("//")[0].split()
+        if len(words) == 3 and words[1] == "static":
+            indices.add(words[2])
+    return len(indices)
+
+
+def string_literals(class_node: ClassNode) -> int:
+    """
+    Returns:
+        int: the number of distinct string literals of a class, which take
+        a static variable each when they are pooled (see CodeGenerator).
+    """
+    literals = set()
+
+    def collect(node) -> None:
+        if isinstance(node, StringConst):
+            literals.add(node.value)
+        elif isinstance(node, ArrayRef):
+            collect(node.index)
+        elif isinstance(node, Call):
+            for argument in node.arguments:
+                collect(argument)
+        elif isinstance(node, Unary):
+            collect(node.operand)
+        elif isinstance(node, Binary):
+            collect(node.left)
+            collect(node.right)
+
+    for subroutine in class_node.subroutines:
+        for expression in _expressions(subroutine.statements):
+            collect(expression)
+    return len(literals)
@@ -10,37 +10,13 @@ import typing
 
 class Var:
     """A structure representing a variable with a type, kind and index."""
-    field_counter = 0
-    static_counter = 0
-    arg_counter = 0
-    var_counter = 0
+    __slots__ = ("name", "type", "kind", "index")
 
-    def __init__(self,name: str, type: str, kind: str) -> None:
+    def __init__(self, name: str, type: str, kind: str, index: int) -> None:
         self.name = name
         self.type = type
         self.kind = kind
-        if kind == "FIELD":
-            self.index = Var.field_counter
-            Var.field_counter += 1
-        elif kind == "STATIC":
-            self.index = Var.static_counter
-            Var.static_counter += 1
-        elif kind == "ARG":
-            self.index = Var.arg_counter
-            Var.arg_counter += 1
-        elif kind == "VAR":
-            self.index = Var.var_counter
-            Var.var_counter += 1
-
-    @classmethod
-    def reset_subroutine_counters(cls) -> None:
-        cls.arg_counter = 0
-        cls.var_counter = 0
-
-    def __eq__(self, other) -> bool:
-        if isinstance(other, str):
-            return self.name == other
-        return False
+        self.index = index
 
     def __repr__(self) -> str:
         return f"Var(name={self.name}, type={self.type}, kind={self.kind}, index={self.index})"
@@ -49,22 +25,24 @@ class Var:
 class SymbolTable:
     """A symbol table that associates names with information needed for Jack
     compilation: type, kind and running index. The symbol table has two nested
-    scopes (class/subroutine).
+    scopes (class/subroutine), each a dictionary from names to Var entries,
+    and keeps its own running indexes, so every class compiled in the same
+    process starts counting from 0.
     """
 
     def __init__(self) -> None:
         """Creates a new empty symbol table."""
-        # Your code goes here!
-        self.class_variables = []
-        self.subroutine_variables = []
+        self.class_variables = {}
+        self.subroutine_variables = {}
+        self.counters = {"STATIC": 0, "FIELD": 0, "ARG": 0, "VAR": 0}
 
     def start_subroutine(self) -> None:
         """Starts a new subroutine scope (i.e., resets the subroutine's 
         symbol table).
         """
-        # Your code goes here!
-        self.subroutine_variables = []
-        Var.reset_subroutine_counters()
+        self.subroutine_variables = {}
+        self.counters["ARG"] = 0
+        self.counters["VAR"] = 0
 
     def define(self, name: str, type: str, kind: str) -> None:
         """Defines a new identifier of a given name, type and kind and assigns 
@@ -77,11 +55,24 @@ class SymbolTable:
             kind (str): the kind of the new identifier, can be:
             "STATIC", "FIELD", "ARG", "VAR".
         """
-        variable = Var(name, type, kind)
-        if kind in ["STATIC", "FIELD"]:
-            self.class_variables.append(variable)
-        elif kind in ["ARG", "VAR"]:
-            self.subroutine_variables.append(variable)
+        if kind in ("STATIC", "FIELD"):
+            scope = self.class_variables
+        elif kind in ("ARG", "VAR"):
+            scope = self.subroutine_variables
+        else:
+            return
+        scope[name] = Var(name, type, kind, self.counters[kind])
+        self.counters[kind] += 1
+
+    def reserve(self, kind: str, count: int) -> None:
+        """Skips count indices of a kind, which no identifier defined later
+        is given.
+
+        Args:
+            kind (str): can be "STATIC", "FIELD", "ARG", "VAR".
+            count (int): the number of indices to skip.
+        """
+        self.counters[kind] += count
 
     def var_count(self, kind: str) -> int:
         """
@@ -92,15 +83,24 @@ class SymbolTable:
             int: the number of variables of the given kind already defined in 
             the current scope.
         """
-        if kind == "FIELD":
-            return Var.field_counter
-        elif kind == "STATIC":
-            return Var.static_counter
-        elif kind == "ARG":
-            return Var.arg_counter
-        elif kind == "VAR":
-            return Var.var_counter
-        raise Exception("Invalid kind")
+        if kind not in self.counters:
+            raise Exception("Invalid kind")
+        return self.counters[kind]
+
+    def lookup(self, name: str) -> typing.Optional[Var]:
+        """
+        Args:
+            name (str): name of an identifier.
+
+        Returns:
+            Optional[Var]: the entry of the named identifier in the current
+            scope (the subroutine scope shadows the class scope), or None if
+            the identifier is unknown in the current scope.
+        """
+        variable = self.subroutine_variables.get(name)
+        if variable is None:
+            variable = self.class_variables.get(name)
+        return variable
 
     def kind_of(self, name: str) -> str|None:
         """
@@ -111,14 +111,8 @@ class SymbolTable:
             str: the kind of the named identifier in the current scope, or None
             if the identifier is unknown in the current scope.
         """
-        # Your code goes here!
-        for var in self.subroutine_variables:
-            if var == name:
-                return var.kind
-        for var in self.class_variables:
-            if var == name:
-                return var.kind
-        return None
+        variable = self.lookup(name)
+        return None if variable is None else variable.kind
 
     def type_of(self, name: str) -> str|None:
         """
@@ -128,14 +122,8 @@ class SymbolTable:
         Returns:
             str: the type of the named identifier in the current scope.
         """
-        # Your code goes here!
-        for var in self.subroutine_variables:
-            if var == name:
-                return var.type
-        for var in self.class_variables:
-            if var == name:
-                return var.type
-        return None
+        variable = self.lookup(name)
+        return None if variable is None else variable.type
 
     def index_of(self, name: str) -> int|None:
         """
@@ -145,11 +133,5 @@ class SymbolTable:
         Returns:
             int: the index assigned to the named identifier.
         """
-        # Your code goes here!
-        for var in self.subroutine_variables:
-            if var == name:
-                return var.index
-        for var in self.class_variables:
-            if var == name:
-                return var.index
-        return None
+        variable = self.lookup(name)
+        return None if variable is None else variable.index
@@ -114,3 +114,106 @@ class VMWriter:
         """Writes a VM return command."""
         # Your code goes here!
         self.output_stream.write(f"return\n")
+
+    def close(self) -> None:
+        """Flushes the output stream. Text commands are written as they
+        come, so nothing else is left to write.
+        """
+        self.output_stream.flush()
+
+
+# Opcodes of the compact VM bytecode (.vmb) format, read by 08/VMBytecode.py.
+BYTECODE_MAGIC = b"VMB\x01"
+PUSH_OPCODE = 0x10
+POP_OPCODE = 0x18
+LABEL_OPCODE = 0x20
+GOTO_OPCODE = 0x21
+IF_OPCODE = 0x22
+FUNCTION_OPCODE = 0x23
+CALL_OPCODE = 0x24
+RETURN_OPCODE = 0x25
+
+
+def _varint(value: int) -> bytes:
+    """Encodes a non-negative integer as an unsigned LEB128 varint."""
+    encoded = bytearray()
+    while value >= 0x80:
+        encoded.append((value & 0x7F) | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+class VMBytecodeWriter(VMWriter):
+    """
+    Writes VM commands in the compact binary .vmb format instead of text:
+    one opcode byte per command, varint arguments, and function and label
+    names interned in a string table. The output stream must be opened in
+    binary mode, and close() must be called to write the file.
+    """
+
+    def __init__(self, output_stream: typing.BinaryIO) -> None:
+        """Prepares an empty string table and command buffer."""
+        super().__init__(output_stream)
+        self.code = bytearray()
+        self.strings = {}
+
+    def _intern(self, name: str) -> bytes:
+        index = self.strings.setdefault(name, len(self.strings))
+        return _varint(index)
+
+    def write_push(self, segment: str, index: int) -> None:
+        if segment not in SEGMENTS_NAMES or index < 0 or not isinstance(index, int):
+            raise ValueError("The segments is invalid.")
+        self.code.append(PUSH_OPCODE + SEGMENTS_NAMES.index(segment))
+        self.code += _varint(index)
+
+    def write_pop(self, segment: str, index: int) -> None:
+        if segment not in SEGMENTS_NAMES or index < 0 or not isinstance(index, int):
+            raise ValueError("The segments is invalid.")
+        self.code.append(POP_OPCODE + SEGMENTS_NAMES.index(segment))
+        self.code += _varint(index)
+
+    def write_arithmetic(self, command: str) -> None:
+        if command not in ARITHMETICS:
+            raise ValueError(f"The command is invalid. got {command}")
+        self.code.append(ARITHMETICS.index(command))
+
+    def write_label(self, label: str) -> None:
+        self.code.append(LABEL_OPCODE)
+        self.code += self._intern(label)
+
+    def write_goto(self, label: str) -> None:
+        self.code.append(GOTO_OPCODE)
+        self.code += self._intern(label)
+
+    def write_if(self, label: str) -> None:
+        self.code.append(IF_OPCODE)
+        self.code += self._intern(label)
+
+    def write_call(self, name: str, n_args: int) -> None:
+        if n_args < 0 or not isinstance(n_args, int):
+            raise ValueError("The number of arguments must be a non-negative integer.")
+        self.code.append(CALL_OPCODE)
+        self.code += self._intern(name) + _varint(n_args)
+
+    def write_function(self, name: str, n_locals: int) -> None:
+        if n_locals < 0 or not isinstance(n_locals, int):
+            raise ValueError("The number of local variables must be a non-negative integer.")
+        self.code.append(FUNCTION_OPCODE)
+        self.code += self._intern(name) + _varint(n_locals)
+
+    def write_return(self) -> None:
+        self.code.append(RETURN_OPCODE)
+
+    def close(self) -> None:
+        """Writes the magic, the string table and the buffered commands."""
+        header = bytearray(BYTECODE_MAGIC)
+        header += _varint(len(self.strings))
+        for name in self.strings:  # dicts keep insertion (= index) order
+            encoded = name.encode("utf-8")
+            header += _varint(len(encoded)) + encoded
+        self.output_stream.write(bytes(header))
+        self.output_stream.write(bytes(self.code))
+        self.code = bytearray()
+        super().close()
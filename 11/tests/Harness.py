@@ -0,0 +1,111 @@
+"""
+Compiles small Jack programs for the tests of the compiler, and runs them.
+
+Programs are given as their sources, by class name. They are compiled by
+running JackCompiler.py on a temporary directory, as it runs from the
+command line, so a test covers the same path through the compiler as a
+build does.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import typing
+import unittest
+from VMEmulator import VMEmulator
+
+COMPILER = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "JackCompiler.py")
+
+
+class CompileError(Exception):
+    """Raised when the compiler fails, with what it printed."""
+
+
+def compile_program(sources: typing.Dict[str, str], *flags: str,
+                    single: typing.Optional[str] = None) \
+        -> typing.Dict[str, str]:
+    """
+    Args:
+        sources (Dict[str, str]): the source of every class, by its name.
+        flags (str): the options to run the compiler with.
+        single (Optional[str]): if given, only this class is compiled, by
+            running the compiler on its file rather than on the directory.
+
+    Returns:
+        Dict[str, str]: the VM code of every compiled class, by its name.
+
+    Raises:
+        CompileError: if the compiler fails.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        for class_name, source in sources.items():
+            with open(os.path.join(directory, class_name + ".jack"),
+                      'w') as source_file:
+                source_file.write(source)
+        target = directory if single is None else \
+            os.path.join(directory, single + ".jack")
+        result = subprocess.run(
+            [sys.executable, COMPILER, target, *flags],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        if result.returncode != 0:
+            raise CompileError(result.stderr)
+        vm_files = {}
+        for filename in sorted(os.listdir(directory)):
+            class_name, extension = os.path.splitext(filename)
+            if extension == ".vm":
+                with open(os.path.join(directory, filename), 'r') as vm_file:
+                    vm_files[class_name] = vm_file.read()
+        return vm_files
+
+
+def run_program(sources: typing.Dict[str, str], *flags: str,
+                max_steps: int = 1_000_000) -> VMEmulator:
+    """Compiles a program and runs its Main.main.
+
+    Returns:
+        VMEmulator: the emulator the program ran on, with its output.
+    """
+    emulator = VMEmulator(compile_program(sources, *flags))
+    emulator.call("Main.main", max_steps=max_steps)
+    return emulator
+
+
+def function_code(vm_code: str, name: str) -> typing.List[str]:
+    """
+    Returns:
+        List[str]: the commands of a single function of vm_code, from its
+        "function" command to the next one.
+
+    Raises:
+        KeyError: if vm_code has no such function.
+    """
+    commands = None
+    for line in vm_code.splitlines():
+        words = line.split()
+        if words[:1] == ["function"]:
+            if commands is not None:
+                break
+            if words[1] == name:
+                commands = []
+        if commands is not None:
+            commands.append(" ".join(words))
+    if commands is None:
+        raise KeyError(f"no function {name}")
+    return commands
+
+
+class ProgramTestCase(unittest.TestCase):
+    """Tests of the code compiled for Jack programs."""
+
+    def assert_output(self, sources: typing.Dict[str, str],
+                      expected: typing.List[str],
+                      *flag_sets: typing.Sequence[str]) -> None:
+        """Asserts that a program prints expected, compiled with the default
+        options and with each of flag_sets.
+        """
+        for flags in ((),) + flag_sets:
+            with self.subTest(flags=flags):
+                self.assertEqual(run_program(sources, *flags).output,
+                                 expected)
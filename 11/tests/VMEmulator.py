@@ -0,0 +1,315 @@
+"""
+A VM emulator for the tests of the compiler.
+
+It runs the VM code the compiler writes on the memory layout of the Hack
+platform: the pointers at RAM 0 to 4, temp at 5 to 12, the static variables
+of every class from 16 to 255, the stack from 256 and the heap from 2048.
+The OS subroutines a program does not define itself are stood in for by
+NATIVES, so a test only needs the classes it is about.
+
+Every command that runs is counted, and so is every call, by the name of
+the subroutine it calls.
+"""
+import collections
+import typing
+
+WORD = 0x10000
+SP, LCL, ARG, THIS, THAT = range(5)
+TEMP = 5
+STATIC_START, STATIC_END = 16, 256
+STACK_START, HEAP_START, HEAP_END = 256, 2048, 16384
+SEGMENTS = {"pointer": 3, "temp": TEMP}
+POINTERS = {"local": LCL, "argument": ARG, "this": THIS, "that": THAT}
+
+
+class VMError(Exception):
+    """Raised when a program fails, or when its code is not valid."""
+
+
+class _Halt(Exception):
+    """Raised by Sys.halt, to stop the program."""
+
+
+def _signed(value: int) -> int:
+    value %= WORD
+    return value - WORD if value & 0x8000 else value
+
+
+def _divide(x: int, y: int) -> int:
+    if y == 0:
+        raise VMError("Sys.error 3: division by zero")
+    quotient = abs(x) // abs(y)
+    return quotient if (x < 0) == (y < 0) else -quotient
+
+
+def _sqrt(x: int) -> int:
+    if x < 0:
+        raise VMError("Sys.error 4: square root of a negative number")
+    root = 0
+    while (root + 1) * (root + 1) <= x:
+        root += 1
+    return root
+
+
+ARITHMETIC = {
+    "add": lambda x, y: x + y, "sub": lambda x, y: x - y,
+    "and": lambda x, y: x & y, "or": lambda x, y: x | y,
+    "eq": lambda x, y: -1 if x == y else 0,
+    "gt": lambda x, y: -1 if x > y else 0,
+    "lt": lambda x, y: -1 if x < y else 0}
+UNARY = {"neg": lambda x: -x, "not": lambda x: ~x,
+         "shiftleft": lambda x: x << 1, "shiftright": lambda x: x >> 1}
+
+
+class VMEmulator:
+    """Runs the VM code of the classes of a program."""
+
+    def __init__(self, vm_files: typing.Dict[str, str]) -> None:
+        """
+        Args:
+            vm_files (Dict[str, str]): the VM code of every class, by the
+                name of the class.
+        """
+        self.ram = [0] * WORD
+        self.program = []
+        self.functions = {}
+        self.static_bases = {}
+        self.output = []
+        self.steps = 0
+        self.calls = collections.Counter()
+        self.heap = HEAP_START
+        static_base = STATIC_START
+        for file_name, code in vm_files.items():
+            self.static_bases[file_name] = static_base
+            static_base += self._load(file_name, code)
+        if static_base > STATIC_END:
+            raise VMError(f"{static_base - STATIC_START} static variables "
+                          f"do not fit in RAM {STATIC_START} to "
+                          f"{STATIC_END - 1}")
+        self._resolve_labels()
+
+    def _load(self, file_name: str, code: str) -> int:
+        """Adds the commands of a VM file to the program.
+
+        Returns:
+            int: the number of static variables the file uses.
+        """
+        statics = 0
+        function = None
+        for line in code.splitlines():
+            words = line.split("//")[0].split()
+            if not words:
+                continue
+            command = words[0]
+            arguments = [int(word) if word.isdigit() else word
+                         for word in words[1:]]
+            if command == "function":
+                function = arguments[0]
+                self.functions[function] = len(self.program)
+            elif command in ("push", "pop") and arguments[0] == "static":
+                statics = max(statics, arguments[1] + 1)
+            self.program.append((command, arguments, file_name, function))
+        return statics
+
+    def _resolve_labels(self) -> None:
+        """Replaces the label of every goto and if-goto with its address.
+        Labels are local to the function they are in.
+        """
+        labels = {(function, arguments[0]): address
+                  for address, (command, arguments, file_name, function)
+                  in enumerate(self.program) if command == "label"}
+        for address, (command, arguments, file_name, function) in \
+                enumerate(self.program):
+            if command in ("goto", "if-goto"):
+                target = labels.get((function, arguments[0]))
+                if target is None:
+                    raise VMError(f"{function}: no label {arguments[0]}")
+                self.program[address] = (command, [target], file_name,
+                                         function)
+
+    def call(self, name: str, *arguments: int,
+             max_steps: int = 1_000_000) -> int:
+        """Calls a subroutine of the program, and runs it until it returns.
+
+        Returns:
+            int: the value it returned, as a signed integer.
+
+        Raises:
+            VMError: if the program fails, or runs more than max_steps
+                commands.
+        """
+        if name not in self.functions:
+            raise VMError(f"no function {name}")
+        ram = self.ram
+        ram[SP] = STACK_START
+        for argument in arguments:
+            self._push(argument)
+        # The frame of the call returns to address -1, which stops the run
+        for value in (-1, ram[LCL], ram[ARG], ram[THIS], ram[THAT]):
+            self._push(value)
+        ram[ARG] = ram[SP] - len(arguments) - 5
+        ram[LCL] = ram[SP]
+        self.calls[name] += 1
+        address = self.functions[name]
+        try:
+            while address != -1:
+                if self.steps >= max_steps:
+                    raise VMError(f"still running after {max_steps} steps")
+                self.steps += 1
+                address = self._step(address)
+        except _Halt:
+            return 0
+        return _signed(ram[ram[SP] - 1])
+
+    def _push(self, value: int) -> None:
+        if self.ram[SP] >= HEAP_START:
+            raise VMError("stack overflow")
+        self.ram[self.ram[SP]] = value % WORD
+        self.ram[SP] += 1
+
+    def _pop(self) -> int:
+        self.ram[SP] -= 1
+        if self.ram[SP] < STACK_START:
+            raise VMError("stack underflow")
+        return _signed(self.ram[self.ram[SP]])
+
+    def _address(self, segment: str, index: int, file_name: str) -> int:
+        if segment in POINTERS:
+            return self.ram[POINTERS[segment]] + index
+        if segment == "static":
+            return self.static_bases[file_name] + index
+        if segment in SEGMENTS:
+            return SEGMENTS[segment] + index
+        raise VMError(f"no segment {segment}")
+
+    def _step(self, address: int) -> int:
+        """Runs the command at address.
+
+        Returns:
+            int: the address of the next command to run.
+        """
+        command, arguments, file_name, function = self.program[address]
+        ram = self.ram
+        if command == "push":
+            if arguments[0] == "constant":
+                self._push(arguments[1])
+            else:
+                self._push(ram[self._address(*arguments, file_name)])
+        elif command == "pop":
+            ram[self._address(*arguments, file_name)] = self._pop() % WORD
+        elif command in ARITHMETIC:
+            y = self._pop()
+            self._push(ARITHMETIC[command](self._pop(), y))
+        elif command in UNARY:
+            self._push(UNARY[command](self._pop()))
+        elif command == "goto":
+            return arguments[0]
+        elif command == "if-goto":
+            if self._pop():
+                return arguments[0]
+        elif command == "function":
+            for _ in range(arguments[1]):
+                self._push(0)
+        elif command == "call":
+            name, count = arguments
+            self.calls[name] += 1
+            if name not in self.functions:
+                self._call_native(name, count)
+                return address + 1
+            for value in (address + 1, ram[LCL], ram[ARG], ram[THIS],
+                          ram[THAT]):
+                self._push(value)
+            ram[ARG] = ram[SP] - count - 5
+            ram[LCL] = ram[SP]
+            return self.functions[name]
+        elif command == "return":
+            frame = ram[LCL]
+            return_address = _signed(ram[frame - 5])
+            ram[ram[ARG]] = ram[ram[SP] - 1]
+            ram[SP] = ram[ARG] + 1
+            ram[THAT], ram[THIS], ram[ARG], ram[LCL] = \
+                ram[frame - 1], ram[frame - 2], ram[frame - 3], ram[frame - 4]
+            return return_address
+        elif command != "label":
+            raise VMError(f"{function}: unknown command {command}")
+        return address + 1
+
+    def _call_native(self, name: str, count: int) -> None:
+        if name not in NATIVES:
+            raise VMError(f"no function {name}")
+        arguments = [self._pop() for _ in range(count)][::-1]
+        self._push(NATIVES[name](self, *arguments))
+
+    def alloc(self, size: int) -> int:
+        """Allocates size words on the heap, which is never freed."""
+        if size <= 0 or self.heap + size > HEAP_END:
+            raise VMError(f"Sys.error 5: cannot allocate {size} words")
+        block = self.heap
+        self.heap += size
+        return block
+
+    def string(self, address: int) -> str:
+        """Returns the characters of a String made by the NATIVES."""
+        return "".join(chr(self.ram[address + 1 + offset])
+                       for offset in range(self.ram[address]))
+
+
+def _new_string(emulator: VMEmulator, max_length: int) -> int:
+    # The length, then the characters
+    string = emulator.alloc(max_length + 1)
+    emulator.ram[string] = 0
+    return string
+
+
+def _append_char(emulator: VMEmulator, string: int, char: int) -> int:
+    emulator.ram[string + 1 + emulator.ram[string]] = char
+    emulator.ram[string] += 1
+    return string
+
+
+def _print(emulator: VMEmulator, text: str) -> int:
+    emulator.output.append(text)
+    return 0
+
+
+def _error(emulator: VMEmulator, code: int) -> int:
+    raise VMError(f"Sys.error {code}")
+
+
+def _halt(emulator: VMEmulator) -> int:
+    raise _Halt()
+
+
+def _poke(emulator: VMEmulator, address: int, value: int) -> int:
+    emulator.ram[address % WORD] = value % WORD
+    return 0
+
+
+# The OS subroutines the emulator provides, when a program does not define
+# them itself
+NATIVES = {
+    "Math.multiply": lambda emulator, x, y: x * y,
+    "Math.divide": lambda emulator, x, y: _divide(x, y),
+    "Math.abs": lambda emulator, x: abs(x),
+    "Math.min": lambda emulator, x, y: min(x, y),
+    "Math.max": lambda emulator, x, y: max(x, y),
+    "Math.sqrt": lambda emulator, x: _sqrt(x),
+    "Memory.alloc": lambda emulator, size: emulator.alloc(size),
+    "Memory.deAlloc": lambda emulator, block: 0,
+    "Memory.peek": lambda emulator, address: emulator.ram[address % WORD],
+    "Memory.poke": _poke,
+    "Array.new": lambda emulator, size: emulator.alloc(size),
+    "Array.dispose": lambda emulator, array: 0,
+    "String.new": _new_string,
+    "String.appendChar": _append_char,
+    "String.length": lambda emulator, string: emulator.ram[string],
+    "String.charAt": lambda emulator, string, index:
+        emulator.ram[string + 1 + index],
+    "Output.printInt": lambda emulator, value: _print(emulator, str(value)),
+    "Output.printChar": lambda emulator, char: _print(emulator, chr(char)),
+    "Output.printString": lambda emulator, string:
+        _print(emulator, emulator.string(string)),
+    "Output.println": lambda emulator: _print(emulator, "\n"),
+    "Sys.error": _error,
+    "Sys.halt": _halt,
+}
@@ -0,0 +1,77 @@
+"""
+Tests of stores to array entries, which go through THAT directly when the
+value cannot move it.
+"""
+import unittest
+from Harness import ProgramTestCase, compile_program, function_code
+
+STORES = {"Main": """
+class Main {
+    function void main() {
+        var Array a, b;
+        var int i;
+        let a = Array.new(4);
+        let b = Array.new(4);
+        let i = 1;
+        let a[i] = i + 1;
+        let a[3] = -7;
+        let b[i] = a[i];
+        let b[0] = Main.other(a);
+        let b[i + 2] = a[3] * 2;
+        do Main.print(a);
+        do Main.print(b);
+        return;
+    }
+
+    function int other(Array a) {
+        let a[0] = 5;
+        return a[0] + 1;
+    }
+
+    function void print(Array a) {
+        var int i;
+        while (i < 4) {
+            do Output.printInt(a[i]);
+            let i = i + 1;
+        }
+        return;
+    }
+}
+"""}
+
+
+class ArrayStoresTest(ProgramTestCase):
+
+    def setUp(self):
+        self.code = function_code(compile_program(STORES)["Main"],
+                                  "Main.main")
+
+    def test_value_through_that(self):
+        # let a[i] = i + 1
+        start = self.code.index("push local 2", self.code.index("pop local 2"))
+        self.assertEqual(self.code[start - 1:start + 7], [
+            "push local 0", "push local 2", "add", "pop pointer 1",
+            "push local 2", "push constant 1", "add", "pop that 0"])
+
+    def test_constant_index(self):
+        # let a[3] = -7
+        start = self.code.index("push constant 7")
+        self.assertEqual(self.code[start - 2:start + 3], [
+            "push local 0", "pop pointer 1", "push constant 7", "neg",
+            "pop that 3"])
+
+    def test_values_that_move_that_go_through_temp(self):
+        # let b[i] = a[i], let b[0] = Main.other(a) and let b[i + 2] =
+        # a[3] * 2 all set THAT while they evaluate their values
+        through_temp = ["pop temp 0", "pop pointer 1", "push temp 0",
+                        "pop that 0"]
+        self.assertEqual(sum(
+            self.code[start:start + 4] == through_temp
+            for start in range(len(self.code))), 3)
+
+    def test_values(self):
+        self.assert_output(STORES, ["5", "2", "0", "-7", "6", "2", "0", "-14"])
+
+
+if __name__ == "__main__":
+    unittest.main()
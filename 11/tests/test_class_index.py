@@ -0,0 +1,170 @@
+"""
+Tests of --resolve-calls, which writes calls as what the subroutine they
+call is (see ClassIndex).
+"""
+import os
+import subprocess
+import sys
+import unittest
+from Harness import COMPILER, CompileError, compile_program, \
+    function_code, run_program
+
+REPOSITORY = os.path.dirname(os.path.dirname(COMPILER))
+# Programs that call every subroutine as what it is, so resolving their
+# calls changes nothing
+SAMPLES = ["11/Pong", "11/Square", "11/ComplexArrays", "11/ConvertToBin",
+           "11/Average", "11/Seven", "12"]
+
+PROGRAM = {"Main": """
+class Main {
+    field int x;
+
+    function void main() {
+        var Main m;
+        do Output.printInt(twice(3));
+        let m = Main.make();
+        do Output.printInt(m.get());
+        do Output.printInt(Util.three());
+        return;
+    }
+
+    function int twice(int n) {
+        return n + n;
+    }
+
+    constructor Main make() {
+        let x = 5;
+        return this;
+    }
+
+    method int get() {
+        return Main.plus(1);
+    }
+
+    method int plus(int n) {
+        return x + n;
+    }
+}
+""", "Util": """
+class Util {
+    function int three() {
+        return 3;
+    }
+
+    method int four() {
+        return 4;
+    }
+}
+"""}
+
+# Util.four is a method, which cannot be called through its class name
+BROKEN = dict(PROGRAM, Main=PROGRAM["Main"].replace(
+    "Util.three()", "Util.four()"))
+# Main.twice takes a single argument
+WRONG_ARGUMENTS = dict(PROGRAM, Main=PROGRAM["Main"].replace(
+    "twice(3)", "twice(3, 4)"))
+
+
+def sources(directory: str) -> dict:
+    """Returns the sources of the classes in a directory of the repository,
+    by class name.
+    """
+    path = os.path.join(REPOSITORY, directory)
+    classes = {}
+    for filename in os.listdir(path):
+        class_name, extension = os.path.splitext(filename)
+        if extension == ".jack":
+            with open(os.path.join(path, filename), 'r') as source:
+                classes[class_name] = source.read()
+    return classes
+
+
+def compile_without_index(source: str) -> str:
+    """Returns the VM code of a class compiled by compile_file with the
+    default options, which have no index.
+    """
+    # In a process of its own, as the other tools have modules of the same
+    # names
+    return subprocess.run(
+        [sys.executable, "-c", "import io, sys, JackCompiler\n"
+                               "output = io.StringIO()\n"
+                               "JackCompiler.compile_file(sys.stdin, output)\n"
+                               "sys.stdout.write(output.getvalue())"],
+        cwd=os.path.dirname(COMPILER), input=source, stdout=subprocess.PIPE,
+        universal_newlines=True, check=True).stdout
+
+
+def contains(code: list, commands: list) -> bool:
+    return any(code[start:start + len(commands)] == commands
+               for start in range(len(code)))
+
+
+class ResolveCallsTest(unittest.TestCase):
+
+    def assert_resolved(self, code: str) -> None:
+        # A function of the class called without a receiver is not passed
+        # this
+        self.assertTrue(contains(function_code(code, "Main.main"), [
+            "push constant 3", "call Main.twice 1"]))
+        self.assertNotIn("push pointer 0", function_code(code, "Main.main"))
+        # A method of the class called through the class name is called on
+        # this
+        self.assertTrue(contains(function_code(code, "Main.get"), [
+            "push pointer 0", "push constant 1", "call Main.plus 2"]))
+
+    def test_directory(self):
+        self.assert_resolved(
+            compile_program(PROGRAM, "--resolve-calls")["Main"])
+
+    def test_single_file(self):
+        # Only Main is indexed, which is all its own calls need
+        self.assert_resolved(compile_program(
+            PROGRAM, "--resolve-calls", single="Main")["Main"])
+
+    def test_other_classes_of_a_single_file(self):
+        with self.assertRaises(CompileError):
+            compile_program(BROKEN, "--resolve-calls")
+        # Util is not indexed, so its calls are written as before
+        code = compile_program(BROKEN, "--resolve-calls", single="Main")
+        self.assertIn("call Util.four 0", code["Main"])
+
+    def test_number_of_arguments(self):
+        with self.assertRaisesRegex(CompileError, "Main.twice takes 1 "
+                                                  "arguments, but it is "
+                                                  "called with 2"):
+            compile_program(WRONG_ARGUMENTS, "--resolve-calls")
+        # Without the option, the call pushes the arguments it declares
+        self.assertIn("call Main.twice 3",
+                      compile_program(WRONG_ARGUMENTS)["Main"])
+
+    def test_samples_unchanged(self):
+        for directory in SAMPLES:
+            with self.subTest(directory=directory):
+                classes = sources(directory)
+                self.assertEqual(compile_program(classes, "--resolve-calls"),
+                                 compile_program(classes))
+
+    def test_without_the_option_no_index(self):
+        # Without the option no index is built, so the output is what the
+        # compiler writes without one
+        compiled = compile_program(PROGRAM)
+        for class_name, source in PROGRAM.items():
+            with self.subTest(class_name=class_name):
+                self.assertEqual(compiled[class_name],
+                                 compile_without_index(source))
+
+    def test_without_the_option(self):
+        code = compile_program(PROGRAM)["Main"]
+        self.assertTrue(contains(function_code(code, "Main.main"), [
+            "push pointer 0", "push constant 3", "call Main.twice 2"]))
+        self.assertTrue(contains(function_code(code, "Main.get"), [
+            "push argument 0", "pop pointer 0", "push constant 1",
+            "call Main.plus 1"]))
+
+    def test_values(self):
+        self.assertEqual(run_program(PROGRAM, "--resolve-calls").output,
+                         ["6", "6", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
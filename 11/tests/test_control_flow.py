@@ -0,0 +1,157 @@
+"""
+Tests of the code written for while loops and if statements.
+"""
+import unittest
+from Harness import ProgramTestCase, compile_program, function_code
+
+LOOPS = {"Main": """
+class Main {
+    function void main() {
+        do Output.printInt(Main.count(0));
+        do Output.printInt(Main.count(5));
+        do Output.printInt(Main.countDown(3));
+        do Output.printInt(Main.forever());
+        do Output.printInt(Main.nested(3));
+        do Output.printInt(Main.sign(-4));
+        do Output.printInt(Main.sign(4));
+        do Output.printInt(Main.sign(0));
+        do Output.printInt(Main.truth(-1));
+        do Output.printInt(Main.truth(1));
+        do Output.printInt(Main.truth(0));
+        do Output.printInt(Main.repeat(-1));
+        do Output.printInt(Main.repeat(1));
+        return;
+    }
+
+    function int count(int n) {
+        var int i;
+        while (i < n) {
+            let i = i + 1;
+        }
+        return i;
+    }
+
+    function int countDown(int n) {
+        var int steps;
+        var boolean going;
+        let going = n > 0;
+        while (going) {
+            let n = n - 1;
+            let steps = steps + 1;
+            let going = n > 0;
+        }
+        return steps;
+    }
+
+    function int forever() {
+        var int i;
+        while (true) {
+            let i = i + 1;
+            if (i = 10) {
+                return i;
+            }
+        }
+        return -1;
+    }
+
+    function int nested(int n) {
+        var int i, j, total;
+        while (i < n) {
+            let j = 0;
+            while (~(j = i)) {
+                let total = total + 1;
+                let j = j + 1;
+            }
+            let i = i + 1;
+        }
+        return total;
+    }
+
+    function int sign(int x) {
+        var int result;
+        if (x < 0) {
+            let result = -1;
+        } else {
+            if (x > 0) {
+                let result = 1;
+            } else {
+            }
+        }
+        return result;
+    }
+
+    function int truth(int x) {
+        if (x) {
+            return 1;
+        }
+        return 0;
+    }
+
+    function int repeat(int x) {
+        var int iterations;
+        while (x) {
+            let iterations = iterations + 1;
+            let x = 0;
+        }
+        return iterations;
+    }
+}
+"""}
+
+
+class WhileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.code = compile_program(LOOPS)["Main"]
+
+    def test_boolean_condition_at_the_bottom(self):
+        # A jump into the test, then a single branch per iteration
+        self.assertEqual(function_code(self.code, "Main.count"), [
+            "function Main.count 1", "goto WhileTest2",
+            "label WhileStart1",
+            "push local 0", "push constant 1", "add", "pop local 0",
+            "label WhileTest2",
+            "push local 0", "push argument 0", "lt", "if-goto WhileStart1",
+            "push local 0", "return"])
+
+    def test_true_condition_is_not_tested(self):
+        code = function_code(self.code, "Main.forever")
+        self.assertEqual(code[1], "label WhileStart5")
+        self.assertNotIn("not", code[code.index("label WhileTest6"):])
+        self.assertEqual(code[code.index("label WhileTest6") + 1],
+                         "goto WhileStart5")
+
+    def test_other_conditions_at_the_top(self):
+        # going is a variable rather than a comparison, so it may hold
+        # values other than true and false: it stays tested at the top, as
+        # the compiler of the book tests it
+        code = function_code(self.code, "Main.countDown")
+        start = code.index("label WhileStart3")
+        self.assertEqual(code[start:start + 4], [
+            "label WhileStart3", "push local 1", "not", "if-goto WhileEnd4"])
+
+
+class IfTest(unittest.TestCase):
+
+    def test_empty_else_is_dropped(self):
+        code = function_code(compile_program(LOOPS)["Main"], "Main.sign")
+        # Only the outer if has an else to jump over
+        self.assertEqual(sum(command.startswith("goto ")
+                             for command in code), 1)
+
+
+class ValuesTest(ProgramTestCase):
+
+    def test_values(self):
+        self.assert_output(LOOPS, [
+            # Iterations of the loops
+            "0", "5", "3", "10", "3",
+            # Branches of sign
+            "-1", "1", "0",
+            # As in the compiler of the book, a condition only holds when it
+            # is -1 (true), and not for other values than 0
+            "1", "0", "0", "1", "0"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests of --cse, which reuses the addresses of array entries a statement
+reads more than once.
+"""
+import unittest
+from Harness import ProgramTestCase, compile_program, function_code
+
+PROGRAM = {"Main": """
+class Main {
+    static int i;
+
+    function void main() {
+        var Array a, b;
+        var int j;
+        let a = Array.new(8);
+        let b = Array.new(8);
+        let i = 2;
+        let j = 3;
+        let a[i] = 5;
+        let a[j] = 7;
+        do Main.reuse(a, b, j);
+        do Main.withCall(a);
+        do Output.printInt(a[2]);
+        do Output.printInt(a[3]);
+        do Output.printInt(b[3]);
+        do Output.printInt(i);
+        return;
+    }
+
+    function void reuse(Array a, Array b, int j) {
+        let a[i] = a[i] + a[i];
+        let b[j] = a[i + j - 2] + a[j] + a[i + j - 2] - a[j];
+        return;
+    }
+
+    function void withCall(Array a) {
+        // bump changes i, so the address of a[i] is taken before the call
+        // and must not be taken again after it
+        let a[i] = a[i] + Main.bump(a);
+        return;
+    }
+
+    function int bump(Array a) {
+        let i = 3;
+        let a[3] = 100;
+        return 1;
+    }
+}
+"""}
+
+
+class CSETest(ProgramTestCase):
+
+    def test_addresses_reused(self):
+        plain = function_code(compile_program(PROGRAM)["Main"], "Main.reuse")
+        reused = function_code(compile_program(PROGRAM, "--cse")["Main"],
+                               "Main.reuse")
+        self.assertLess(len(reused), len(plain))
+        self.assertLess(reused.count("pop pointer 1"),
+                        plain.count("pop pointer 1"))
+
+    def test_only_temp_1_to_7(self):
+        code = function_code(compile_program(PROGRAM, "--cse")["Main"],
+                             "Main.reuse")
+        slots = {int(command.split()[2]) for command in code
+                 if command.split()[1:2] == ["temp"]}
+        self.assertTrue(slots)
+        self.assertTrue(slots <= set(range(1, 8)), slots)
+
+    def test_statements_with_calls_unchanged(self):
+        self.assertEqual(
+            function_code(compile_program(PROGRAM)["Main"], "Main.withCall"),
+            function_code(compile_program(PROGRAM, "--cse")["Main"],
+                          "Main.withCall"))
+
+    def test_values(self):
+        self.assert_output(PROGRAM, ["11", "100", "14", "3"], ("--cse",))
+
+
+if __name__ == "__main__":
+    unittest.main()
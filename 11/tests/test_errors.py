@@ -0,0 +1,59 @@
+"""
+Tests of how the compiler reports classes that do not compile, with and
+without --jobs.
+"""
+import os
+import unittest
+from Harness import CompileError, compile_program
+
+PROGRAM = {"Main": """
+class Main {
+    function void main() {
+        do Broken.run();
+        return;
+    }
+}
+""", "Broken": """
+class Broken {
+    function void run() {
+        var int x;
+        let x = 123abc;
+        return;
+    }
+}
+""", "Unfinished": """
+class Unfinished {
+    function void run() {
+        return
+    }
+}
+"""}
+
+
+def errors(*flags: str) -> list:
+    """Returns the lines the compiler printed for PROGRAM, with the
+    directory of every file left out.
+    """
+    try:
+        compile_program(PROGRAM, *flags)
+    except CompileError as error:
+        return sorted(os.path.basename(line)
+                      for line in str(error).splitlines())
+    raise AssertionError("the program compiled")
+
+
+class ErrorsTest(unittest.TestCase):
+
+    def test_one_line_per_file(self):
+        lines = errors()
+        self.assertEqual(len(lines), 2, lines)
+        self.assertTrue(lines[0].startswith(
+            "Broken.jack: ValueError: Line 5: '123abc'"), lines)
+        self.assertTrue(lines[1].startswith("Unfinished.jack: "), lines)
+
+    def test_same_with_jobs(self):
+        self.assertEqual(errors(), errors("--jobs", "2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
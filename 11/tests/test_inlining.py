@@ -0,0 +1,100 @@
+"""
+Tests of the calls the compiler writes in place (see Inlining).
+"""
+import unittest
+from Harness import ProgramTestCase, compile_program, function_code
+
+INTRINSICS = {"Main": """
+class Main {
+    function void main() {
+        var int address;
+        let address = 3000;
+        do Memory.poke(address, -5);
+        do Output.printInt(Memory.peek(address));
+        do Output.printInt(Math.abs(Memory.peek(address)));
+        do Output.printInt(Math.abs(7));
+        do Output.printInt(Math.abs(-32767 - 1));
+        return;
+    }
+}
+"""}
+
+GETTERS = {"Main": """
+class Main {
+    function void main() {
+        var Point p;
+        let p = Point.new(3, 4);
+        do Output.printInt(p.getX());
+        do Output.printInt(p.getY());
+        do Output.printInt(p.shadowed());
+        do Output.printInt(Point.origin());
+        do Output.printInt(p.sum());
+        return;
+    }
+}
+""", "Point": """
+class Point {
+    field int x, y;
+
+    constructor Point new(int ax, int ay) {
+        let x = ax;
+        let y = ay;
+        return this;
+    }
+
+    method int getX() { return x; }
+
+    method int getY() { return y; }
+
+    method int shadowed() {
+        var int x;
+        return x;
+    }
+
+    function int origin() { return -1; }
+
+    method int sum() { return getX() + getY(); }
+}
+"""}
+
+
+class IntrinsicsTest(ProgramTestCase):
+
+    def test_written_in_place(self):
+        code = compile_program(INTRINSICS)["Main"]
+        self.assertNotIn("call Memory.peek", code)
+        self.assertNotIn("call Memory.poke", code)
+        self.assertNotIn("call Math.abs", code)
+
+    def test_same_as_calls(self):
+        self.assert_output(INTRINSICS, ["-5", "5", "7", "-32768"],
+                           ("--no-inline",))
+
+
+class GettersTest(ProgramTestCase):
+
+    def test_getters_of_the_class(self):
+        code = compile_program(GETTERS)["Point"]
+        # getX and getY are read from the fields of this object
+        self.assertEqual(function_code(code, "Point.sum"), [
+            "function Point.sum 0", "push argument 0", "pop pointer 0",
+            "push this 0", "push this 1", "add", "return"])
+
+    def test_getters_of_other_classes(self):
+        separate = compile_program(GETTERS)["Main"]
+        self.assertIn("call Point.getX 1", separate)
+        whole = compile_program(GETTERS, "--whole-program")["Main"]
+        self.assertNotIn("call Point.getX", whole)
+        self.assertNotIn("call Point.origin", whole)
+
+    def test_a_local_that_hides_a_field_is_no_getter(self):
+        code = compile_program(GETTERS, "--whole-program")["Main"]
+        self.assertIn("call Point.shadowed 1", code)
+
+    def test_same_as_calls(self):
+        self.assert_output(GETTERS, ["3", "4", "0", "-1", "7"],
+                           ("--whole-program",), ("--no-inline",))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+"""
+Tests of --hoist, which moves the expressions that do not change in a while
+loop to right before it (see LoopInvariants).
+"""
+import unittest
+from Harness import ProgramTestCase, compile_program, function_code
+
+PROGRAM = {"Main": """
+class Main {
+    static int scale;
+
+    function void main() {
+        var Counter counter;
+        do Output.printInt(Main.divide(10, 0, 5));
+        do Output.printInt(Main.divide(10, 2, 5));
+        do Output.printInt(Main.roots(-4, 3));
+        do Output.printInt(Main.roots(8, 3));
+        do Output.printInt(Main.withCall(3));
+        let counter = Counter.new();
+        do Output.printInt(counter.run(3));
+        do Output.printInt(Main.invariant(4, 5, 3));
+        return;
+    }
+
+    function int divide(int x, int d, int n) {
+        var int i, total;
+        while (i < n) {
+            if (d > 0) {
+                let total = total + (x / d);
+            }
+            let i = i + 1;
+        }
+        return total;
+    }
+
+    function int roots(int x, int n) {
+        var int i, total;
+        while (i < n) {
+            if (x > -1) {
+                let total = total + Math.sqrt(x + x);
+            }
+            let i = i + 1;
+        }
+        return total;
+    }
+
+    function int withCall(int n) {
+        var int i, total;
+        let scale = 1;
+        while (i < n) {
+            let total = total + (scale * scale + 1);
+            do Main.grow();
+            let i = i + 1;
+        }
+        return total;
+    }
+
+    function void grow() {
+        let scale = scale + 1;
+        return;
+    }
+
+    function int invariant(int a, int b, int n) {
+        var int i, total;
+        while (i < n) {
+            let total = total + (a * b + a);
+            let i = i + 1;
+        }
+        return total;
+    }
+}
+""", "Counter": """
+class Counter {
+    field int step;
+
+    constructor Counter new() {
+        let step = 1;
+        return this;
+    }
+
+    method int run(int n) {
+        var int i, total;
+        while (i < n) {
+            let total = total + (step * step + 1);
+            do bump();
+            let i = i + 1;
+        }
+        return total;
+    }
+
+    method void bump() {
+        let step = step + 1;
+        return;
+    }
+}
+"""}
+
+
+def before_loop(code: list) -> list:
+    """Returns the commands of a function before its first while loop."""
+    for position, command in enumerate(code):
+        if command.split()[1:2] and command.split()[1].startswith("While"):
+            return code[:position]
+    raise ValueError("no while loop")
+
+
+class LoopInvariantsTest(ProgramTestCase):
+
+    def setUp(self):
+        self.code = compile_program(PROGRAM, "--hoist")
+
+    def test_invariant_moved(self):
+        code = function_code(self.code["Main"], "Main.invariant")
+        # a * b + a is kept in a local of its own
+        self.assertEqual(code[0], "function Main.invariant 3")
+        self.assertIn("call Math.multiply 2", before_loop(code))
+        self.assertIn("pop local 2", before_loop(code))
+        self.assertNotIn("call Math.multiply 2",
+                         code[len(before_loop(code)):])
+
+    def test_partial_calls_stay_in_the_loop(self):
+        # The loops only divide and take roots when an if lets them
+        for name, call in (("Main.divide", "call Math.divide 2"),
+                           ("Main.roots", "call Math.sqrt 1")):
+            with self.subTest(name=name):
+                code = function_code(self.code["Main"], name)
+                self.assertNotIn(call, before_loop(code))
+                self.assertIn(call, code)
+
+    def test_statics_stay_in_loops_with_calls(self):
+        code = function_code(self.code["Main"], "Main.withCall")
+        self.assertNotIn("call Math.multiply 2", before_loop(code))
+        self.assertNotIn("push static 0", before_loop(code))
+
+    def test_fields_stay_in_loops_with_calls(self):
+        code = function_code(self.code["Counter"], "Counter.run")
+        self.assertNotIn("call Math.multiply 2", before_loop(code))
+        self.assertNotIn("push this 0", before_loop(code))
+
+    def test_values(self):
+        self.assert_output(PROGRAM, ["0", "25", "0", "12", "17", "17", "72"],
+                           ("--hoist",))
+
+
+if __name__ == "__main__":
+    unittest.main()
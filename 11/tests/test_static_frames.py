@@ -0,0 +1,88 @@
+"""
+Tests of --static-frames, which keeps the locals of subroutines that never
+recurse in static variables (see StaticFrames).
+"""
+import unittest
+from Harness import ProgramTestCase, compile_program, function_code
+
+PROGRAM = {"Main": """
+class Main {
+    function void main() {
+        do Output.printInt(Main.factorial(5));
+        do Output.printInt(Main.isEven(6));
+        do Output.printInt(Main.isEven(7));
+        do Output.printInt(Main.sum(4));
+        do Output.printInt(Main.sum(3));
+        return;
+    }
+
+    function int factorial(int n) {
+        var int rest;
+        if (n < 2) {
+            return 1;
+        }
+        let rest = Main.factorial(n - 1);
+        return n * rest;
+    }
+
+    function boolean isEven(int n) {
+        var boolean result;
+        if (n = 0) {
+            return true;
+        }
+        let result = Main.isOdd(n - 1);
+        return result;
+    }
+
+    function boolean isOdd(int n) {
+        var boolean result;
+        if (n = 0) {
+            return false;
+        }
+        let result = Main.isEven(n - 1);
+        return result;
+    }
+
+    function int sum(int n) {
+        var int i, total;
+        while (i < n) {
+            let total = total + i;
+            let i = i + 1;
+        }
+        return total;
+    }
+}
+"""}
+FLAGS = ("--whole-program", "--static-frames")
+
+
+class StaticFramesTest(ProgramTestCase):
+
+    def setUp(self):
+        self.code = compile_program(PROGRAM, *FLAGS)["Main"]
+
+    def test_recursive_locals_stay_on_the_stack(self):
+        for name in ("Main.factorial", "Main.isEven", "Main.isOdd"):
+            with self.subTest(name=name):
+                code = function_code(self.code, name)
+                self.assertEqual(code[0], f"function {name} 1")
+                self.assertIn("pop local 0", code)
+                self.assertFalse(any(command.split()[1:2] == ["static"]
+                                     for command in code))
+
+    def test_other_locals_are_static(self):
+        code = function_code(self.code, "Main.sum")
+        self.assertEqual(code[0], "function Main.sum 0")
+        self.assertFalse(any(command.split()[1:2] == ["local"]
+                             for command in code))
+        # i and total are read before they are assigned, so they start at 0
+        # on every call
+        self.assertEqual(code[1:5], ["push constant 0", "pop static 0",
+                                     "push constant 0", "pop static 1"])
+
+    def test_values(self):
+        self.assert_output(PROGRAM, ["120", "-1", "0", "6", "3"], FLAGS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Tests of JackTokenizer: the kind, value and line of every token, and the
+errors for tokens that are not Jack.
+"""
+import io
+import os
+import sys
+import unittest
+from Harness import CompileError, compile_program
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from JackTokenizer import JackTokenizer
+
+
+def tokens(source: str) -> list:
+    """Returns the (kind, value, line) of every token of source."""
+    tokenizer = JackTokenizer(io.StringIO(source))
+    result = []
+    while tokenizer.has_more_tokens():
+        tokenizer.advance()
+        result.append((tokenizer.token_type(), tokenizer.get_current_token(),
+                       tokenizer.line()))
+    return result
+
+
+class TokenizerTest(unittest.TestCase):
+
+    def test_kinds_values_and_lines(self):
+        self.assertEqual(
+            tokens('let x_1 = 12;\n/* a\n comment */ do Output.printString('
+                   '"a // b");\n// the end\n_y'),
+            [("KEYWORD", "LET", 1), ("IDENTIFIER", "x_1", 1),
+             ("SYMBOL", "=", 1), ("INT_CONST", 12, 1), ("SYMBOL", ";", 1),
+             ("KEYWORD", "DO", 3), ("IDENTIFIER", "Output", 3),
+             ("SYMBOL", ".", 3), ("IDENTIFIER", "printString", 3),
+             ("SYMBOL", "(", 3), ("STRING_CONST", "a // b", 3),
+             ("SYMBOL", ")", 3), ("SYMBOL", ";", 3),
+             ("IDENTIFIER", "_y", 5)])
+
+    def test_identifier_starting_with_a_digit(self):
+        with self.assertRaisesRegex(ValueError, "Line 2: '123abc'"):
+            tokens("let x = 1;\nlet y = 123abc;")
+
+    def test_unterminated_string(self):
+        with self.assertRaisesRegex(ValueError, "Line 3: unterminated"):
+            tokens('do f();\n\ndo Output.printString("abc);\n')
+
+    def test_comment_across_blocks(self):
+        # A block comment longer than a block of the input
+        source = "let x = 1;\n/*" + "\n" * 70000 + "*/ let y = 2;"
+        self.assertEqual(tokens(source)[5:7],
+                         [("KEYWORD", "LET", 70002), ("IDENTIFIER", "y", 70002)])
+
+    def test_compiler_reports_the_line(self):
+        with self.assertRaisesRegex(CompileError, "Line 4: '123abc'"):
+            compile_program({"Main": "class Main {\n"
+                                     "    function void main() {\n"
+                                     "        var int x;\n"
+                                     "        let x = 123abc;\n"
+                                     "        return;\n"
+                                     "    }\n"
+                                     "}\n"})
+
+
+if __name__ == "__main__":
+    unittest.main()
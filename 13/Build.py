@@ -0,0 +1,327 @@
+"""
+Builds a Jack program all the way to a .hack file, in a single process.
+
+The compiler (11), the VM translator (08) and the assembler (06) are loaded as
+modules, and every stage hands its output to the next one in memory: no .vm
+or .asm file is written unless asked for with --keep. The program is the same
+as running JackCompiler, VMtranslator and Assembler one after the other,
+except that its functions may come in another order: the separate translator
+reads the .vm files in whatever order the directory lists them.
+
+Usage: Build <program directory> [--os DIR] [--keep] [--fold]
+             [--no-inline] [--whole-program] [--cse] [--hoist]
+             [--static-frames] [--vm-inline [SIZE]] [--vm-cache [DIR]]
+             [--stats]
+"""
+import argparse
+import importlib
+import io
+import os
+import sys
+import types
+import typing
+from Stats import Stats, NO_STATS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPILER_DIRECTORY = os.path.join(ROOT, "11")
+TRANSLATOR_DIRECTORY = os.path.join(ROOT, "08")
+ASSEMBLER_DIRECTORY = os.path.join(ROOT, "06")
+
+
+def load_tool(directory: str, module_name: str) -> types.ModuleType:
+    """Imports the main module of a tool, with its sibling modules.
+
+    The tools import their own modules by plain name, and some of these
+    names are shared (every tool has a Stats module, 06 and 11 both have a
+    SymbolTable). The modules of one tool are therefore taken out of
+    sys.modules once it is loaded, so the next tool gets its own; the
+    loaded modules keep referring to each other.
+
+    Args:
+        directory (str): the directory of the tool.
+        module_name (str): the module to import, e.g. "JackCompiler".
+
+    Returns:
+        ModuleType: the imported module.
+    """
+    names = {os.path.splitext(filename)[0] for filename in os.listdir(directory)
+             if filename.endswith(".py")}
+    shadowed = {name: sys.modules.pop(name) for name in names
+                if name in sys.modules}
+    sys.path.insert(0, directory)
+    try:
+        return importlib.import_module(module_name)
+    finally:
+        sys.path.remove(directory)
+        for name in names:
+            sys.modules.pop(name, None)
+        sys.modules.update(shadowed)
+
+
+def program_files(directories: typing.List[str]) -> typing.List[str]:
+    """
+    Args:
+        directories (List[str]): the program directory, then the directories
+            of libraries such as the OS.
+
+    Returns:
+        List[str]: the paths of the .jack files to compile and of the .vm
+        files to translate as they are, directory by directory. A class is
+        taken from the first directory that has it, and from its .jack file
+        rather than a .vm file of the same name.
+    """
+    paths = {}
+    for directory in directories:
+        filenames = os.listdir(directory)
+        classes = {os.path.splitext(filename)[0] for filename in filenames
+                   if os.path.splitext(filename)[1].lower() == ".jack"}
+        for filename in filenames:
+            class_name, extension = os.path.splitext(filename)
+            extension = extension.lower()
+            if class_name in paths or extension not in (".jack", ".vm") or \
+                    extension == ".vm" and class_name in classes:
+                continue
+            paths[class_name] = os.path.join(directory, filename)
+    return list(paths.values())
+
+
+def build(input_path: str, output_path: str,
+          library_paths: typing.List[str], keep: bool = False,
+          fold: bool = False, inline: bool = True,
+          whole_program: bool = False, cse: bool = False,
+          hoist: bool = False, static_frames: bool = False,
+          resolve_calls: bool = False,
+          vm_inline: typing.Optional[int] = None,
+          vm_cache: typing.Optional[str] = None,
+          stats: Stats = NO_STATS) -> typing.Optional[str]:
+    """Compiles, translates and assembles a whole program.
+
+    Args:
+        input_path (str): the directory of the program.
+        output_path (str): the .hack file to write.
+        library_paths (List[str]): more directories to take the classes the
+            program does not have from, e.g. the OS.
+        keep (bool): if this is True, the .vm file of every class compiled
+            from the program directory is written next to its .jack file
+            (libraries are left untouched), and the .asm file next to
+            output_path.
+        fold (bool): if this is True, constant expressions are folded by
+            both the compiler and the VM translator.
+        inline (bool): if this is True, the compiler writes calls to OS
+            intrinsics and trivial getters in place.
+        whole_program (bool): if this is True, the subroutines that cannot
+            be reached from Main.main or Sys.init are left out, and getters
+            are inlined across classes.
+        cse (bool): if this is True, the compiler computes the address of
+            an array entry a statement reads more than once only once.
+        hoist (bool): if this is True, the compiler computes the
+            expressions of a while loop that are the same on every
+            iteration once, before the loop.
+        static_frames (bool): if this is True, with whole_program, the
+            locals of the subroutines that never recurse are kept in static
+            variables instead of in their stack frames.
+        resolve_calls (bool): if this is True, the compiler resolves every
+            call against the subroutines of all the classes it compiles.
+        vm_inline (Optional[int]): if given, the VM translator inlines calls
+            to non-recursive functions of at most this many VM commands,
+            where that does not grow the ROM (see the translator's
+            --inline).
+        vm_cache (Optional[str]): if given, the VM translator reuses the
+            translation of unchanged functions, stored in this directory
+            (see the translator's --cache).
+        stats (Stats): collects the wall time of every stage.
+
+    Returns:
+        Optional[str]: with whole_program, the list of the subroutines that
+        were left out.
+    """
+    with stats.phase("load"):
+        compiler = load_tool(COMPILER_DIRECTORY, "JackCompiler")
+        translator = load_tool(TRANSLATOR_DIRECTORY, "Main")
+        assembler = load_tool(ASSEMBLER_DIRECTORY, "Main")
+
+    paths = program_files([input_path] + library_paths)
+    options = compiler.CompileOptions(fold=fold, inline=inline, cse=cse,
+                                      hoist=hoist)
+    omitted = None
+    index = compiler.ClassIndex() if resolve_calls else None
+    if whole_program:
+        with stats.phase("analyze"):
+            classes = []
+            external = set()
+            reserved = 0
+            for path in paths:
+                with open(path, 'r') as input_file:
+                    if os.path.splitext(path)[1].lower() == ".vm":
+                        external.update(compiler.vm_calls(input_file))
+                        input_file.seek(0)
+                        reserved += compiler.vm_statics(input_file)
+                    else:
+                        classes.append(
+                            compiler.parse_file(input_file, options))
+            live = compiler.live_subroutines(classes,
+                                             external.union(compiler.ROOTS))
+            options = options._replace(live=live)
+            if inline:
+                getters = {}
+                for class_node in classes:
+                    getters.update(compiler.trivial_getters(class_node))
+                options = options._replace(getters=getters)
+            if static_frames:
+                options = options._replace(frames=compiler.static_frames(
+                    classes, external, reserved, live))
+            omitted = compiler.report(classes, live)
+            if index is not None:
+                for class_node in classes:
+                    index.add(compiler.class_interface(class_node))
+    elif index is not None:
+        with stats.phase("index"):
+            for path in paths:
+                if os.path.splitext(path)[1].lower() == ".jack":
+                    with open(path, 'r') as input_file:
+                        index.add(compiler.scan_interface(input_file))
+    options = options._replace(index=index)
+
+    vm_files = []
+    with stats.phase("compile"):
+        for path in paths:
+            filename, extension = os.path.splitext(path)
+            if extension.lower() == ".vm":
+                with open(path, 'r') as vm_file:
+                    vm_code = vm_file.read()
+            else:
+                vm_buffer = io.StringIO()
+                with open(path, 'r') as input_file:
+                    compiler.compile_file(input_file, vm_buffer, options)
+                vm_code = vm_buffer.getvalue()
+                stats.count("classes_compiled")
+                if keep and os.path.dirname(path) == input_path:
+                    with open(filename + ".vm", 'w') as vm_file:
+                        vm_file.write(vm_code)
+            vm_stream = io.StringIO(vm_code)
+            # The translator names static variables after the file
+            vm_stream.name = os.path.basename(filename) + ".vm"
+            vm_files.append(vm_stream)
+
+    inliner = None
+    if vm_inline is not None:
+        # Inlining needs to see every function of the program up front
+        with stats.phase("inline"):
+            inliner = translator.Inliner(vm_inline)
+            for vm_stream in vm_files:
+                commands = translator.Parser(vm_stream).commands
+                if fold:
+                    commands = translator.fold_constants(commands)
+                inliner.add_file(os.path.splitext(vm_stream.name)[0],
+                                 commands)
+                vm_stream.seek(0)
+            inliner.finish()
+    cache = None
+    if vm_cache is not None:
+        cache = translator.TranslationCache(
+            vm_cache, translator.cache_options(inliner))
+
+    asm_buffer = io.StringIO()
+    with stats.phase("translate"):
+        for vm_stream in vm_files:
+            translator.translate_file(vm_stream, asm_buffer,
+                                      vm_stream is vm_files[0], cache,
+                                      inliner, fold)
+    asm_code = asm_buffer.getvalue()
+    if keep:
+        with open(os.path.splitext(output_path)[0] + ".asm", 'w') as asm_file:
+            asm_file.write(asm_code)
+
+    hack_buffer = io.StringIO()
+    with stats.phase("assemble"):
+        assembler.assemble_file(io.StringIO(asm_code), hack_buffer)
+    hack_code = hack_buffer.getvalue()
+    with stats.phase("write"):
+        with open(output_path, 'w') as hack_file:
+            hack_file.write(hack_code)
+    stats.count("vm_files", len(vm_files))
+    if inliner is not None:
+        stats.count("inlined_calls", len(inliner.sites))
+    if cache is not None:
+        stats.count("cache_hits", cache.hits)
+        stats.count("cache_misses", cache.misses)
+    stats.count("instructions", hack_code.count("\n"))
+    return omitted
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(
+        prog="Build", usage="Build <program directory> [options]")
+    arg_parser.add_argument("input_path")
+    arg_parser.add_argument(
+        "--os", action="append", default=[], metavar="DIR",
+        help="take the classes the program does not have from the .jack or "
+             ".vm files in DIR, e.g. the OS (may be repeated)")
+    arg_parser.add_argument(
+        "--output", "-o", metavar="FILE",
+        help="the .hack file to write (default: <program>/<program>.hack)")
+    arg_parser.add_argument(
+        "--keep", action="store_true",
+        help="also write the intermediate .vm and .asm files")
+    arg_parser.add_argument(
+        "--fold", action="store_true",
+        help="fold constant expressions in the compiler and the translator")
+    arg_parser.add_argument(
+        "--no-inline", dest="inline", action="store_false",
+        help="do not lower Memory.peek, Memory.poke, Math.abs and trivial "
+             "getters in place in the compiler")
+    arg_parser.add_argument(
+        "--whole-program", action="store_true",
+        help="leave out every subroutine that cannot be reached from "
+             "Main.main or Sys.init, and list them")
+    arg_parser.add_argument(
+        "--cse", action="store_true",
+        help="reuse array entry addresses within statements in the compiler")
+    arg_parser.add_argument(
+        "--hoist", action="store_true",
+        help="move loop-invariant expressions out of while loops in the "
+             "compiler")
+    arg_parser.add_argument(
+        "--static-frames", action="store_true",
+        help="with --whole-program, keep the locals of subroutines that "
+             "never recurse in static variables")
+    arg_parser.add_argument(
+        "--resolve-calls", action="store_true",
+        help="resolve every call against the subroutines of all the classes "
+             "in the compiler, so functions of a class can be called without "
+             "the class name")
+    arg_parser.add_argument(
+        "--vm-inline", nargs="?", type=int, const=8, metavar="SIZE",
+        help="inline calls to non-recursive functions of at most SIZE VM "
+             "commands in the translator (default: 8), where that does not "
+             "grow the ROM")
+    arg_parser.add_argument(
+        "--vm-cache", nargs="?", const="", metavar="DIR",
+        help="reuse the translation of unchanged functions in the "
+             "translator, stored in DIR (default: .vmcache next to the "
+             "output file)")
+    arg_parser.add_argument(
+        "--stats", nargs="?", const="-", metavar="FILE",
+        help="write the time spent in every stage as JSON to FILE "
+             "(default: stdout)")
+    args = arg_parser.parse_args()
+    if args.static_frames and not args.whole_program:
+        arg_parser.error("--static-frames needs --whole-program")
+    stats = Stats("Build") if args.stats is not None else NO_STATS
+    program_path = os.path.abspath(args.input_path)
+    output_path = args.output or os.path.join(
+        program_path, os.path.basename(program_path) + ".hack")
+    vm_cache = args.vm_cache
+    if vm_cache == "":
+        vm_cache = os.path.join(os.path.dirname(output_path), ".vmcache")
+    omitted = build(program_path, output_path,
+                    [os.path.abspath(path) for path in args.os], args.keep,
+                    args.fold, args.inline, args.whole_program, args.cse,
+                    args.hoist, args.static_frames, args.resolve_calls,
+                    args.vm_inline, vm_cache, stats)
+    if omitted is not None:
+        # Keeps stdout valid JSON when the statistics are written there
+        print(omitted, end="",
+              file=sys.stderr if args.stats == "-" else sys.stdout)
+    if stats.enabled:
+        stats.dump(args.stats)
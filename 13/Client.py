@@ -0,0 +1,122 @@
+"""
+Runs a tool through the toolchain server, or directly if there is none.
+
+The server (Server.py) keeps the assembler, the VM translator and the
+compiler loaded, so a run through it does not pay for starting the tool.
+This client only imports what it needs to talk to the server. It sends the
+tool's directory and arguments and its own working directory, then prints
+what the tool printed and exits with its status. When no server is running,
+or the server does not serve the tool (e.g. it was started from another copy
+of the projects), the tool is run in this process instead.
+
+What the server sends back is printed as the output of the tool, so the
+client only connects to a socket that no other user could have put in
+place: the socket and the directory it is in must belong to this user, and
+no one else may write to that directory. The server creates its directory
+that way.
+
+Usage: Client <tool script> <arguments of the tool>
+"""
+import json
+import os
+import socket
+import stat
+import sys
+import typing
+
+
+def socket_path() -> str:
+    """
+    Returns:
+        str: the Unix socket the server listens on: $NAND2TETRIS_SOCKET if
+        it is set, and otherwise nand2tetris.sock in $XDG_RUNTIME_DIR, or
+        in a nand2tetris-<uid> directory of $TMPDIR.
+    """
+    if os.environ.get("NAND2TETRIS_SOCKET"):
+        return os.environ["NAND2TETRIS_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "nand2tetris.sock")
+    return os.path.join(os.environ.get("TMPDIR", "/tmp"),
+                        f"nand2tetris-{os.getuid()}", "nand2tetris.sock")
+
+
+def private_directory(directory: str) -> bool:
+    """
+    Returns:
+        bool: whether directory belongs to this user, and no one else may
+        create or replace the entries in it.
+    """
+    try:
+        status = os.stat(directory)
+    except OSError:
+        return False
+    return stat.S_ISDIR(status.st_mode) and status.st_uid == os.getuid() and \
+        not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def trusted_socket(path: str) -> bool:
+    """
+    Returns:
+        bool: whether path is a socket of this user, in a private directory.
+    """
+    try:
+        status = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISSOCK(status.st_mode) and status.st_uid == os.getuid() \
+        and private_directory(os.path.dirname(os.path.abspath(path)))
+
+
+def run_on_server(directory: str, script: str,
+                  arguments: typing.List[str]) -> typing.Optional[int]:
+    """Asks the server to run a tool, and prints its output.
+
+    Args:
+        directory (str): the directory of the tool.
+        script (str): the main script of the tool, e.g. "JackCompiler.py".
+        arguments (List[str]): the command line arguments of the tool.
+
+    Returns:
+        Optional[int]: the exit status of the tool, or None if the server
+        could not run it.
+    """
+    path = socket_path()
+    if not trusted_socket(path):
+        return None
+    request = {"directory": directory, "script": script,
+               "arguments": arguments, "cwd": os.getcwd()}
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(path)
+            connection.sendall(json.dumps(request).encode() + b"\n")
+            reply = b"".join(iter(lambda: connection.recv(65536), b""))
+        reply = json.loads(reply)
+    except (OSError, ValueError):
+        return None
+    if reply.get("status") is None:
+        return None
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    return reply["status"]
+
+
+def run_directly(directory: str, script: str,
+                 arguments: typing.List[str]) -> None:
+    """Runs a tool in this process, as if it was started on its own."""
+    import runpy
+    path = os.path.join(directory, script)
+    # As if started on its own: the tool imports its modules by plain name
+    sys.path[0] = directory
+    sys.argv = [path] + arguments
+    runpy.run_path(path, run_name="__main__")
+
+
+if "__main__" == __name__:
+    if len(sys.argv) < 2:
+        sys.exit("Usage: Client <tool script> <arguments of the tool>")
+    tool_directory, tool_script = os.path.split(os.path.abspath(sys.argv[1]))
+    status = run_on_server(tool_directory, tool_script, sys.argv[2:])
+    if status is None:
+        run_directly(tool_directory, tool_script, sys.argv[2:])
+    else:
+        sys.exit(status)
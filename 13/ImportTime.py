@@ -0,0 +1,121 @@
+"""
+Checks that every tool starts quickly.
+
+Each tool is imported in a fresh interpreter with python -X importtime, from
+its own directory, and the time its imports take is compared with a budget.
+The check also fails if a tool imports one of the HEAVY packages at all: the
+tools only need the standard library, and a stray import of such a package
+costs more than the whole budget.
+
+tests/test_import_time.py runs the check as part of the test suite; this
+script prints the time of every tool.
+
+Usage: ImportTime [--runs N] [--scale FACTOR]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import typing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The directory, main module and import budget in milliseconds of every tool
+TOOLS = [
+    ("06", "Main", 40),
+    ("07", "Main", 40),
+    ("08", "Main", 50),
+    ("10", "JackAnalyzer", 40),
+    ("11", "JackCompiler", 60),
+]
+HEAVY = ("pandas", "numpy", "scipy", "matplotlib")
+
+
+def import_time(directory: str, module_name: str) -> \
+        typing.Tuple[float, typing.List[str]]:
+    """Imports a module in a new interpreter.
+
+    Args:
+        directory (str): the directory to import from.
+        module_name (str): the module to import.
+
+    Returns:
+        Tuple[float, List[str]]: the cumulative import time of the module in
+        milliseconds, and the names of all the modules it imported.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=directory, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL,
+        universal_newlines=True, check=True)
+    total = 0
+    modules = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if not fields[1].strip().isdigit():
+            continue  # The header
+        name = fields[2].strip()
+        modules.append(name)
+        if name == module_name:
+            total = int(fields[1])
+    return total / 1000, modules
+
+
+def measure(directory: str, module_name: str, runs: int = 5) -> \
+        typing.Tuple[float, typing.List[str]]:
+    """Imports a tool several times.
+
+    Args:
+        directory (str): the directory of the tool, relative to the
+            repository.
+        module_name (str): its main module.
+        runs (int): how many times to import it; the fastest run is kept,
+            so a busy machine does not fail the check.
+
+    Returns:
+        Tuple[float, List[str]]: the import time of the tool in
+        milliseconds, and the HEAVY modules it imports.
+    """
+    path = os.path.join(ROOT, directory)
+    # The first run also compiles the modules to bytecode
+    import_time(path, module_name)
+    timings, modules = zip(*(import_time(path, module_name)
+                             for _ in range(runs)))
+    heavy = sorted({name for name in modules[0]
+                    if name.split(".")[0] in HEAVY})
+    return min(timings), heavy
+
+
+def check(runs: int = 5, scale: float = 1.0) -> bool:
+    """Measures every tool and prints a line for each.
+
+    Args:
+        runs (int): how many times to import each tool (see measure).
+        scale (float): multiplies every budget, for slower machines.
+
+    Returns:
+        bool: whether every tool is within its budget.
+    """
+    passed = True
+    for directory, module_name, budget in TOOLS:
+        milliseconds, heavy = measure(directory, module_name, runs)
+        ok = milliseconds <= budget * scale and not heavy
+        passed = passed and ok
+        print(f"{'ok  ' if ok else 'FAIL'} {directory}/{module_name}: "
+              f"{milliseconds:.1f} ms (budget {budget * scale:.0f} ms)"
+              + (f", imports {', '.join(heavy)}" if heavy else ""))
+    return passed
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(
+        prog="ImportTime", usage="ImportTime [options]")
+    arg_parser.add_argument(
+        "--runs", type=int, default=5, metavar="N",
+        help="import every tool N times and keep the fastest (default: 5)")
+    arg_parser.add_argument(
+        "--scale", type=float, default=1.0, metavar="FACTOR",
+        help="multiply every budget by FACTOR, for slower machines")
+    args = arg_parser.parse_args()
+    sys.exit(0 if check(args.runs, args.scale) else 1)
@@ -0,0 +1,244 @@
+"""
+Keeps the assembler (06), the VM translator (08) and the compiler (11)
+loaded, and runs them for Client.py.
+
+The server listens on a Unix socket that only its user may connect to, in a
+directory no one else may write to, so clients can trust it. Every
+request names the directory of a tool, its arguments and the working
+directory of the client; it is run by a pool of worker processes of that
+tool, which imported its modules once, when they started. The tool's main
+script runs as it would from the command line, and its exit status and what
+it printed are sent back to the client.
+
+A tool's workers are replaced as soon as any of its modules changes, so a
+server left running never runs outdated code.
+
+Usage: Server [--socket PATH] [--workers N]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import traceback
+import types
+import typing
+from Client import private_directory, socket_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The directory and main script of every tool the server runs
+TOOLS = {"06": "Main.py", "08": "Main.py", "11": "JackCompiler.py"}
+
+# The tool of a worker process, set by _load_tool when the worker starts
+_script = ""
+_code = None
+
+
+def _load_tool(directory: str, script: str) -> None:
+    """Prepares a worker process to run a tool."""
+    global _script, _code
+    sys.path.insert(0, directory)
+    _script = os.path.join(directory, script)
+    with open(_script, 'r') as script_file:
+        _code = compile(script_file.read(), _script, "exec")
+    # Importing the main module once imports everything it needs, so a run
+    # only has to execute the main script itself
+    importlib.import_module(os.path.splitext(script)[0])
+
+
+def _run_tool(arguments: typing.List[str],
+              cwd: str) -> typing.Tuple[int, str, str]:
+    """Runs the tool of this worker as if from the command line.
+
+    Returns:
+        Tuple[int, str, str]: the exit status of the tool, and what it wrote
+        to stdout and to stderr.
+    """
+    stdout, stderr = io.StringIO(), io.StringIO()
+    # The main script runs as __main__, so that its "if __main__" block runs
+    # and its functions can be sent to the process pools it starts itself
+    module = types.ModuleType("__main__")
+    module.__file__ = _script
+    main_module = sys.modules["__main__"]
+    sys.modules["__main__"] = module
+    sys.argv = [_script] + arguments
+    status = 0
+    try:
+        with contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(stderr):
+            try:
+                os.chdir(cwd)
+                exec(_code, module.__dict__)
+            except SystemExit as exit_request:
+                if isinstance(exit_request.code, int):
+                    status = exit_request.code
+                elif exit_request.code is not None:
+                    print(exit_request.code, file=sys.stderr)
+                    status = 1
+            except Exception as error:
+                # Printed as the tool prints it on its own, without this
+                # function
+                traceback.print_exception(type(error), error,
+                                          error.__traceback__.tb_next)
+                status = 1
+    finally:
+        sys.modules["__main__"] = main_module
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+def _fingerprint(directory: str) -> typing.FrozenSet[typing.Tuple[str, int]]:
+    """Returns the names and modification times of the modules of a tool."""
+    return frozenset((entry.name, entry.stat().st_mtime_ns)
+                     for entry in os.scandir(directory)
+                     if entry.name.endswith(".py"))
+
+
+class ToolServer:
+    """Answers the requests of clients with pools of tool workers."""
+
+    def __init__(self, workers: int) -> None:
+        """
+        Args:
+            workers (int): the number of worker processes of every tool.
+        """
+        self.workers = workers
+        self.tools = {os.path.realpath(os.path.join(ROOT, directory)): script
+                      for directory, script in TOOLS.items()}
+        self.pools = {}
+
+    def pool(self, directory: str) -> concurrent.futures.ProcessPoolExecutor:
+        """Returns the workers of a tool, started again if it changed."""
+        fingerprint = _fingerprint(directory)
+        current = self.pools.get(directory)
+        if current is not None and current[0] == fingerprint:
+            return current[1]
+        if current is not None:
+            current[1].shutdown(wait=False)
+        pool = concurrent.futures.ProcessPoolExecutor(
+            self.workers, multiprocessing.get_context("forkserver"),
+            initializer=_load_tool,
+            initargs=(directory, self.tools[directory]))
+        # Workers are forked from a process of their own, as forking this
+        # one, with the threads of the other pools, may deadlock. They start
+        # on the first task, so they load the tool now rather than while a
+        # client waits
+        pool.submit(int)
+        self.pools[directory] = (fingerprint, pool)
+        return pool
+
+    def start(self) -> None:
+        """Loads every tool."""
+        for directory in self.tools:
+            self.pool(directory)
+
+    def close(self) -> None:
+        for fingerprint, pool in self.pools.values():
+            pool.shutdown(wait=False)
+        self.pools.clear()
+
+    async def run(self, request: dict) -> dict:
+        """
+        Args:
+            request (dict): the "directory" and "script" of a tool, its
+                "arguments" and the "cwd" to run it in.
+
+        Returns:
+            dict: the "status", "stdout" and "stderr" of the tool, or a None
+            "status" and an "error" if it was not run.
+        """
+        directory = os.path.realpath(request["directory"])
+        if self.tools.get(directory) != request["script"]:
+            return {"status": None,
+                    "error": f"not serving {request['script']} of {directory}"}
+        loop = asyncio.get_running_loop()
+        try:
+            status, stdout, stderr = await loop.run_in_executor(
+                self.pool(directory), _run_tool, list(request["arguments"]),
+                request["cwd"])
+        except concurrent.futures.process.BrokenProcessPool as error:
+            # A worker died, so the next request starts new ones
+            self.pools.pop(directory, None)
+            return {"status": None, "error": str(error)}
+        return {"status": status, "stdout": stdout, "stderr": stderr}
+
+    async def handle(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter) -> None:
+        """Answers the single request of a connection."""
+        try:
+            reply = await self.run(json.loads(await reader.readline()))
+        except (ValueError, KeyError, TypeError) as error:
+            reply = {"status": None, "error": f"bad request: {error}"}
+        writer.write(json.dumps(reply).encode() + b"\n")
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass  # The client is gone
+        writer.close()
+
+
+async def serve(path: str, workers: int) -> None:
+    """Runs the server until it is interrupted.
+
+    Args:
+        path (str): the Unix socket to listen on.
+        workers (int): the number of worker processes of every tool.
+    """
+    # Clients only trust a socket in a directory no one else may write to
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not private_directory(directory):
+        sys.exit(f"Server: {directory} must belong to this user, and no one "
+                 f"else may write to it")
+    if os.path.exists(path):
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+        except OSError:
+            os.unlink(path)  # Left behind by a server that was killed
+        else:
+            writer.close()
+            sys.exit(f"Server: a server is already listening on {path}")
+    tool_server = ToolServer(workers)
+    tool_server.start()
+    # Clients run tools with the rights of the server, so only its own user
+    # may connect
+    umask = os.umask(0o077)
+    try:
+        unix_server = await asyncio.start_unix_server(tool_server.handle, path)
+    finally:
+        os.umask(umask)
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM,
+                                                  unix_server.close)
+    try:
+        async with unix_server:
+            await unix_server.serve_forever()
+    except asyncio.CancelledError:
+        pass  # Closed by SIGTERM
+    finally:
+        tool_server.close()
+        os.unlink(path)
+
+
+if "__main__" == __name__:
+    arg_parser = argparse.ArgumentParser(
+        prog="Server", usage="Server [options]")
+    arg_parser.add_argument(
+        "--socket", default=socket_path(), metavar="PATH",
+        help="the Unix socket to listen on, in a directory only this user "
+             "may write to (default: $NAND2TETRIS_SOCKET, or "
+             "nand2tetris.sock in $XDG_RUNTIME_DIR or in "
+             "$TMPDIR/nand2tetris-<uid>)")
+    arg_parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, metavar="N",
+        help="run up to N requests for each tool at once (default: one "
+             "per CPU)")
+    args = arg_parser.parse_args()
+    try:
+        asyncio.run(serve(args.socket, args.workers))
+    except KeyboardInterrupt:
+        pass
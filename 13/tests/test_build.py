@@ -0,0 +1,71 @@
+"""
+Tests of the VM translator options of Build: --vm-inline and --vm-cache.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+BUILD = os.path.join(REPOSITORY, "13", "Build.py")
+
+
+class BuildTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.program = os.path.join(self.directory, "Pong")
+        shutil.copytree(os.path.join(REPOSITORY, "11", "Pong"), self.program)
+
+    def build(self, *flags: str) -> tuple:
+        """Builds Pong with the OS.
+
+        Returns:
+            tuple: the .hack code, and the counts of the statistics.
+        """
+        output_path = os.path.join(self.directory, "Pong.hack")
+        stats_path = os.path.join(self.directory, "stats.json")
+        subprocess.run(
+            [sys.executable, BUILD, self.program, "--os",
+             os.path.join(REPOSITORY, "12"), "--output", output_path,
+             "--stats", stats_path, *flags],
+            check=True, stdout=subprocess.DEVNULL)
+        with open(output_path, 'r') as hack_file, \
+                open(stats_path, 'r') as stats_file:
+            return hack_file.read(), json.load(stats_file)["counts"]
+
+    def test_inline(self):
+        plain, plain_counts = self.build()
+        inlined, counts = self.build("--vm-inline")
+        self.assertNotIn("inlined_calls", plain_counts)
+        self.assertGreater(counts["inlined_calls"], 0)
+        # Calls are only inlined where that does not grow the ROM
+        self.assertLessEqual(counts["instructions"],
+                             plain_counts["instructions"])
+        self.assertNotEqual(inlined, plain)
+
+    def test_cache(self):
+        cache = os.path.join(self.directory, "cache")
+        uncached, _ = self.build("--vm-inline")
+        cold, cold_counts = self.build("--vm-inline", "--vm-cache", cache)
+        warm, warm_counts = self.build("--vm-inline", "--vm-cache", cache)
+        self.assertEqual(cold, uncached)
+        self.assertEqual(warm, uncached)
+        self.assertEqual(cold_counts["cache_hits"], 0)
+        self.assertEqual(warm_counts["cache_misses"], 0)
+        self.assertEqual(warm_counts["cache_hits"],
+                         cold_counts["cache_misses"])
+        self.assertEqual(warm_counts["inlined_calls"],
+                         cold_counts["inlined_calls"])
+        # Inlining other functions gives other code, so nothing is reused
+        _, counts = self.build("--vm-inline", "4", "--vm-cache", cache)
+        self.assertEqual(counts["cache_hits"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
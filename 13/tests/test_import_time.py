@@ -0,0 +1,28 @@
+"""
+Tests that every tool starts within its import time budget, and without
+importing any of the heavy packages (see ImportTime.py).
+
+Set IMPORT_TIME_SCALE to multiply every budget, on slower machines.
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ImportTime import TOOLS, measure
+
+SCALE = float(os.environ.get("IMPORT_TIME_SCALE", "1"))
+
+
+class ImportTimeTest(unittest.TestCase):
+
+    def test_budgets(self):
+        for directory, module_name, budget in TOOLS:
+            with self.subTest(tool=f"{directory}/{module_name}"):
+                milliseconds, heavy = measure(directory, module_name)
+                self.assertEqual(heavy, [])
+                self.assertLessEqual(milliseconds, budget * SCALE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Tests of the toolchain server (Server.py) and its client (Client.py): a
+compile through the server writes the same files, and exits with the same
+status, as the compiler run on its own.
+"""
+import contextlib
+import io
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+SERVER = os.path.join(REPOSITORY, "13", "Server.py")
+COMPILER_DIRECTORY = os.path.join(REPOSITORY, "11")
+
+sys.path.insert(0, os.path.join(REPOSITORY, "13"))
+from Client import run_on_server, trusted_socket
+
+
+def output_files(directory: str) -> dict:
+    """Returns the contents of the .vm files in directory, by name."""
+    files = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".vm"):
+            with open(os.path.join(directory, filename), 'r') as vm_file:
+                files[filename] = vm_file.read()
+    return files
+
+
+class ServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        # The server and the client only trust a private directory
+        cls.socket = os.path.join(cls.directory, "sockets", "test.sock")
+        cls.environment = mock.patch.dict(os.environ,
+                                          NAND2TETRIS_SOCKET=cls.socket)
+        cls.environment.start()
+        cls.server = subprocess.Popen(
+            [sys.executable, SERVER, "--workers", "1"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 30
+        while not trusted_socket(cls.socket):
+            if cls.server.poll() is not None or time.monotonic() > deadline:
+                cls.tearDownClass()
+                raise RuntimeError("the server did not start")
+            time.sleep(0.05)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.server.poll() is None:
+            cls.server.send_signal(signal.SIGTERM)
+            cls.server.wait(30)
+        cls.environment.stop()
+        shutil.rmtree(cls.directory)
+
+    def program(self, name: str, sources: str = None) -> str:
+        """Copies a program of 11, or writes one with the given Main, into a
+        directory of its own and returns its path.
+        """
+        path = tempfile.mkdtemp(dir=self.directory)
+        if sources is None:
+            shutil.copytree(os.path.join(COMPILER_DIRECTORY, name), path,
+                            dirs_exist_ok=True)
+        else:
+            with open(os.path.join(path, name + ".jack"), 'w') as jack_file:
+                jack_file.write(sources)
+        return path
+
+    def compile_on_server(self, *arguments: str) -> tuple:
+        """Compiles through the server.
+
+        Returns:
+            tuple: the exit status, and what the compiler printed to stderr.
+        """
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), \
+                contextlib.redirect_stderr(stderr):
+            status = run_on_server(COMPILER_DIRECTORY, "JackCompiler.py",
+                                   list(arguments))
+        self.assertIsNotNone(status, "the server did not run the compiler")
+        return status, stderr.getvalue()
+
+    def test_same_output_as_compiler(self):
+        served = self.program("Square")
+        direct = self.program("Square")
+        status, _ = self.compile_on_server(served)
+        subprocess.run([sys.executable, os.path.join(COMPILER_DIRECTORY,
+                                                     "JackCompiler.py"),
+                        direct], check=True)
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(output_files(served)),
+                         ["Main.vm", "Square.vm", "SquareGame.vm"])
+        self.assertEqual(output_files(served), output_files(direct))
+
+    def test_error_status(self):
+        path = self.program("Main", "class Main {\n    function void main() "
+                                    "{\n        return\n    }\n}\n")
+        status, stderr = self.compile_on_server(path)
+        self.assertEqual(status, 1)
+        self.assertIn("Main.jack", stderr)
+
+    def test_launcher_from_another_directory(self):
+        path = self.program("Square")
+        result = subprocess.run(
+            ["sh", os.path.join(COMPILER_DIRECTORY, "JackCompiler"), path],
+            cwd=self.directory)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(len(output_files(path)), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+"""
+Tests that the copies of Stats.py every tool keeps are the same.
+"""
+import os
+import unittest
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+TOOLS = ["06", "07", "08", "11", "13"]
+
+
+class StatsCopiesTest(unittest.TestCase):
+
+    def test_identical(self):
+        copies = {}
+        for tool in TOOLS:
+            with open(os.path.join(REPOSITORY, tool, "Stats.py"), 'rb') \
+                    as stats_file:
+                copies[tool] = stats_file.read()
+        for tool in TOOLS[1:]:
+            with self.subTest(tool=tool):
+                self.assertEqual(copies[tool], copies[TOOLS[0]],
+                                 f"{tool}/Stats.py differs from "
+                                 f"{TOOLS[0]}/Stats.py")
+
+
+if __name__ == "__main__":
+    unittest.main()